@@ -0,0 +1,311 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+Time each stage between saving an LFL and the plot being drawn:
+
+ * copy_file_part - extracting part of the raw data file (--start/--stop).
+ * find_frames - scanning the raw data file for frame sync words.
+ * process_data - parsing the LFL and processing the raw data into HDF.
+ * hdf_reload - opening the plotted parameters and reading their arrays.
+ * plot_parameters - drawing the figure with the Agg backend.
+
+Results are appended to a JSON lines file. Each run is compared with the
+previous run of the same configuration on the same host and stages which
+have slowed by more than the tolerance are reported as regressions.
+
+    $ python -m benchmarks.run_benchmarks --duration 3600 --parameters 32
+'''
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import traceback
+
+import matplotlib
+matplotlib.use('Agg')
+
+from benchmarks.synthetic import FREQUENCIES, SyntheticFrame
+from flightdataplotter import frames, hdf_tools
+from flightdataplotter.raw_data import copy_file_part
+
+
+DEFAULT_RESULTS_PATH = 'benchmark_results.jsonl'
+# Stages run each time the LFL is saved.
+EDIT_TO_PLOT_STAGES = ('process_data', 'hdf_reload', 'plot_parameters')
+# Fractional slow down of a stage's fastest time reported as a regression.
+DEFAULT_TOLERANCE = 0.2
+
+
+def create_parser():
+    parser = argparse.ArgumentParser(
+        description='Benchmark FlightDataPlotter processing and plotting.')
+    parser.add_argument(
+        '--duration', type=float, default=3600,
+        help='Seconds of synthetic data to generate. Default is 3600.')
+    parser.add_argument(
+        '--wps', type=int, default=256,
+        help='Words per second of synthetic data. Default is 256.')
+    parser.add_argument(
+        '--parameters', dest='parameter_count', type=int, default=16,
+        help='Number of synthetic parameters. Default is 16.')
+    parser.add_argument(
+        '--lfl', dest='lfl_path',
+        help='Benchmark this LFL rather than a synthetic LFL. Requires '
+        '--data.')
+    parser.add_argument(
+        '--data', dest='data_path',
+        help='Benchmark this raw data file rather than synthetic data.')
+    parser.add_argument(
+        '--lfl-template', dest='lfl_template',
+        help='File containing a replacement for synthetic.LFL_TEMPLATE.')
+    parser.add_argument(
+        '--parameter-template', dest='parameter_template',
+        help='File containing a replacement for '
+        'synthetic.PARAMETER_TEMPLATE.')
+    parser.add_argument(
+        '-r', '--repeat', type=int, default=3,
+        help='Number of times each stage is run. Default is 3.')
+    parser.add_argument(
+        '--results', dest='results_path', default=DEFAULT_RESULTS_PATH,
+        help='JSON lines file results are appended to. Default is %s.'
+        % DEFAULT_RESULTS_PATH)
+    parser.add_argument(
+        '--tolerance', type=float, default=DEFAULT_TOLERANCE,
+        help='Fractional slow down reported as a regression. Default is '
+        '%s.' % DEFAULT_TOLERANCE)
+    parser.add_argument(
+        '--fail-on-regression', dest='fail_on_regression', default=False,
+        action='store_true',
+        help='Exit with a non-zero status if a regression is found.')
+    return parser
+
+
+def time_stage(function, repeat, setup=None):
+    '''
+    :returns: Wall time in seconds of each call to function.
+    :rtype: list of float
+    '''
+    times = []
+    for _ in xrange(repeat):
+        if setup:
+            setup()
+        start = time.time()
+        function()
+        times.append(time.time() - start)
+    return times
+
+
+def summarise(times):
+    times = sorted(times)
+    return {'min': times[0], 'median': times[len(times) // 2],
+            'max': times[-1]}
+
+
+def run_stages(lfl_path, data_path, temp_dir, repeat):
+    '''
+    Time each stage. Stages which fail (e.g. because compass is not
+    installed) are recorded as skipped along with the error.
+
+    :returns: Timings or skip reason keyed by stage name.
+    :rtype: dict
+    '''
+    results = {}
+
+    def record(name, function, setup=None):
+        print 'Timing %s...' % name
+        try:
+            results[name] = summarise(time_stage(function, repeat,
+                                                 setup=setup))
+        except Exception as err:
+            traceback.print_exc()
+            results[name] = {'skipped': '%s: %s' % (err.__class__.__name__,
+                                                    err)}
+            return False
+        return True
+
+    part_path = os.path.join(temp_dir, 'part.dat')
+    part_copy = os.path.join(temp_dir, 'part_10-90.dat')
+
+    def remove_part():
+        if os.path.exists(part_copy):
+            os.remove(part_copy)
+
+    shutil.copyfile(data_path, part_path)
+    record('copy_file_part', lambda: copy_file_part(part_path, 10, 90),
+           setup=remove_part)
+    record('find_frames',
+           lambda: frames.find_frames(frames.open_words(data_path)))
+
+    try:
+        from flightdataplotter.plot_params import (
+            ProcessAndPlotLoops,
+            plot_parameters,
+        )
+    except ImportError as err:
+        for name in ('process_data', 'hdf_reload', 'plot_parameters'):
+            results[name] = {'skipped': 'ImportError: %s' % err}
+        return results
+
+    hdf_path = os.path.join(temp_dir, 'output.hdf5')
+    loops = ProcessAndPlotLoops(hdf_path, False, lfl_path, None)
+    axes = {}
+
+    def process():
+        axes.update(loops.process_data(lfl_path, data_path, hdf_path, -1,
+                                       False, {'Frame Doubled': False,
+                                               'Stretched': None}))
+
+    if not record('process_data', process):
+        for name in ('hdf_reload', 'plot_parameters'):
+            results[name] = {'skipped': 'process_data failed'}
+        return results
+
+    param_names = list(itertools.chain.from_iterable(axes.values()))
+    params = {}
+
+    def reload_params():
+        params.clear()
+        params.update(hdf_tools.load_params(hdf_path, param_names))
+        for param in params.itervalues():
+            param.array
+
+    record('hdf_reload', reload_params)
+
+    def plot():
+        import matplotlib.pyplot as plt
+        plt.switch_backend('Agg')
+        fig = plot_parameters(params, axes, show=False)
+        fig.canvas.draw()
+        plt.close(fig)
+
+    record('plot_parameters', plot)
+    return results
+
+
+def find_previous(results_path, config):
+    '''
+    :returns: The last result with the same configuration and host.
+    :rtype: dict or None
+    '''
+    if not os.path.isfile(results_path):
+        return None
+    previous = None
+    with open(results_path) as results_file:
+        for line in results_file:
+            if not line.strip():
+                continue
+            result = json.loads(line)
+            if result.get('config') == config and \
+               result.get('host') == platform.node():
+                previous = result
+    return previous
+
+
+def find_regressions(stages, previous_stages, tolerance):
+    '''
+    :returns: Stage names with the previous and current fastest times where
+        the current time exceeds the previous by more than tolerance.
+    :rtype: list of (str, float, float)
+    '''
+    regressions = []
+    for name, timing in sorted(stages.iteritems()):
+        previous = previous_stages.get(name, {})
+        if 'min' not in timing or 'min' not in previous:
+            continue
+        if timing['min'] > previous['min'] * (1 + tolerance):
+            regressions.append((name, previous['min'], timing['min']))
+    return regressions
+
+
+def edit_to_plot_latency(stages):
+    '''
+    :returns: Sum of the fastest times of the stages run each time the LFL is
+        saved, or None if any of them was skipped.
+    :rtype: float or None
+    '''
+    timings = [stages.get(name, {}) for name in EDIT_TO_PLOT_STAGES]
+    if not all('min' in timing for timing in timings):
+        return None
+    return sum(timing['min'] for timing in timings)
+
+
+def main():
+    parser = create_parser()
+    args = parser.parse_args()
+    if bool(args.lfl_path) != bool(args.data_path):
+        parser.error('--lfl and --data must be provided together.')
+
+    temp_dir = tempfile.mkdtemp(prefix='FlightDataPlotterBenchmark')
+    try:
+        if args.lfl_path:
+            lfl_path, data_path = args.lfl_path, args.data_path
+            config = {'lfl': os.path.abspath(lfl_path),
+                      'data': os.path.abspath(data_path)}
+        else:
+            frame = SyntheticFrame(wps=args.wps,
+                                   parameter_count=args.parameter_count)
+            templates = {}
+            if args.lfl_template:
+                templates['lfl_template'] = open(args.lfl_template).read()
+            if args.parameter_template:
+                templates['parameter_template'] = \
+                    open(args.parameter_template).read()
+            lfl_path = os.path.join(temp_dir, 'synthetic.lfl')
+            data_path = os.path.join(temp_dir, 'synthetic.dat')
+            with open(lfl_path, 'w') as lfl_file:
+                lfl_file.write(frame.lfl(**templates))
+            print 'Generating %s seconds of synthetic data...' % args.duration
+            frame.write_raw(data_path, args.duration)
+            config = {'duration': args.duration, 'wps': args.wps,
+                      'parameter_count': args.parameter_count,
+                      'frequencies': list(FREQUENCIES),
+                      'templates': sorted(templates)}
+        config['repeat'] = args.repeat
+
+        stages = run_stages(lfl_path, data_path, temp_dir, args.repeat)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    result = {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'host': platform.node(),
+        'python': platform.python_version(),
+        'config': config,
+        'stages': stages,
+        'edit_to_plot': edit_to_plot_latency(stages),
+    }
+    previous = find_previous(args.results_path, config)
+    with open(args.results_path, 'a') as results_file:
+        results_file.write(json.dumps(result, sort_keys=True) + '\n')
+
+    print
+    for name, timing in sorted(stages.iteritems()):
+        if 'min' in timing:
+            print '%-16s min %8.3fs  median %8.3fs' % (
+                name, timing['min'], timing['median'])
+        else:
+            print '%-16s skipped (%s)' % (name, timing['skipped'])
+    if result['edit_to_plot'] is None:
+        print 'Edit to plot latency: unavailable'
+    else:
+        print 'Edit to plot latency: %.3fs' % result['edit_to_plot']
+
+    if previous:
+        regressions = find_regressions(stages, previous['stages'],
+                                       args.tolerance)
+        for name, previous_time, current_time in regressions:
+            print 'REGRESSION: %s %.3fs -> %.3fs' % (name, previous_time,
+                                                   current_time)
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+Generate synthetic LFLs and ARINC 717 raw data files for benchmarking.
+
+Each subframe starts with its sync word and the second word of subframe 1
+holds a 4-bit superframe counter. Parameters are 12-bit unsigned values
+(sine waves of differing periods) occupying one or more evenly spaced word
+slots per subframe, so a parameter with n slots is recorded at n Hz.
+
+The LFL is written from PARAMETER_TEMPLATE and LFL_TEMPLATE. If the LFL
+syntax of the installed compass version differs, these can be replaced with
+--lfl-template/--parameter-template or a real LFL and data file can be
+benchmarked instead.
+'''
+
+import numpy as np
+
+from flightdataplotter.frames import (
+    FRAMES_PER_SUPERFRAME,
+    SUBFRAMES_PER_FRAME,
+    SYNC_WORDS,
+)
+
+
+LFL_TEMPLATE = '''\
+[Frame]
+Name = Synthetic
+Words Per Second = %(wps)d
+Superframe Counter Location = 1:2:4-1
+
+[Parameters]
+%(parameters)s
+[Parameter Group]
+%(groups)s
+'''
+
+PARAMETER_TEMPLATE = '''\
+    [[%(name)s]]
+    Location = %(locations)s
+    Bits = 12-1
+    Type = Unsigned
+    Resolution = 1.0
+    Units = %(units)s
+'''
+
+# Frequencies assigned to parameters in turn.
+FREQUENCIES = (1, 2, 4, 8)
+# Parameters per AXIS group.
+PARAMETERS_PER_AXIS = 4
+# Frames generated at a time when writing raw data.
+FRAMES_PER_BLOCK = 64
+
+
+class SyntheticFrame(object):
+    '''
+    Layout of a synthetic frame.
+    '''
+    def __init__(self, wps=256, parameter_count=16,
+                 frequencies=FREQUENCIES):
+        '''
+        :param wps: Words per second (subframe size).
+        :type wps: int
+        :param parameter_count: Number of parameters including Altitude STD.
+        :type parameter_count: int
+        :param frequencies: Frequencies assigned to parameters in turn.
+        :type frequencies: sequence of int
+        '''
+        self.wps = wps
+        names = ['Altitude STD']
+        rates = [1]
+        for index in xrange(1, parameter_count):
+            names.append('Synthetic %03d' % index)
+            rates.append(frequencies[index % len(frequencies)])
+        # Word 0 is the sync word and word 1 the superframe counter.
+        used = set([0, 1])
+        slots = {}
+        # Allocate the highest frequencies first as they need the most
+        # evenly spaced free words.
+        for name, frequency in sorted(zip(names, rates),
+                                      key=lambda item: (-item[1], item[0])):
+            spacing = wps // frequency
+            for offset in xrange(spacing):
+                candidate = range(offset, wps, spacing)[:frequency]
+                if len(candidate) == frequency and used.isdisjoint(candidate):
+                    break
+            else:
+                raise ValueError('Frame of %d words per second cannot hold '
+                                 '%d parameters' % (wps, parameter_count))
+            used.update(candidate)
+            slots[name] = candidate
+        self.parameters = [(name, frequency, slots[name])
+                           for name, frequency in zip(names, rates)]
+
+    @property
+    def frame_words(self):
+        return self.wps * SUBFRAMES_PER_FRAME
+
+    def lfl(self, lfl_template=LFL_TEMPLATE,
+            parameter_template=PARAMETER_TEMPLATE):
+        '''
+        :returns: LFL defining every parameter, grouped onto AXIS groups.
+        :rtype: str
+        '''
+        parameters = []
+        for name, _frequency, slots in self.parameters:
+            locations = ', '.join(
+                '%d:%d' % (subframe, slot + 1)
+                for subframe in xrange(1, SUBFRAMES_PER_FRAME + 1)
+                for slot in slots)
+            units = 'ft' if name == 'Altitude STD' else 'deg'
+            parameters.append(parameter_template % {
+                'name': name, 'locations': locations, 'units': units})
+        names = [name for name, _frequency, _slots in self.parameters[1:]]
+        groups = []
+        for index in xrange(0, len(names), PARAMETERS_PER_AXIS):
+            groups.append('AXIS_%d = %s,' % (
+                index // PARAMETERS_PER_AXIS + 1,
+                ', '.join(names[index:index + PARAMETERS_PER_AXIS])))
+        if not groups:
+            groups.append('AXIS_1 = Altitude STD,')
+        return lfl_template % {'wps': self.wps,
+                               'parameters': '\n'.join(parameters),
+                               'groups': '\n'.join(groups)}
+
+    def frames(self, start, count):
+        '''
+        Raw words of count frames starting from frame index start.
+
+        :rtype: np.ndarray of uint16
+        '''
+        words = np.zeros((count, SUBFRAMES_PER_FRAME, self.wps),
+                         dtype=np.uint16)
+        for subframe, sync in enumerate(SYNC_WORDS):
+            words[:, subframe, 0] = sync
+        frame_indices = np.arange(start, start + count)
+        words[:, 0, 1] = frame_indices % FRAMES_PER_SUPERFRAME
+        # Time of each word slot in seconds.
+        seconds = (frame_indices[:, np.newaxis, np.newaxis] *
+                   SUBFRAMES_PER_FRAME +
+                   np.arange(SUBFRAMES_PER_FRAME)[:, np.newaxis] +
+                   np.arange(self.wps) / float(self.wps))
+        for index, (_name, _frequency, slots) in \
+                enumerate(self.parameters):
+            period = 60.0 * (index + 1)
+            values = 2047 + 2047 * np.sin(
+                2 * np.pi * seconds[:, :, slots] / period)
+            words[:, :, slots] = values.astype(np.uint16)
+        return words.ravel()
+
+    def write_raw(self, path, duration):
+        '''
+        Write a raw data file of at least duration seconds.
+
+        :param duration: Seconds of data.
+        :type duration: float
+        :returns: Number of frames written.
+        :rtype: int
+        '''
+        frame_count = int(np.ceil(duration / float(SUBFRAMES_PER_FRAME)))
+        with open(path, 'wb') as raw:
+            for start in xrange(0, frame_count, FRAMES_PER_BLOCK):
+                count = min(FRAMES_PER_BLOCK, frame_count - start)
+                raw.write(self.frames(start, count).astype('<u2').tostring())
+        return frame_count
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+Memoisation of arrays derived from parameters (aligned arrays, x-axis
+indices) across reprocessing iterations.
+
+Parameters are reloaded from the HDF file each time the LFL is saved, so
+array identity does not survive between iterations. Cached arrays are
+instead keyed by a fingerprint of the source array's contents.
+'''
+
+import hashlib
+
+from collections import OrderedDict
+
+import numpy as np
+
+
+def fingerprint(array):
+    '''
+    Digest of an array's data, mask, dtype and shape.
+
+    :type array: np.ndarray or np.ma.MaskedArray
+    :rtype: str
+    '''
+    digest = hashlib.md5()
+    digest.update(str((array.dtype.str, array.shape)))
+    digest.update(np.ascontiguousarray(np.ma.getdata(array)))
+    mask = np.ma.getmask(array)
+    if mask is not np.ma.nomask:
+        digest.update(np.ascontiguousarray(mask))
+    return digest.hexdigest()
+
+
+class ArrayCache(object):
+    '''
+    Least recently used cache of computed arrays.
+    '''
+    def __init__(self, max_entries=64):
+        '''
+        :param max_entries: Maximum number of results to keep.
+        :type max_entries: int
+        '''
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, function, *args, **kwargs):
+        '''
+        Return the cached result for key, otherwise call function with args
+        and kwargs and cache the result.
+
+        :param key: Hashable key which identifies every input of function.
+        :type key: tuple
+        '''
+        try:
+            value = self._entries.pop(key)
+        except KeyError:
+            self.misses += 1
+            value = function(*args, **kwargs)
+        else:
+            self.hits += 1
+        self._entries[key] = value
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        self._entries.clear()
+
+    def indices(self, length, scale):
+        '''
+        x-axis indices of an array of length samples plotted against a
+        higher frequency, i.e. np.arange(length) * scale.
+        '''
+        return self.get(('indices', length, scale),
+                        lambda: np.arange(length) * scale)
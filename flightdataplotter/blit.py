@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+Redrawing changed artists without redrawing the rest of a figure.
+'''
+
+
+class BlitManager(object):
+    '''
+    Draws a set of animated artists over a cached background of the rest of
+    the figure. The background is captured each time the figure is fully
+    drawn (e.g. when resized or the axis limits change), after which changes
+    to the artists' data only require the artists to be drawn and copied to
+    the screen.
+    '''
+    def __init__(self, canvas, artists=()):
+        '''
+        :param canvas: Canvas of the figure containing the artists.
+        :type canvas: matplotlib.backend_bases.FigureCanvasBase
+        :param artists: Artists to draw over the background.
+        :type artists: iterable of matplotlib.artist.Artist
+        '''
+        self.canvas = canvas
+        self._artists = []
+        self._background = None
+        self.set_artists(artists)
+        self._draw_cid = canvas.mpl_connect('draw_event', self._on_draw)
+
+    def set_artists(self, artists):
+        '''
+        Replace the animated artists. The figure must be fully drawn before
+        they are shown.
+        '''
+        self._artists = list(artists)
+        for artist in self._artists:
+            # Animated artists are excluded from full draws of the figure.
+            artist.set_animated(True)
+        self._background = None
+
+    def _on_draw(self, event):
+        self._background = self.canvas.copy_from_bbox(
+            self.canvas.figure.bbox)
+        self._draw_artists()
+
+    def _draw_artists(self):
+        figure = self.canvas.figure
+        for artist in self._artists:
+            figure.draw_artist(artist)
+
+    def draw(self):
+        '''
+        Fully draw the figure, capturing a new background.
+        '''
+        self.canvas.draw()
+
+    def update(self):
+        '''
+        Draw the artists over the background, falling back to a full draw if
+        no background has been captured.
+        '''
+        if self._background is None:
+            self.draw()
+            return
+        self.canvas.restore_region(self._background)
+        self._draw_artists()
+        self.canvas.blit(self.canvas.figure.bbox)
+
+    def disconnect(self):
+        self.canvas.mpl_disconnect(self._draw_cid)
@@ -0,0 +1,328 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+Conversion of raw data into HDF files across multiple processes, or in
+sections so that conversion can be abandoned part way through.
+'''
+
+import configobj
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+from flightdataplotter import frames, hdf_tools, raw_data
+from flightdataplotter.memory import AUTO, auto_superframes_in_memory
+
+
+# Seconds between checks for cancellation while waiting for worker processes.
+CANCEL_POLL_INTERVAL = 0.1
+# Superframes processed between checks for cancellation when converting
+# within a single process (roughly an hour of data).
+DEFAULT_CHUNK_SUPERFRAMES = 64
+
+
+class Cancelled(Exception):
+    '''
+    Raised when conversion is abandoned, e.g. because the LFL has changed
+    again. Partial output is removed and the output path is left unchanged.
+    '''
+    pass
+
+
+def superframe_counter(lfl_path):
+    '''
+    Find the superframe counter within an LFL (see frames.counter_location).
+
+    :rtype: (int, int, int, int) or None
+    '''
+    try:
+        config = configobj.ConfigObj(lfl_path)
+    except configobj.ConfigObjError:
+        return None
+    return frames.counter_location(config)
+
+
+def expected_durations(frame_index, ranges):
+    '''
+    Expected duration in seconds of each section of a data file, from the
+    number of frames within it. The first and last sections may contain
+    partial superframes, which are processed as they would be within the
+    whole file, so their durations are unknown (None).
+
+    :param frame_index: Frame index of the data file.
+    :type frame_index: frames.FrameIndex
+    :param ranges: Start and stop byte offsets of each section.
+    :type ranges: list of (int, int)
+    :rtype: list of float or None
+    '''
+    durations = [None] * len(ranges)
+    for index in xrange(1, len(ranges) - 1):
+        durations[index] = frame_index.frame_count(*ranges[index]) * \
+            frames.SUBFRAMES_PER_FRAME
+    return durations
+
+
+def partition_params(param_list, partitions):
+    '''
+    Split parameters into groups of roughly equal processing cost. The cost
+    of a parameter is assumed to be proportional to its frequency.
+
+    :param param_list: Parameters returned by parse_lfl.
+    :type param_list: list
+    :param partitions: Maximum number of groups.
+    :type partitions: int
+    :returns: Names of parameters within each group.
+    :rtype: list of list of str
+    '''
+    groups = [[] for _ in xrange(min(partitions, len(param_list)))]
+    costs = [0] * len(groups)
+    ordered = sorted(param_list, reverse=True,
+                     key=lambda p: (getattr(p, 'frequency', 1) or 1, p.name))
+    for param in ordered:
+        index = costs.index(min(costs))
+        groups[index].append(param.name)
+        costs[index] += getattr(param, 'frequency', 1) or 1
+    return [g for g in groups if g]
+
+
+def _convert_params(job):
+    '''
+    Process a subset of parameters into an HDF file. Runs within a worker
+    process, so the LFL is parsed again rather than passing parsed objects
+    between processes.
+    '''
+    from compass.arinc717.data_frame_parser import parse_lfl
+    from compass.arinc717.hdf import create_hdf
+    (lfl_path, data_path, hdf_path, param_names, aircraft_info,
+     superframes_in_memory) = job
+    lfl_parser, param_list = parse_lfl(
+        lfl_path, param_names=param_names, aircraft_info=aircraft_info)
+    create_hdf(data_path, hdf_path, lfl_parser.frame, param_list,
+               superframes_in_memory=superframes_in_memory)
+    return hdf_path
+
+
+def _convert_chunk(job):
+    '''
+    Extract a byte range of a data file and process it into an HDF file.
+    Runs within a worker process.
+    '''
+    (lfl_path, data_path, chunk_path, start, stop, hdf_path, param_names,
+     aircraft_info, superframes_in_memory) = job
+    with open(data_path, 'rb') as src, open(chunk_path, 'wb') as dest:
+        raw_data.copy_mmap(src, dest, start, stop - start)
+    try:
+        return _convert_params((lfl_path, chunk_path, hdf_path, param_names,
+                                aircraft_info, superframes_in_memory))
+    finally:
+        os.remove(chunk_path)
+
+
+def map_jobs(function, jobs, cancelled=None):
+    '''
+    Run jobs across a pool of worker processes, one per job.
+
+    :param cancelled: Returns whether to stop waiting for the jobs, in which
+        case the workers are terminated.
+    :type cancelled: callable or None
+    :returns: Result of each job.
+    :rtype: list
+    :raises Cancelled: If cancelled before the jobs finish.
+    '''
+    pool = multiprocessing.Pool(len(jobs))
+    try:
+        if cancelled is None:
+            results = pool.map(function, jobs)
+        else:
+            async_result = pool.map_async(function, jobs)
+            while not async_result.ready():
+                if cancelled():
+                    pool.terminate()
+                    raise Cancelled()
+                async_result.wait(CANCEL_POLL_INTERVAL)
+            results = async_result.get()
+    finally:
+        pool.close()
+        pool.join()
+    return results
+
+
+def merge_hdf_files(hdf_paths, output_path):
+    '''
+    Merge the parameters of several HDF files processed from the same data
+    file. File attributes are taken from the first file.
+
+    :param hdf_paths: Paths of HDF files to merge. These are consumed.
+    :type hdf_paths: list of str
+    :param output_path: Path of merged HDF file.
+    :type output_path: str
+    '''
+    base_path = hdf_paths[0]
+    for hdf_path in hdf_paths[1:]:
+        hdf_tools.copy_params(hdf_path, base_path,
+                              hdf_tools.param_names(hdf_path))
+        os.remove(hdf_path)
+    hdf_tools.replace_file(base_path, output_path)
+
+
+def create_hdf_parallel(lfl_path, data_path, output_path, param_list,
+                        aircraft_info, superframes_in_memory, workers,
+                        cancelled=None):
+    '''
+    Process parameters into an HDF file by splitting them across worker
+    processes, each writing a partial HDF file, then merging the results.
+
+    :param param_list: Parameters returned by parse_lfl.
+    :type param_list: list
+    :param workers: Number of worker processes.
+    :type workers: int
+    :param cancelled: Returns whether to abandon conversion.
+    :type cancelled: callable or None
+    :raises Cancelled: If cancelled before conversion finishes.
+    '''
+    groups = partition_params(param_list, workers)
+    # Partial files are written alongside the output so that merging them
+    # does not copy between filesystems.
+    temp_dir = tempfile.mkdtemp(
+        prefix='FlightDataPlotter',
+        dir=os.path.dirname(os.path.abspath(output_path)))
+    jobs = [(lfl_path, data_path, os.path.join(temp_dir, '%d.hdf5' % index),
+             names, aircraft_info, superframes_in_memory)
+            for index, names in enumerate(groups)]
+    try:
+        hdf_paths = map_jobs(_convert_params, jobs, cancelled)
+        merge_hdf_files(hdf_paths, output_path)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def create_hdf_time_sliced(lfl_path, data_path, output_path, param_list,
+                           aircraft_info, superframes_in_memory, workers,
+                           cancelled=None):
+    '''
+    Process parameters into an HDF file by splitting the data file into
+    sections starting on superframe boundaries, which are found from the
+    superframe counter, processing each section in a worker process, then
+    concatenating the parameter arrays.
+
+    :param param_list: Parameters returned by parse_lfl.
+    :type param_list: list
+    :param workers: Number of worker processes.
+    :type workers: int
+    :param cancelled: Returns whether to abandon conversion.
+    :type cancelled: callable or None
+    :returns: Whether the data file could be split and the sections
+        concatenated without misaligning parameters. If not, the output path
+        is not written.
+    :rtype: bool
+    :raises Cancelled: If cancelled before conversion finishes.
+    '''
+    size = os.path.getsize(data_path)
+    if not size or raw_data.is_compressed(data_path):
+        return False
+    frame_index = frames.open_index(data_path)
+    wps = frame_index.wps
+    if not wps:
+        return False
+    superframes = frame_index.superframes(data_path,
+                                          superframe_counter(lfl_path))
+    ranges = frames.split_offsets(superframes // frames.WORD_SIZE, size,
+                                  workers)
+    if len(ranges) < 2:
+        return False
+
+    param_names = [p.name for p in param_list]
+    temp_dir = tempfile.mkdtemp(
+        prefix='FlightDataPlotter',
+        dir=os.path.dirname(os.path.abspath(output_path)))
+    jobs = [(lfl_path, data_path, os.path.join(temp_dir, '%d.dat' % index),
+             start, stop, os.path.join(temp_dir, '%d.hdf5' % index),
+             param_names, aircraft_info, superframes_in_memory)
+            for index, (start, stop) in enumerate(ranges)]
+    print 'Processing %d sections of %s (%d words per second)' % (
+        len(jobs), data_path, wps)
+    try:
+        hdf_paths = map_jobs(_convert_chunk, jobs, cancelled)
+        hdf_tools.concatenate_files(hdf_paths, output_path,
+                                    expected_durations(frame_index, ranges))
+    except ValueError as err:
+        print 'Could not concatenate sections of %s: %s' % (data_path, err)
+        return False
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    return True
+
+
+def create_hdf_chunked(data_path, output_path, frame, param_list, counter,
+                       superframes_in_memory, cancelled,
+                       chunk_superframes=DEFAULT_CHUNK_SUPERFRAMES):
+    '''
+    Process parameters into an HDF file within this process, a section of
+    the data file at a time, so that conversion can be abandoned between
+    sections. The sections start on superframe boundaries and their
+    parameter arrays are concatenated once all have been processed.
+
+    :param frame: Frame returned by parse_lfl.
+    :param param_list: Parameters returned by parse_lfl.
+    :type param_list: list
+    :param counter: Location of the superframe counter from
+        superframe_counter.
+    :type counter: (int, int, int, int) or None
+    :param superframes_in_memory: Number of superframes processed in memory,
+        or AUTO to choose from the memory available before each section.
+    :type superframes_in_memory: int or str
+    :param cancelled: Returns whether to abandon conversion. Checked before
+        each section.
+    :type cancelled: callable
+    :param chunk_superframes: Number of superframes within each section.
+    :type chunk_superframes: int
+    :returns: Whether the data file could be split into more than one
+        section and the sections concatenated without misaligning
+        parameters. If not, the output path is not written.
+    :rtype: bool
+    :raises Cancelled: If cancelled before conversion finishes.
+    '''
+    from compass.arinc717.hdf import create_hdf
+    size = os.path.getsize(data_path)
+    if not size or raw_data.is_compressed(data_path):
+        return False
+    frame_index = frames.open_index(data_path)
+    if not frame_index.wps:
+        return False
+    superframes = frame_index.superframes(data_path, counter)
+    ranges = frames.chunk_offsets(superframes // frames.WORD_SIZE, size,
+                                  chunk_superframes)
+    if len(ranges) < 2:
+        return False
+
+    temp_dir = tempfile.mkdtemp(
+        prefix='FlightDataPlotter',
+        dir=os.path.dirname(os.path.abspath(output_path)))
+    try:
+        hdf_paths = []
+        chunk_path = os.path.join(temp_dir, 'chunk.dat')
+        for index, (start, stop) in enumerate(ranges):
+            if cancelled():
+                raise Cancelled()
+            with open(data_path, 'rb') as src, open(chunk_path, 'wb') as dest:
+                raw_data.copy_mmap(src, dest, start, stop - start)
+            hdf_path = os.path.join(temp_dir, '%d.hdf5' % index)
+            if superframes_in_memory == AUTO:
+                section_superframes = auto_superframes_in_memory(
+                    param_list, frame_index.wps,
+                    superframe_count=chunk_superframes)
+            else:
+                section_superframes = superframes_in_memory
+            create_hdf(chunk_path, hdf_path, frame, param_list,
+                       superframes_in_memory=section_superframes)
+            hdf_paths.append(hdf_path)
+        hdf_tools.concatenate_files(hdf_paths, output_path,
+                                    expected_durations(frame_index, ranges))
+    except ValueError as err:
+        print 'Could not concatenate sections of %s: %s' % (data_path, err)
+        return False
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    return True
@@ -0,0 +1,494 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+A long-lived process which keeps the processing and plotting libraries
+loaded and accepts jobs over a local Unix socket, along with a lightweight
+client for scripts and editor hooks.
+
+Messages are JSON objects terminated by a newline. Each connection sends one
+request and receives one response:
+
+    {"command": "render", "lfl_path": "example.lfl", "data_path": "data.dat"}
+    {"status": "ok", "output_path": "...", "image_path": "...", "errors": []}
+
+Commands are ping, shutdown, convert (process into an HDF file) and render
+(process and save the plot as an image). Jobs are processed one at a time.
+The last processed HDF file and parsed LFL are kept for each LFL and data
+file pair, so repeated jobs only reprocess parameters which have changed,
+unless another pair has written the HDF file since.
+
+This module only imports the standard library (and flightdataplotter modules
+which do the same) at import time so that the client starts quickly.
+'''
+
+import argparse
+import errno
+import getpass
+import importlib
+import json
+import os
+import socket
+import sys
+import tempfile
+import time
+import traceback
+
+from collections import OrderedDict
+
+from flightdataplotter.memory import superframes_in_memory_arg
+
+
+DEFAULT_SOCKET_PATH = os.path.join(
+    tempfile.gettempdir(), 'FlightDataPlotter-%s.sock' % getpass.getuser())
+# Maximum size of a message in bytes.
+MAX_MESSAGE_SIZE = 1024 * 1024
+# LFL and data file pairs whose state is kept between jobs.
+MAX_SESSIONS = 16
+COMMANDS = ('ping', 'shutdown', 'convert', 'render')
+
+
+class DaemonError(Exception):
+    pass
+
+
+def send_message(sock, message):
+    '''
+    :param message: JSON serialisable message.
+    :type message: dict
+    '''
+    sock.sendall(json.dumps(message) + '\n')
+
+
+def read_message(sock):
+    '''
+    Read a newline terminated JSON message.
+
+    :rtype: dict
+    :raises DaemonError: If the connection closes before a complete message
+        is received or the message is invalid.
+    '''
+    chunks = []
+    size = 0
+    while True:
+        chunk = sock.recv(4096)
+        if not chunk:
+            raise DaemonError('Connection closed before message was received.')
+        chunks.append(chunk)
+        size += len(chunk)
+        if chunk.endswith('\n'):
+            break
+        if size > MAX_MESSAGE_SIZE:
+            raise DaemonError('Message exceeds %d bytes.' % MAX_MESSAGE_SIZE)
+    try:
+        message = json.loads(''.join(chunks))
+    except ValueError as err:
+        raise DaemonError('Invalid message: %s' % err)
+    if not isinstance(message, dict):
+        raise DaemonError('Message must be a JSON object.')
+    return message
+
+
+def request(socket_path, message, timeout=None):
+    '''
+    Send a request to a running daemon and wait for the response.
+
+    :param timeout: Seconds to wait for the response, or None to wait until
+        the job has finished.
+    :type timeout: float or None
+    :rtype: dict
+    :raises DaemonError: If the daemon cannot be reached.
+    '''
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        try:
+            sock.connect(socket_path)
+        except socket.error as err:
+            raise DaemonError('Could not connect to daemon at %s: %s'
+                              % (socket_path, err))
+        send_message(sock, message)
+        return read_message(sock)
+    finally:
+        sock.close()
+
+
+def is_running(socket_path):
+    '''
+    :returns: Whether a daemon is accepting connections on socket_path.
+    :rtype: bool
+    '''
+    try:
+        return request(socket_path, {'command': 'ping'},
+                       timeout=5)['status'] == 'ok'
+    except (DaemonError, socket.error, KeyError):
+        return False
+
+
+class Daemon(object):
+    '''
+    Accepts requests on a Unix socket and passes them to a handler.
+    '''
+    def __init__(self, socket_path, handler):
+        '''
+        :param socket_path: Path of the Unix socket to listen on.
+        :type socket_path: str
+        :param handler: Called with each request other than ping and shutdown,
+            returning the response.
+        :type handler: callable
+        '''
+        self.socket_path = socket_path
+        self._handler = handler
+        self._socket = None
+
+    def bind(self):
+        '''
+        Listen on the socket, replacing a stale socket file left by a daemon
+        which did not exit cleanly.
+
+        :raises DaemonError: If another daemon is using the socket.
+        '''
+        if os.path.exists(self.socket_path):
+            if is_running(self.socket_path):
+                raise DaemonError('A daemon is already running at %s'
+                                  % self.socket_path)
+            os.remove(self.socket_path)
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # Only the current user may submit jobs.
+        umask = os.umask(0o077)
+        try:
+            self._socket.bind(self.socket_path)
+        finally:
+            os.umask(umask)
+        self._socket.listen(5)
+
+    def handle(self, message):
+        '''
+        :returns: Response to message.
+        :rtype: dict
+        '''
+        command = message.get('command')
+        if command == 'ping':
+            return {'status': 'ok', 'pid': os.getpid()}
+        elif command == 'shutdown':
+            return {'status': 'ok'}
+        elif command not in COMMANDS:
+            return {'status': 'error',
+                    'message': 'Unknown command: %s' % command}
+        start = time.time()
+        try:
+            response = self._handler(message)
+        except Exception as err:
+            traceback.print_exc()
+            response = {'status': 'error',
+                        'message': '%s: %s' % (err.__class__.__name__, err)}
+        response['elapsed'] = time.time() - start
+        return response
+
+    def serve_forever(self):
+        '''
+        Handle requests until a shutdown request is received.
+        '''
+        if not self._socket:
+            self.bind()
+        print 'Listening on %s' % self.socket_path
+        try:
+            while True:
+                try:
+                    conn, _address = self._socket.accept()
+                except socket.error as err:
+                    if err.args[0] == errno.EINTR:
+                        continue
+                    raise
+                command = None
+                try:
+                    try:
+                        message = read_message(conn)
+                    except DaemonError as err:
+                        send_message(conn, {'status': 'error',
+                                            'message': str(err)})
+                        continue
+                    command = message.get('command')
+                    send_message(conn, self.handle(message))
+                except socket.error as err:
+                    print 'Lost connection to client: %s' % err
+                finally:
+                    conn.close()
+                if command == 'shutdown':
+                    break
+        finally:
+            self.close()
+
+    def close(self):
+        if self._socket:
+            self._socket.close()
+            self._socket = None
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+
+def default_output_path(lfl_path, data_path):
+    '''
+    HDF file path used when a job does not provide one. Both the LFL and data
+    file are named so that different LFLs do not share an HDF file.
+
+    :rtype: str
+    '''
+    return os.path.join(
+        tempfile.gettempdir(), '%s__%s.hdf5' % (
+            os.path.splitext(os.path.basename(lfl_path))[0],
+            os.path.splitext(os.path.basename(data_path))[0]))
+
+
+class Sessions(object):
+    '''
+    The processing state of recent LFL and data file pairs, and which of them
+    last wrote each HDF file.
+    '''
+    def __init__(self, factory, max_sessions=MAX_SESSIONS):
+        '''
+        :param factory: Called with the LFL path and HDF file path to create
+            the state of a new session.
+        :type factory: callable
+        :param max_sessions: Number of sessions kept, least recently used
+            sessions are discarded.
+        :type max_sessions: int
+        '''
+        self._factory = factory
+        self._sessions = OrderedDict()
+        # Session key which last wrote each HDF file path.
+        self._writers = {}
+        self.max_sessions = max_sessions
+
+    def open(self, lfl_path, data_path, output_path):
+        '''
+        Find or create the session of a job, which is assumed to write
+        output_path.
+
+        :returns: The session's state and whether the HDF file can be updated
+            incrementally, i.e. this session wrote it last.
+        :rtype: (object, bool)
+        '''
+        key = (lfl_path, data_path, output_path)
+        try:
+            session = self._sessions.pop(key)
+        except KeyError:
+            session = self._factory(lfl_path, output_path)
+        self._sessions[key] = session
+        while len(self._sessions) > self.max_sessions:
+            evicted, _session = self._sessions.popitem(last=False)
+            self._writers.pop(evicted[2], None)
+        incremental = self._writers.get(output_path) == key
+        # Even if processing fails, the file may have been partly rewritten.
+        self._writers[output_path] = key
+        return session, incremental
+
+
+class JobHandler(object):
+    '''
+    Processes convert and render requests, keeping the state of recent LFL and
+    data file pairs between requests.
+    '''
+    def __init__(self, max_sessions=MAX_SESSIONS, lfl_cache_dir=None):
+        '''
+        :param lfl_cache_dir: Directory to cache parsed LFLs within, or None
+            to only cache them in memory.
+        :type lfl_cache_dir: str or None
+        '''
+        # Import the processing and plotting libraries once, up front.
+        from flightdataplotter import plot_params
+        from flightdataplotter.lfl_cache import DiskLFLCache, MemoryLFLCache
+        # Otherwise imported by the first call to plot_parameters.
+        importlib.import_module('analysis_engine.library')
+        self._plot_params = plot_params
+        if lfl_cache_dir:
+            self._lfl_cache = DiskLFLCache(lfl_cache_dir)
+        else:
+            self._lfl_cache = MemoryLFLCache()
+        self._sessions = Sessions(self._create_loops, max_sessions)
+
+    def _create_loops(self, lfl_path, output_path):
+        return self._plot_params.ProcessAndPlotLoops(
+            output_path, False, lfl_path, None, lfl_cache=self._lfl_cache)
+
+    def __call__(self, message):
+        '''
+        :param message: Request containing command, lfl_path and data_path
+            and optionally output_path, image_path, image_format,
+            superframes_in_memory, aircraft_info, decimate, percent_start and
+            percent_stop.
+        :type message: dict
+        :rtype: dict
+        '''
+        plot_params = self._plot_params
+        try:
+            lfl_path = os.path.abspath(message['lfl_path'])
+            data_path = os.path.abspath(message['data_path'])
+        except KeyError as err:
+            return {'status': 'error', 'message': 'Missing %s.' % err}
+        for path in (lfl_path, data_path):
+            if not os.path.isfile(path):
+                return {'status': 'error',
+                        'message': 'File path not valid: %s' % path}
+        percent_start = message.get('percent_start', 0)
+        percent_stop = message.get('percent_stop', 100)
+        if plot_params.requires_copy(data_path, percent_start, percent_stop):
+            data_path = plot_params.copy_file_part(data_path, percent_start,
+                                                   percent_stop)
+        output_path = os.path.abspath(message.get('output_path') or
+                                      default_output_path(lfl_path, data_path))
+        aircraft_info = message.get('aircraft_info') or \
+            {'Frame Doubled': False, 'Stretched': None}
+
+        loops, incremental = self._sessions.open(lfl_path, data_path,
+                                                 output_path)
+        response = {'status': 'ok', 'output_path': output_path}
+        try:
+            axes = loops.process_data(
+                lfl_path, data_path, output_path,
+                message.get('superframes_in_memory', -1), False,
+                aircraft_info, incremental=incremental)
+            if message['command'] == 'render':
+                response['image_path'] = self._render(
+                    loops, axes, output_path, message)
+        except (ValueError, plot_params.ProcessError) as err:
+            response = {'status': 'error', 'message': str(err)}
+        response['errors'] = loops._take_error_messages()
+        return response
+
+    def _render(self, loops, axes, output_path, message):
+        plot_params = self._plot_params
+        image_format = message.get('image_format', 'png')
+        image_path = os.path.abspath(
+            message.get('image_path') or
+            '%s.%s' % (os.path.splitext(output_path)[0], image_format))
+        params = plot_params.hdf_tools.load_params(
+            output_path, [name for names in axes.values() for name in names])
+        fig = plot_params.plot_parameters(
+            params, axes, title=os.path.basename(output_path),
+            decimate=message.get('decimate', True),
+            cache=loops._array_cache, show=False)
+        try:
+            fig.savefig(image_path, format=image_format)
+        finally:
+            plot_params.plt.close(fig)
+        return image_path
+
+
+def serve(socket_path=DEFAULT_SOCKET_PATH, lfl_cache_dir=None):
+    '''
+    Run the daemon until a shutdown request is received.
+    '''
+    Daemon(socket_path,
+           JobHandler(lfl_cache_dir=lfl_cache_dir)).serve_forever()
+
+
+# Client
+###############################################################################
+
+
+def create_parser():
+    parser = argparse.ArgumentParser(
+        description='Submit a job to a running FlightDataPlotter daemon '
+        '(started with FlightDataPlotter --daemon).')
+    parser.add_argument('command', choices=COMMANDS)
+    parser.add_argument('lfl_path', nargs='?', help='Path of LFL file.')
+    parser.add_argument('data_path', nargs='?', help='Path of raw data file.')
+    parser.add_argument(
+        '--socket', dest='socket_path', default=DEFAULT_SOCKET_PATH,
+        help='Path of the daemon socket. Default is %s.'
+        % DEFAULT_SOCKET_PATH)
+    parser.add_argument(
+        '-o', '--output-path', dest='output_path',
+        help='Output HDF file path (default will be a temporary location).')
+    parser.add_argument(
+        '-i', '--image-path', dest='image_path',
+        help='Rendered image path (default is next to the HDF file).')
+    parser.add_argument(
+        '--render-format', dest='image_format', default='png',
+        choices=('png', 'svg'),
+        help='Image format of rendered plots. Default is png.')
+    parser.add_argument(
+        '--superframes-in-memory',
+        dest='superframes_in_memory', type=superframes_in_memory_arg,
+        default=-1,
+        help='Number of superframes stored in memory before writing to HDF5 '
+        "file, or 'auto' to choose from the available memory.")
+    parser.add_argument(
+        '-d', '--frame-doubled',
+        dest='frame_doubled', default=False, action='store_true',
+        help='The input raw data is frame doubled.')
+    parser.add_argument(
+        '-s', '--stretched', dest='stretched',
+        help='Name of frame Stretched definition to apply.')
+    parser.add_argument(
+        '--tail', dest='tail_number',
+        help='Aircraft tail number.')
+    parser.add_argument(
+        '--start', dest='percent_start', type=int, default=0,
+        help='Percentage into the file to start inspecting.')
+    parser.add_argument(
+        '--stop', dest='percent_stop', type=int, default=100,
+        help='Percentage into the file to inspect up until.')
+    parser.add_argument(
+        '--no-decimate', dest='decimate', default=True, action='store_false',
+        help='Plot every sample rather than the minimum and maximum values '
+        'per pixel.')
+    return parser
+
+
+def message_from_args(args):
+    '''
+    Create a request from client arguments.
+
+    :rtype: dict
+    '''
+    message = {'command': args.command}
+    if args.command not in ('convert', 'render'):
+        return message
+    aircraft_info = {
+        'Frame Doubled': args.frame_doubled,
+        'Stretched': args.stretched,
+    }
+    if args.tail_number:
+        aircraft_info['Tail Number'] = args.tail_number
+    message.update({
+        'lfl_path': os.path.abspath(args.lfl_path),
+        'data_path': os.path.abspath(args.data_path),
+        'image_format': args.image_format,
+        'superframes_in_memory': args.superframes_in_memory,
+        'aircraft_info': aircraft_info,
+        'percent_start': args.percent_start,
+        'percent_stop': args.percent_stop,
+        'decimate': args.decimate,
+    })
+    for name in ('output_path', 'image_path'):
+        if getattr(args, name):
+            message[name] = os.path.abspath(getattr(args, name))
+    return message
+
+
+def main():
+    parser = create_parser()
+    args = parser.parse_args()
+    if args.command in ('convert', 'render') and \
+       not (args.lfl_path and args.data_path):
+        parser.error('lfl_path and data_path are required with %s.'
+                     % args.command)
+    try:
+        response = request(args.socket_path, message_from_args(args))
+    except DaemonError as err:
+        print >> sys.stderr, err
+        sys.exit(2)
+    for title, message in response.get('errors', []):
+        print >> sys.stderr, '%s: %s' % (title, message)
+    if response.get('status') != 'ok':
+        print >> sys.stderr, response.get('message', 'Job failed.')
+        sys.exit(1)
+    for name in ('output_path', 'image_path'):
+        if name in response:
+            print response[name]
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+Reduce the number of points drawn for long arrays while preserving their
+appearance at screen resolution.
+'''
+
+import numpy as np
+
+
+# Arrays shorter than this many points per bucket are not decimated.
+MIN_POINTS_PER_BUCKET = 4
+
+
+def minmax_decimate(array, buckets):
+    '''
+    Split the array into buckets (typically one per pixel) and keep the
+    minimum and maximum value within each bucket in their original order so
+    that spikes are preserved.
+
+    Masked values are preserved as gaps: a masked point is placed at the
+    position of the first masked sample within a bucket, and buckets which
+    are entirely masked are returned masked.
+
+    :param array: Array to decimate.
+    :type array: np.ma.MaskedArray
+    :param buckets: Number of buckets, e.g. width of the axis in pixels.
+    :type buckets: int
+    :returns: Indices of the points within the original array and their
+        values.
+    :rtype: (np.ndarray, np.ma.MaskedArray)
+    '''
+    array = np.ma.asarray(array)
+    length = len(array)
+    if buckets <= 0 or length < buckets * MIN_POINTS_PER_BUCKET:
+        return np.arange(length), array
+
+    size = int(np.ceil(length / float(buckets)))
+    count = int(np.ceil(length / float(size)))
+    pad = count * size - length
+    data = np.ma.getdata(array)
+    mask = np.ma.getmaskarray(array)
+    if pad:
+        data = np.concatenate([data, np.zeros(pad, dtype=data.dtype)])
+        mask = np.concatenate([mask, np.ones(pad, dtype=np.bool_)])
+    data = data.reshape(count, size)
+    mask = mask.reshape(count, size)
+
+    rows = np.arange(count)
+    mins = np.where(mask, np.inf, data).argmin(axis=1)
+    maxs = np.where(mask, -np.inf, data).argmax(axis=1)
+    any_masked = mask.any(axis=1)
+    all_masked = mask.all(axis=1)
+    # Without masked samples the gap point duplicates the maximum.
+    gaps = np.where(any_masked, mask.argmax(axis=1), maxs)
+
+    indices = np.column_stack([mins, maxs, gaps])
+    point_mask = np.zeros(indices.shape, dtype=np.bool_)
+    point_mask[:, 2] = any_masked
+    point_mask[all_masked] = True
+
+    # Order the three points within each bucket by position.
+    order = indices.argsort(axis=1, kind='mergesort')
+    indices = indices[rows[:, np.newaxis], order]
+    point_mask = point_mask[rows[:, np.newaxis], order]
+    values = data[rows[:, np.newaxis], indices]
+
+    indices = (indices + (rows * size)[:, np.newaxis]).ravel()
+    values = np.ma.array(values.ravel(), mask=point_mask.ravel())
+    # Padding is masked so may only be selected within masked points.
+    valid = indices < length
+    return indices[valid], values[valid]
@@ -0,0 +1,423 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+Locating ARINC 717 frames within raw data files.
+
+Raw data is stored as little-endian 16-bit words of which the lower 12 bits
+hold the ARINC 717 word. Each of the four subframes within a frame starts
+with a sync word, and a superframe consists of 16 frames which are numbered
+by the superframe counter.
+'''
+
+import os
+
+import numpy as np
+
+
+# Sync words at the start of subframes 1 to 4.
+SYNC_WORDS = (0x247, 0x5B8, 0xA47, 0xDB8)
+# Subframe sizes in words (words per second) which are searched for.
+WORDS_PER_SECOND = (32, 64, 128, 256, 512, 1024, 2048)
+SUBFRAMES_PER_FRAME = len(SYNC_WORDS)
+FRAMES_PER_SUPERFRAME = 16
+# Raw data word size.
+WORD_SIZE = 2
+# Words scanned at a time to bound memory usage.
+SCAN_BLOCK_WORDS = 16 * 1024 * 1024
+# Frame setting locating the superframe counter within LFLs, e.g. 1:2:4-1
+# for bits 4 to 1 of word 2 of subframe 1.
+COUNTER_LOCATION_SETTING = 'Superframe Counter Location'
+# Parameter which may define the superframe counter's Location and Bits
+# instead.
+COUNTER_PARAMETER = 'Superframe Counter'
+
+
+def open_words(path):
+    '''
+    Memory map a raw data file as 16-bit words.
+
+    :rtype: np.memmap
+    '''
+    return np.memmap(path, dtype='<u2', mode='r')
+
+
+def _sync_candidates(words, block_words=SCAN_BLOCK_WORDS):
+    '''
+    Word offsets of the first subframe's sync word, scanning the array in
+    blocks so that only one block's comparison is held in memory.
+    '''
+    candidates = []
+    for start in xrange(0, len(words), block_words):
+        block = words[start:start + block_words]
+        candidates.append(
+            np.flatnonzero((block & 0xFFF) == SYNC_WORDS[0]) + start)
+    if not candidates:
+        return np.array([], dtype=np.int64)
+    return np.concatenate(candidates).astype(np.int64)
+
+
+def _valid_frames(words, candidates, wps):
+    '''
+    Candidates which are followed by the sync words of subframes 2 to 4 at
+    wps word intervals.
+    '''
+    candidates = candidates[
+        candidates + (SUBFRAMES_PER_FRAME - 1) * wps < len(words)]
+    valid = np.ones(len(candidates), dtype=np.bool_)
+    for subframe in xrange(1, SUBFRAMES_PER_FRAME):
+        valid &= (words[candidates + subframe * wps] & 0xFFF) == \
+            SYNC_WORDS[subframe]
+    return candidates[valid]
+
+
+def find_frames(words, wps=None, block_words=SCAN_BLOCK_WORDS):
+    '''
+    Find the start of every frame within raw data words.
+
+    :param words: Raw data words, e.g. from open_words.
+    :type words: np.ndarray
+    :param wps: Words per second. Detected if not provided.
+    :type wps: int or None
+    :returns: Words per second (None if no frames were found) and word
+        offsets of the start of each frame.
+    :rtype: (int or None, np.ndarray)
+    '''
+    candidates = _sync_candidates(words, block_words=block_words)
+    if wps:
+        return wps, _valid_frames(words, candidates, wps)
+    best_wps, best_frames = None, np.array([], dtype=np.int64)
+    for test_wps in WORDS_PER_SECOND:
+        frames = _valid_frames(words, candidates, test_wps)
+        if len(frames) > len(best_frames):
+            best_wps, best_frames = test_wps, frames
+    return best_wps, best_frames
+
+
+def counter_location(config):
+    '''
+    Find the superframe counter within an LFL, either from the Frame
+    section's Superframe Counter Location or the first Location and the Bits
+    of the Superframe Counter parameter.
+
+    :param config: Parsed LFL.
+    :type config: configobj.ConfigObj or dict
+    :returns: Subframe and word of the counter and its highest and lowest
+        bits, each numbered from 1, or None if the LFL does not locate the
+        counter.
+    :rtype: (int, int, int, int) or None
+    '''
+    try:
+        setting = config['Frame'][COUNTER_LOCATION_SETTING]
+    except KeyError:
+        try:
+            parameter = config['Parameters'][COUNTER_PARAMETER]
+            location = parameter['Location']
+        except KeyError:
+            return None
+        if isinstance(location, (list, tuple)):
+            location = location[0]
+        setting = '%s:%s' % (location, parameter.get('Bits', '12-1'))
+    try:
+        subframe, word, bits = setting.split(':')
+        high, low = bits.split('-')
+        location = int(subframe), int(word), int(high), int(low)
+    except ValueError:
+        return None
+    subframe, word, high, low = location
+    if not (1 <= subframe <= SUBFRAMES_PER_FRAME and word >= 1 and
+            12 >= high >= low >= 1):
+        return None
+    return location
+
+
+def counter_values(words, frames, wps, counter):
+    '''
+    Read the superframe counter of each frame.
+
+    :param words: Raw data words, e.g. from open_words.
+    :type words: np.ndarray
+    :param frames: Word offsets of the start of each frame. Frames whose
+        counter is beyond the end of words must be excluded.
+    :type frames: np.ndarray
+    :param counter: Location of the counter from counter_location.
+    :type counter: (int, int, int, int)
+    :rtype: np.ndarray
+    '''
+    subframe, word, high, low = counter
+    values = words[frames + (subframe - 1) * wps + word - 1] & 0xFFF
+    return (values >> (low - 1)) & ((1 << (high - low + 1)) - 1)
+
+
+def superframe_starts(words, frames, wps, counter):
+    '''
+    Frame offsets which start a superframe according to the superframe
+    counter, which numbers the frames within each superframe. A frame starts
+    a superframe if its counter is a multiple of FRAMES_PER_SUPERFRAME and
+    the following frame's counter, if there is one, is one more, so that a
+    single corrupt counter does not start a superframe.
+
+    :param words: Raw data words, e.g. from open_words.
+    :type words: np.ndarray
+    :param frames: Word offsets of the start of each frame.
+    :type frames: np.ndarray
+    :param counter: Location of the counter from counter_location, or None
+        if it is unknown, in which case no superframes are found.
+    :type counter: (int, int, int, int) or None
+    :rtype: np.ndarray
+    '''
+    if counter is None or not len(frames):
+        return frames[:0]
+    subframe, word, _high, _low = counter
+    frames = frames[frames + (subframe - 1) * wps + word - 1 < len(words)]
+    position = counter_values(words, frames, wps, counter) % \
+        FRAMES_PER_SUPERFRAME
+    starts = position == 0
+    starts[:-1] &= position[1:] == 1
+    return frames[starts]
+
+
+def split_offsets(superframes, size, chunks):
+    '''
+    Split a file into byte ranges which start on superframe boundaries.
+
+    :param superframes: Word offsets of superframe starts.
+    :type superframes: np.ndarray
+    :param size: Size of the file in bytes.
+    :type size: int
+    :param chunks: Maximum number of ranges.
+    :type chunks: int
+    :returns: Start and stop byte offsets. The first range starts at 0 and
+        the last stops at size.
+    :rtype: list of (int, int)
+    '''
+    starts = superframes * WORD_SIZE
+    boundaries = [0]
+    for index in xrange(1, chunks):
+        target = size * index / chunks
+        position = np.searchsorted(starts, target)
+        if position < len(starts) and starts[position] > boundaries[-1]:
+            boundaries.append(int(starts[position]))
+    boundaries.append(size)
+    return zip(boundaries[:-1], boundaries[1:])
+
+
+def chunk_offsets(superframes, size, superframes_per_chunk):
+    '''
+    Split a file into byte ranges of a fixed number of superframes.
+
+    :param superframes: Word offsets of superframe starts.
+    :type superframes: np.ndarray
+    :param size: Size of the file in bytes.
+    :type size: int
+    :param superframes_per_chunk: Number of superframes within each range.
+    :type superframes_per_chunk: int
+    :returns: Start and stop byte offsets. The first range starts at 0 and
+        the last stops at size.
+    :rtype: list of (int, int)
+    '''
+    starts = superframes[superframes_per_chunk::superframes_per_chunk] * \
+        WORD_SIZE
+    boundaries = [0] + [int(start) for start in starts] + [size]
+    return zip(boundaries[:-1], boundaries[1:])
+
+
+# Appended to a raw data file's path to name its frame index.
+INDEX_EXTENSION = '.frames.npz'
+# Incremented when the index format changes.
+INDEX_VERSION = 2
+
+
+class FrameIndex(object):
+    '''
+    Byte offsets of the frames within a raw data file.
+    '''
+    def __init__(self, wps, frames, size, mtime):
+        '''
+        :param wps: Words per second, or None if no frames were found.
+        :type wps: int or None
+        :param frames: Byte offsets of the start of each frame.
+        :type frames: np.ndarray
+        :param size: Size of the indexed file in bytes.
+        :type size: int
+        :param mtime: Modification time of the indexed file.
+        :type mtime: float
+        '''
+        self.wps = wps
+        self.frames = frames
+        self.size = size
+        self.mtime = mtime
+
+    @classmethod
+    def build(cls, path):
+        '''
+        Index a raw data file by scanning it for sync words.
+
+        :rtype: FrameIndex
+        '''
+        stat = os.stat(path)
+        if stat.st_size < WORD_SIZE:
+            return cls(None, np.array([], dtype=np.int64), stat.st_size,
+                       stat.st_mtime)
+        wps, frames = find_frames(open_words(path))
+        return cls(wps, frames * WORD_SIZE, stat.st_size, stat.st_mtime)
+
+    @classmethod
+    def load(cls, index_path):
+        '''
+        :rtype: FrameIndex
+        :raises ValueError: If the index is of a different version.
+        '''
+        with np.load(index_path) as index:
+            if int(index['version']) != INDEX_VERSION:
+                raise ValueError('Frame index version %s is not supported.'
+                                 % index['version'])
+            return cls(int(index['wps']) or None, index['frames'],
+                       int(index['size']), float(index['mtime']))
+
+    def save(self, index_path):
+        '''
+        Write the index, replacing any existing file once complete.
+        '''
+        temp_path = index_path + '.part'
+        with open(temp_path, 'wb') as index_file:
+            np.savez(index_file, version=INDEX_VERSION, wps=self.wps or 0,
+                     frames=self.frames, size=self.size, mtime=self.mtime)
+        if os.path.exists(index_path):
+            os.remove(index_path)
+        os.rename(temp_path, index_path)
+
+    def matches(self, path):
+        '''
+        :returns: Whether the index is up to date with the file at path.
+        :rtype: bool
+        '''
+        stat = os.stat(path)
+        return stat.st_size == self.size and stat.st_mtime == self.mtime
+
+    def superframes(self, path, counter):
+        '''
+        Find the superframes within the indexed file from their counter (see
+        superframe_starts).
+
+        :param path: Path of the indexed raw data file.
+        :type path: str
+        :param counter: Location of the counter from counter_location.
+        :type counter: (int, int, int, int) or None
+        :returns: Byte offsets of the start of each superframe.
+        :rtype: np.ndarray
+        '''
+        if not self.wps:
+            return self.frames[:0]
+        return superframe_starts(open_words(path), self.frames // WORD_SIZE,
+                                 self.wps, counter) * WORD_SIZE
+
+    def frame_count(self, start, stop):
+        '''
+        :returns: Number of frames starting within a byte range.
+        :rtype: int
+        '''
+        return int(np.searchsorted(self.frames, stop) -
+                   np.searchsorted(self.frames, start))
+
+    def boundary_at(self, offset, boundaries=None):
+        '''
+        :param offset: Byte offset.
+        :type offset: int
+        :param boundaries: Byte offsets of boundaries, by default the start
+            of each frame.
+        :type boundaries: np.ndarray or None
+        :returns: Byte offset of the first boundary at or after offset, or
+            the file size if there is none.
+        :rtype: int
+        '''
+        if boundaries is None:
+            boundaries = self.frames
+        position = np.searchsorted(boundaries, offset)
+        if position < len(boundaries):
+            return int(boundaries[position])
+        return self.size
+
+    def boundary_before(self, offset, boundaries=None):
+        '''
+        :param offset: Byte offset.
+        :type offset: int
+        :param boundaries: Byte offsets of boundaries, by default the start
+            of each frame.
+        :type boundaries: np.ndarray or None
+        :returns: Byte offset of the last boundary at or before offset, or 0
+            if there is none.
+        :rtype: int
+        '''
+        if boundaries is None:
+            boundaries = self.frames
+        position = np.searchsorted(boundaries, offset, side='right') - 1
+        if position >= 0:
+            return int(boundaries[position])
+        return 0
+
+    def part_range(self, percent_start, percent_stop, boundaries=None):
+        '''
+        Byte range of a percentage of the file which starts and stops on
+        boundaries. The range is widened to the boundaries either side, so
+        it contains the whole percentage and is never empty if percent_stop
+        is greater than percent_start.
+
+        :param boundaries: Byte offsets of boundaries, by default the start
+            of each frame. Superframes (see superframes) may be used if the
+            superframe counter is known.
+        :type boundaries: np.ndarray or None
+        :returns: Byte offset and amount, or None if there are no boundaries.
+        :rtype: (int, int) or None
+        '''
+        if boundaries is None:
+            boundaries = self.frames
+        if not len(boundaries):
+            return None
+        if percent_start <= 0:
+            start = 0
+        else:
+            start = self.boundary_before(self.size * percent_start // 100,
+                                         boundaries)
+        if percent_stop >= 100:
+            stop = self.size
+        else:
+            stop = self.boundary_at(self.size * percent_stop // 100,
+                                    boundaries)
+        if stop <= start and percent_stop > percent_start:
+            # Both percentages round to the same boundary.
+            stop = self.boundary_at(start + 1, boundaries)
+        return start, max(stop - start, 0)
+
+
+def index_path(path):
+    '''
+    :returns: Path of the frame index of a raw data file.
+    :rtype: str
+    '''
+    return path + INDEX_EXTENSION
+
+
+def open_index(path):
+    '''
+    Load the frame index of a raw data file, building and saving it if it does
+    not exist or is out of date. The index is not saved if the directory is
+    not writable.
+
+    :rtype: FrameIndex
+    '''
+    sidecar_path = index_path(path)
+    if os.path.isfile(sidecar_path):
+        try:
+            index = FrameIndex.load(sidecar_path)
+        except Exception as err:
+            print 'Rebuilding invalid frame index %s: %s' % (sidecar_path, err)
+        else:
+            if index.matches(path):
+                return index
+    index = FrameIndex.build(path)
+    try:
+        index.save(sidecar_path)
+    except (IOError, OSError) as err:
+        print 'Could not save frame index %s: %s' % (sidecar_path, err)
+    return index
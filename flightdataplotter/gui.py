@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+wxPython windows and dialogs. This module is only imported once a window is
+needed so that processing and rendering do not require wxPython or a display.
+'''
+
+import sys
+import wx
+
+import matplotlib.pyplot as plt
+
+
+_app = None
+
+
+def get_app():
+    '''
+    Create the wx application and switch matplotlib to the WXAgg backend on
+    first use.
+
+    :rtype: wx.App
+    '''
+    global _app
+    if _app is None:
+        _app = wx.PySimpleApp()
+        plt.switch_backend('WXAgg')
+    return _app
+
+
+def call_after(function, *args):
+    '''
+    Call a function from the main loop's thread, e.g. to wake a window's
+    event loop from another thread.
+    '''
+    wx.CallAfter(function, *args)
+
+
+class Frame(wx.Frame):
+    '''
+    There a built-in message dialogs which display a message, but they were
+    freezing due to the application's threading model.
+    '''
+    def __init__(self, title, message):
+        wx.Frame.__init__(self, None, title=title)
+        #self.Bind(wx.EVT_CLOSE, self.OnClose)
+        panel = wx.Panel(self)
+        box = wx.BoxSizer(wx.VERTICAL)
+
+        m_text = wx.StaticText(panel, -1, message, size=(340, 100),
+                               style=wx.TE_MULTILINE)
+        m_text.SetSize(m_text.GetBestSize())
+        button = wx.Button(panel, label='OK')
+        button.SetDefault()
+        button.Bind(wx.EVT_BUTTON, self.OnClose)
+        box.Add(m_text, flag=wx.ALL)
+        box.Add(button, flag=wx.EXPAND)
+
+        panel.SetSizerAndFit(box)
+        self.Layout()
+        self.Fit()
+
+    def OnClose(self, event):
+        self.Destroy()
+
+
+def show_error_dialog(title, message, block=True):
+    '''
+    Show error.
+
+    :param block: Run the main loop until the dialog is closed. Otherwise the
+        caller must process events, e.g. while a plot window is open.
+    :type block: bool
+    '''
+    app = get_app()
+    frame = Frame(title, message)
+    frame.Show()
+    if block:
+        app.MainLoop()
+
+
+def lfl_file_dialog():
+    #TOOD: Remember last directory accessed!
+    get_app()
+    lfl_dialog = wx.FileDialog(None, message="Please choose an LFL file",
+                               defaultDir='',
+                               wildcard="*.lfl")
+    if lfl_dialog.ShowModal() == wx.ID_OK:
+        lfl_path = lfl_dialog.GetPath()
+    else:
+        show_error_dialog('Error!', 'An LFL file must be selected.')
+        sys.exit(1)
+    return lfl_path
+
+
+def data_file_dialog():
+    get_app()
+    data_dialog = wx.FileDialog(None, message="Please choose a raw data file",
+                                defaultDir='',
+                                wildcard="*.*")
+    if data_dialog.ShowModal() == wx.ID_OK:
+        data_path = data_dialog.GetPath()
+    else:
+        show_error_dialog('Error!', 'A raw data file must be selected.')
+        sys.exit(1)
+    return data_path
@@ -0,0 +1,386 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+Helpers for reading and manipulating the HDF files written by
+compass.arinc717.hdf directly with h5py.
+'''
+
+import json
+import os
+
+import h5py
+import numpy as np
+
+
+# Group within the HDF file which contains a sub-group per parameter.
+SERIES = 'series'
+# Prefix of parameter attributes holding the summary from write_summaries.
+SUMMARY_PREFIX = 'summary_'
+# Samples read at a time when summarising a parameter.
+SUMMARY_CHUNK_SIZE = 1024 * 1024
+# Seconds by which durations of parameters may differ due to rounding.
+DURATION_TOLERANCE = 1e-6
+
+
+def param_names(hdf_path):
+    '''
+    Names of the parameters stored within an HDF file.
+
+    :param hdf_path: Path of HDF file.
+    :type hdf_path: str
+    :returns: Parameter names, or an empty set if the file does not exist or
+        cannot be read.
+    :rtype: set
+    '''
+    if not os.path.isfile(hdf_path):
+        return set()
+    try:
+        with h5py.File(hdf_path, 'r') as hdf:
+            if SERIES not in hdf:
+                return set()
+            return set(hdf[SERIES].keys())
+    except (IOError, OSError):
+        return set()
+
+
+def copy_params(src_path, dest_path, names):
+    '''
+    Copy parameter groups (datasets and attributes) from one HDF file into
+    another, replacing any parameters of the same name in the destination.
+
+    :param src_path: Path of HDF file to copy parameters from.
+    :type src_path: str
+    :param dest_path: Path of HDF file to copy parameters into.
+    :type dest_path: str
+    :param names: Names of parameters to copy.
+    :type names: iterable of str
+    '''
+    with h5py.File(src_path, 'r') as src, h5py.File(dest_path, 'a') as dest:
+        src_series = src[SERIES]
+        dest_series = dest.require_group(SERIES)
+        for name in names:
+            if name in dest_series:
+                del dest_series[name]
+            src.copy(src_series[name], dest_series, name=name)
+
+
+def replace_file(src_path, dest_path):
+    '''
+    Move src_path over dest_path. os.rename will not replace an existing file
+    on Windows.
+    '''
+    if os.path.exists(dest_path):
+        os.remove(dest_path)
+    os.rename(src_path, dest_path)
+
+
+def _durations(series):
+    '''
+    :returns: Duration in seconds of each parameter within a series group.
+    :rtype: list of float
+    '''
+    return [len(group['data']) / float(group.attrs.get('frequency', 1))
+            for group in series.itervalues()]
+
+
+def _section_duration(series):
+    '''
+    Duration in seconds covered by every parameter within a series group.
+
+    :raises ValueError: If parameters cover different durations, e.g.
+        because the section did not stop on a superframe boundary.
+    '''
+    durations = _durations(series)
+    if not durations:
+        return 0
+    if max(durations) - min(durations) > DURATION_TOLERANCE:
+        raise ValueError('Parameters cover between %s and %s seconds.'
+                         % (min(durations), max(durations)))
+    return durations[0]
+
+
+def summarise_group(group, chunk_size=SUMMARY_CHUNK_SIZE):
+    '''
+    Summarise a parameter's array in a single pass, reading a chunk of
+    samples at a time.
+
+    The summary contains the length, the number of unmasked samples
+    (valid_count), whether every sample is masked (all_masked) and, if any
+    are unmasked, the indices of the first and last unmasked samples
+    (first_valid and last_valid). The minimum and maximum (min and max) of
+    unmasked finite values are included for numeric arrays.
+
+    :param group: Parameter group within an HDF file.
+    :type group: h5py.Group
+    :rtype: dict
+    '''
+    data = group['data']
+    mask = group['mask'] if 'mask' in group else None
+    length = len(data)
+    numeric = data.dtype.kind in 'biuf'
+    summary = {'length': length, 'valid_count': 0}
+    minimum = maximum = None
+    for start in xrange(0, length, chunk_size):
+        stop = min(start + chunk_size, length)
+        if mask is None:
+            valid = np.ones(stop - start, dtype=np.bool_)
+        else:
+            valid = ~mask[start:stop].astype(np.bool_)
+        indices = np.flatnonzero(valid)
+        if not len(indices):
+            continue
+        if 'first_valid' not in summary:
+            summary['first_valid'] = start + int(indices[0])
+        summary['last_valid'] = start + int(indices[-1])
+        summary['valid_count'] += len(indices)
+        if not numeric:
+            continue
+        values = data[start:stop][valid]
+        if data.dtype.kind == 'f':
+            values = values[np.isfinite(values)]
+        if not len(values):
+            continue
+        chunk_min, chunk_max = values.min(), values.max()
+        minimum = chunk_min if minimum is None else min(minimum, chunk_min)
+        maximum = chunk_max if maximum is None else max(maximum, chunk_max)
+    summary['all_masked'] = not summary['valid_count']
+    if minimum is not None:
+        summary['min'] = float(minimum)
+        summary['max'] = float(maximum)
+    return summary
+
+
+def write_summaries(hdf_path, names=None, chunk_size=SUMMARY_CHUNK_SIZE):
+    '''
+    Store a summary (see summarise_group) of parameters as attributes
+    prefixed with SUMMARY_PREFIX, so that plotting can make decisions without
+    reading whole arrays. Existing summaries are replaced, so names should
+    include every parameter which has been written since it was last
+    summarised.
+
+    :param hdf_path: Path of HDF file.
+    :type hdf_path: str
+    :param names: Names of parameters to summarise, by default every
+        parameter. Names which are not within the file are ignored.
+    :type names: iterable of str or None
+    :returns: Names of parameters which were summarised.
+    :rtype: list of str
+    '''
+    summarised = []
+    with h5py.File(hdf_path, 'r+') as hdf:
+        series = hdf[SERIES]
+        if names is None:
+            names = series.keys()
+        for name in names:
+            if name not in series:
+                continue
+            group = series[name]
+            for key, value in summarise_group(group,
+                                              chunk_size).iteritems():
+                group.attrs[SUMMARY_PREFIX + key] = value
+            summarised.append(name)
+    return summarised
+
+
+def concatenate_files(hdf_paths, output_path, expected_durations=None):
+    '''
+    Concatenate the parameters of HDF files processed from consecutive
+    sections of a data file, which start on superframe boundaries, into a
+    single HDF file.
+
+    Every parameter of each file but the last must cover the same duration,
+    otherwise parameters of different frequencies would no longer be aligned
+    after concatenation. The last file may end part way through a
+    superframe, as does a single pass over the whole data file. Samples are
+    never dropped. File and parameter attributes are taken from the first
+    file.
+
+    :param hdf_paths: Paths of HDF files in time order.
+    :type hdf_paths: list of str
+    :param output_path: Path of HDF file to create.
+    :type output_path: str
+    :param expected_durations: Expected duration in seconds of each file,
+        e.g. from the number of frames within each section, or None where
+        unknown.
+    :type expected_durations: list of float or None
+    :raises ValueError: If the files cannot be concatenated without
+        misaligning parameters. The output file is not created.
+    '''
+    hdfs = [h5py.File(path, 'r') for path in hdf_paths]
+    try:
+        serieses = [hdf[SERIES] for hdf in hdfs]
+        names = set(serieses[0])
+        durations = []
+        for index, series in enumerate(serieses):
+            if set(series) != names:
+                raise ValueError('Section %d contains different parameters.'
+                                 % index)
+            if index == len(serieses) - 1:
+                duration = max(_durations(series) or [0])
+            else:
+                try:
+                    duration = _section_duration(series)
+                except ValueError as err:
+                    raise ValueError('Section %d is misaligned: %s'
+                                     % (index, err))
+            expected = expected_durations[index] if expected_durations \
+                else None
+            if expected is not None and \
+                    abs(duration - expected) > DURATION_TOLERANCE:
+                raise ValueError('Section %d covers %s seconds rather than '
+                                 '%s.' % (index, duration, expected))
+            durations.append(duration)
+        with h5py.File(output_path, 'w') as output:
+            for key, value in hdfs[0].attrs.iteritems():
+                output.attrs[key] = value
+            if 'duration' in output.attrs:
+                output.attrs['duration'] = sum(durations)
+            output_series = output.create_group(SERIES)
+            for name, first_group in serieses[0].iteritems():
+                group = output_series.create_group(name)
+                for key, value in first_group.attrs.iteritems():
+                    # Summaries of the first file do not apply to the whole.
+                    if not key.startswith(SUMMARY_PREFIX):
+                        group.attrs[key] = value
+                for dataset_name, first_dataset in first_group.iteritems():
+                    if dataset_name not in ('data', 'mask'):
+                        hdfs[0].copy(first_dataset, group, name=dataset_name)
+                        continue
+                    # One parameter is held in memory at a time.
+                    arrays = [series[name][dataset_name][:]
+                              for series in serieses]
+                    group.create_dataset(
+                        dataset_name, data=np.concatenate(arrays),
+                        compression=first_dataset.compression,
+                        compression_opts=first_dataset.compression_opts)
+    finally:
+        for hdf in hdfs:
+            hdf.close()
+
+
+def delete_params(hdf_path, names):
+    '''
+    Remove parameter groups from an HDF file. The space used is not
+    reclaimed until the file is next rewritten.
+
+    :param hdf_path: Path of HDF file.
+    :type hdf_path: str
+    :param names: Names of parameters to remove.
+    :type names: iterable of str
+    '''
+    with h5py.File(hdf_path, 'a') as hdf:
+        series = hdf[SERIES]
+        for name in names:
+            if name in series:
+                del series[name]
+
+
+class LazyParameter(object):
+    '''
+    A parameter stored within an HDF file whose array is only read when first
+    accessed. The HDF file is not held open between reads so that it can be
+    rewritten while the parameter is in use.
+
+    Provides the attributes of hdfaccess.parameter.Parameter used for
+    plotting and alignment.
+    '''
+    def __init__(self, hdf_path, name, attrs, size, dtype=None):
+        '''
+        :param hdf_path: Path of HDF file.
+        :type hdf_path: str
+        :param name: Name of parameter.
+        :type name: str
+        :param attrs: Attributes of the parameter's group.
+        :type attrs: dict
+        :param size: Number of samples stored.
+        :type size: int
+        :param dtype: Type of the stored data.
+        :type dtype: np.dtype or None
+        '''
+        self.hdf_path = hdf_path
+        self.name = name
+        self.size = size
+        self.dtype = dtype
+        # Stored by write_summaries, otherwise None.
+        self.summary = dict(
+            (k[len(SUMMARY_PREFIX):], v) for k, v in attrs.iteritems()
+            if k.startswith(SUMMARY_PREFIX)) or None
+        self.frequency = attrs.get('frequency', 1)
+        self.offset = attrs.get('supf_offset', 0)
+        self.units = attrs.get('units')
+        self.data_type = attrs.get('data_type')
+        self.values_mapping = None
+        if 'values_mapping' in attrs:
+            self.values_mapping = dict(
+                (int(k), v) for k, v in
+                json.loads(attrs['values_mapping']).iteritems())
+        self._array = None
+
+    def __repr__(self):
+        return '%s(%r, %sHz, %d samples)' % (
+            self.__class__.__name__, self.name, self.frequency, self.size)
+
+    @property
+    def hz(self):
+        return self.frequency
+
+    @property
+    def array(self):
+        if self._array is None:
+            self._array = self.read()
+        return self._array
+
+    @array.setter
+    def array(self, array):
+        if array is not None:
+            # The summary describes the stored array, e.g. not a truncated
+            # copy.
+            self.summary = None
+        self._array = array
+
+    def read(self, start=None, stop=None):
+        '''
+        Read the parameter's array, or a slice of it, from the HDF file.
+
+        :param start: Index of the first sample to read.
+        :type start: int or None
+        :param stop: Index to read up until.
+        :type stop: int or None
+        :rtype: np.ma.MaskedArray or hdfaccess.parameter.MappedArray
+        '''
+        window = slice(start, stop)
+        with h5py.File(self.hdf_path, 'r') as hdf:
+            group = hdf[SERIES][self.name]
+            data = group['data'][window]
+            mask = group['mask'][window] if 'mask' in group else False
+        if self.values_mapping:
+            from hdfaccess.parameter import MappedArray
+            return MappedArray(data, mask=mask,
+                               values_mapping=self.values_mapping)
+        return np.ma.array(data, mask=mask)
+
+
+def load_params(hdf_path, names):
+    '''
+    Open parameters within an HDF file without reading their arrays.
+
+    :param hdf_path: Path of HDF file.
+    :type hdf_path: str
+    :param names: Names of parameters to open. Names not within the file are
+        ignored.
+    :type names: iterable of str
+    :returns: Parameters keyed by name.
+    :rtype: dict of LazyParameter
+    '''
+    params = {}
+    with h5py.File(hdf_path, 'r') as hdf:
+        series = hdf[SERIES]
+        for name in names:
+            if name not in series:
+                continue
+            group = series[name]
+            data = group['data']
+            params[name] = LazyParameter(hdf_path, name, dict(group.attrs),
+                                         len(data), dtype=data.dtype)
+    return params
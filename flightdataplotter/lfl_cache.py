@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+Caching of parse_lfl results keyed by the content of the LFL and the
+arguments it is parsed with.
+'''
+
+import cPickle
+import hashlib
+import json
+import os
+import tempfile
+
+from collections import OrderedDict
+
+
+DEFAULT_CACHE_DIR = os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.join(
+        os.path.expanduser('~'), '.cache'),
+    'FlightDataPlotter', 'lfl')
+# Total size of cached files before the least recently used are removed.
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+CACHE_EXTENSION = '.pickle'
+
+
+def cache_key(lfl_path, param_names, aircraft_info):
+    '''
+    Key identifying the result of parsing an LFL.
+
+    :param lfl_path: Path of LFL file.
+    :type lfl_path: str
+    :param param_names: Names of parameters to parse.
+    :type param_names: iterable of str
+    :param aircraft_info: Aircraft info passed to parse_lfl.
+    :type aircraft_info: dict
+    :rtype: str
+    '''
+    digest = hashlib.sha1()
+    with open(lfl_path, 'rb') as lfl_file:
+        digest.update(lfl_file.read())
+    digest.update(json.dumps(
+        [sorted(param_names or []), aircraft_info], sort_keys=True))
+    return digest.hexdigest()
+
+
+def _parse_lfl(lfl_path, param_names, aircraft_info):
+    from compass.arinc717.data_frame_parser import parse_lfl
+    return parse_lfl(lfl_path, param_names=param_names,
+                     aircraft_info=aircraft_info)
+
+
+def _parser_version():
+    '''
+    :returns: Version of compass, which determines the parsed objects.
+    :rtype: str
+    '''
+    try:
+        import compass
+    except ImportError:
+        return ''
+    return str(getattr(compass, '__version__', ''))
+
+
+class MemoryLFLCache(object):
+    '''
+    Least recently used in-memory cache of parse_lfl results. The parsed
+    objects are shared between callers.
+    '''
+    def __init__(self, max_entries=16):
+        '''
+        :param max_entries: Maximum number of parsed LFLs to keep.
+        :type max_entries: int
+        '''
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def parse(self, lfl_path, param_names, aircraft_info):
+        '''
+        Equivalent to parse_lfl, returning a cached result if the LFL content
+        and arguments are unchanged.
+
+        :returns: LFL parser and parameter list.
+        :rtype: tuple
+        '''
+        key = cache_key(lfl_path, param_names, aircraft_info)
+        try:
+            result = self._entries.pop(key)
+        except KeyError:
+            result = self._miss(key, lfl_path, param_names, aircraft_info)
+        self._entries[key] = result
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return result
+
+    def _miss(self, key, lfl_path, param_names, aircraft_info):
+        return _parse_lfl(lfl_path, param_names, aircraft_info)
+
+
+class DiskLFLCache(MemoryLFLCache):
+    '''
+    In-memory cache backed by pickled parse_lfl results within a directory,
+    so that results are reused between runs. Files are named by the cache
+    key and the least recently used are removed once their total size
+    exceeds max_bytes. Several processes may share the directory.
+    '''
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR,
+                 max_bytes=DEFAULT_MAX_BYTES, max_entries=16):
+        '''
+        :param cache_dir: Directory to store parsed LFLs within.
+        :type cache_dir: str
+        :param max_bytes: Maximum total size of cached files.
+        :type max_bytes: int
+        '''
+        super(DiskLFLCache, self).__init__(max_entries=max_entries)
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._version = None
+
+    def _path(self, key):
+        if self._version is None:
+            self._version = _parser_version()
+        # Results of other compass versions are not reused.
+        key = hashlib.sha1(key + self._version).hexdigest()
+        return os.path.join(self.cache_dir, key + CACHE_EXTENSION)
+
+    def _miss(self, key, lfl_path, param_names, aircraft_info):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as cache_file:
+                result = cPickle.load(cache_file)
+        except IOError:
+            pass
+        except Exception as err:
+            # Written by an incompatible version or truncated.
+            print 'Ignoring invalid LFL cache file %s: %s' % (path, err)
+            self._remove(path)
+        else:
+            # Mark as recently used.
+            try:
+                os.utime(path, None)
+            except OSError:
+                pass
+            return result
+        result = _parse_lfl(lfl_path, param_names, aircraft_info)
+        self._store(path, result)
+        return result
+
+    def _store(self, path, result):
+        try:
+            if not os.path.isdir(self.cache_dir):
+                os.makedirs(self.cache_dir)
+            fd, temp_path = tempfile.mkstemp(dir=self.cache_dir,
+                                             suffix='.tmp')
+        except OSError as err:
+            print 'Could not write LFL cache: %s' % err
+            return
+        try:
+            with os.fdopen(fd, 'wb') as cache_file:
+                cPickle.dump(result, cache_file, cPickle.HIGHEST_PROTOCOL)
+            os.rename(temp_path, path)
+        except Exception as err:
+            print 'Could not write LFL cache: %s' % err
+            self._remove(temp_path)
+            return
+        self.evict()
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def evict(self):
+        '''
+        Remove the least recently used files until the total size is within
+        max_bytes.
+        '''
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(CACHE_EXTENSION):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                # Removed by another process.
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _mtime, size, _path in entries)
+        for _mtime, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
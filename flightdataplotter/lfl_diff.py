@@ -0,0 +1,192 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+Detecting which parameters have changed between saves of an LFL.
+
+Each parameter definition, the parameter groups each parameter belongs to and
+the frame-level settings (every section other than Parameters and Parameter
+Group, the Superframe Counter parameter, which every parameter is decoded
+with, plus the aircraft info) are reduced to content hashes. Comparing the
+indexes of two versions of an LFL yields the parameters which were added,
+removed or changed.
+
+StaleParams accumulates these changes between successful writes of the HDF
+file to decide which parameters an incremental update must reprocess.
+'''
+
+import hashlib
+import json
+
+from collections import namedtuple
+
+
+PARAMETERS = 'Parameters'
+PARAMETER_GROUP = 'Parameter Group'
+# Parameter which locates superframes, so changing it may alter every
+# parameter.
+SUPERFRAME_COUNTER = 'Superframe Counter'
+
+
+# frame_hash: hash of frame-level settings and aircraft info.
+# param_hashes: hash of each parameter's definition keyed by name.
+# groups: names of the groups each parameter belongs to keyed by name.
+LFLIndex = namedtuple('LFLIndex', 'frame_hash param_hashes groups')
+
+# added, removed, changed and regrouped are sets of parameter names.
+# Parameters whose group membership changed are regrouped; they only need to
+# be replotted. If frame_changed, every parameter may have changed.
+LFLChanges = namedtuple(
+    'LFLChanges', 'added removed changed regrouped frame_changed')
+
+# Names of parameters to process, to keep from the existing HDF file and to
+# remove from it (see plan_update).
+UpdatePlan = namedtuple('UpdatePlan', 'process keep remove')
+
+
+def content_hash(value):
+    '''
+    :param value: Config section or value.
+    :rtype: str
+    '''
+    return hashlib.md5(
+        json.dumps(value, sort_keys=True, default=repr)).hexdigest()
+
+
+def _group_members(groups):
+    '''
+    :returns: Names of the groups each parameter belongs to.
+    :rtype: dict of str -> frozenset
+    '''
+    members = {}
+    for group_name, param_names in groups.iteritems():
+        # Force a single entry to look like a list.
+        if not hasattr(param_names, '__iter__'):
+            param_names = [param_names]
+        for param_name in param_names:
+            members.setdefault(param_name, set()).add(group_name)
+    return dict((k, frozenset(v)) for k, v in members.iteritems())
+
+
+def index_config(config, aircraft_info=None):
+    '''
+    Index an LFL's content.
+
+    :param config: Parsed LFL.
+    :type config: configobj.ConfigObj or dict
+    :param aircraft_info: Aircraft info applied when parsing the LFL.
+    :type aircraft_info: dict or None
+    :rtype: LFLIndex
+    '''
+    frame_config = dict((k, v) for k, v in config.iteritems()
+                        if k not in (PARAMETERS, PARAMETER_GROUP))
+    frame_config['Aircraft Info'] = aircraft_info
+    frame_config[SUPERFRAME_COUNTER] = config.get(PARAMETERS, {}).get(
+        SUPERFRAME_COUNTER)
+    param_hashes = dict(
+        (name, content_hash(section))
+        for name, section in config.get(PARAMETERS, {}).iteritems())
+    return LFLIndex(content_hash(frame_config), param_hashes,
+                    _group_members(config.get(PARAMETER_GROUP, {})))
+
+
+def diff_index(old, new):
+    '''
+    Compare two LFL indexes.
+
+    :param old: Index of the previous version, or None if there is none (all
+        parameters are added).
+    :type old: LFLIndex or None
+    :type new: LFLIndex
+    :rtype: LFLChanges
+    '''
+    new_params = set(new.param_hashes)
+    if old is None:
+        return LFLChanges(new_params, set(), set(), set(), True)
+    old_params = set(old.param_hashes)
+    common = old_params & new_params
+    changed = set(name for name in common
+                  if old.param_hashes[name] != new.param_hashes[name])
+    regrouped = set(
+        name for name in set(old.groups) | set(new.groups)
+        if old.groups.get(name) != new.groups.get(name))
+    return LFLChanges(new_params - old_params, old_params - new_params,
+                      changed, regrouped, old.frame_hash != new.frame_hash)
+
+
+def plan_update(param_names, existing_params, stale_params):
+    '''
+    Plan an incremental update of an HDF file. Parameters are processed if
+    they are stale or not within the file, the others are kept and
+    parameters within the file which are no longer processed are removed.
+
+    :param param_names: Names of parameters to be processed.
+    :type param_names: iterable of str
+    :param existing_params: Names of parameters within the HDF file.
+    :type existing_params: iterable of str
+    :param stale_params: Names of parameters which have changed since the
+        HDF file was written.
+    :type stale_params: set
+    :rtype: UpdatePlan
+    '''
+    param_names = set(param_names)
+    existing_params = set(existing_params)
+    process = set(name for name in param_names
+                  if name in stale_params or name not in existing_params)
+    return UpdatePlan(process, param_names - process,
+                      existing_params - param_names)
+
+
+class StaleParams(object):
+    '''
+    Tracks which parameters of an HDF file are out of date with an LFL
+    across saves. Changes accumulate until the file has been written
+    successfully, so that processing which fails or is abandoned is retried.
+    '''
+    def __init__(self):
+        # Index of the LFL when it was last processed.
+        self.index = None
+        # Parameters changed since the HDF file was last written.
+        self.params = set()
+        # Whether frame-level settings have changed since then, in which case
+        # every parameter may have changed.
+        self.frame = True
+
+    def update(self, index):
+        '''
+        Record the latest version of the LFL.
+
+        :type index: LFLIndex
+        :returns: Changes since the previous version.
+        :rtype: LFLChanges
+        '''
+        changes = diff_index(self.index, index)
+        self.params |= changes.added | changes.changed
+        self.params -= changes.removed
+        self.frame = self.frame or changes.frame_changed
+        self.index = index
+        return changes
+
+    def plan(self, param_names, existing_params):
+        '''
+        Plan an incremental update of the HDF file (see plan_update).
+
+        :param param_names: Names of parameters to be processed.
+        :type param_names: iterable of str
+        :param existing_params: Names of parameters within the HDF file, or
+            None if there is no file to update.
+        :type existing_params: iterable of str or None
+        :returns: The plan, or None if the whole file must be written
+            because there is no file or frame-level settings have changed.
+        :rtype: UpdatePlan or None
+        '''
+        if existing_params is None or self.frame:
+            return None
+        return plan_update(param_names, existing_params, self.params)
+
+    def written(self):
+        '''
+        Mark every parameter as up to date once the HDF file is written.
+        '''
+        self.params.clear()
+        self.frame = False
@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+Choosing how many superframes are processed in memory before being written
+to the HDF file (--superframes-in-memory auto).
+
+The memory used per superframe is estimated from the number of raw data
+words and the number of samples of each parameter within a superframe. The
+batch size is chosen so that the batches of every worker process fit within
+a fraction of the memory which is currently available.
+'''
+
+import os
+import sys
+
+
+# Value of --superframes-in-memory which enables automatic sizing.
+AUTO = 'auto'
+# Value passed to create_hdf when the size cannot be estimated.
+DEFAULT_SUPERFRAMES_IN_MEMORY = -1
+# Fraction of available memory used by batches of superframes, leaving room
+# for the application, plotting and other processes.
+MEMORY_FRACTION = 0.25
+# Bytes held per parameter sample: float64 data and a boolean mask.
+SAMPLE_BYTES = 9
+# Words per second assumed if the data file's frames could not be found.
+DEFAULT_WPS = 1024
+
+
+def superframes_in_memory_arg(value):
+    '''
+    argparse type of --superframes-in-memory.
+
+    :param value: Command line value.
+    :type value: str
+    :returns: AUTO or number of superframes.
+    :rtype: str or int
+    '''
+    if value.lower() == AUTO:
+        return AUTO
+    return int(value)
+
+
+def _meminfo_available():
+    '''
+    :returns: Available memory in bytes according to /proc/meminfo (Linux).
+    :rtype: int or None
+    '''
+    try:
+        with open('/proc/meminfo') as meminfo:
+            lines = meminfo.readlines()
+    except IOError:
+        return None
+    fields = {}
+    for line in lines:
+        name, _sep, value = line.partition(':')
+        try:
+            fields[name] = int(value.split()[0]) * 1024
+        except (IndexError, ValueError):
+            continue
+    if 'MemAvailable' in fields:
+        return fields['MemAvailable']
+    # Kernels before 3.14 do not estimate available memory.
+    if 'MemFree' in fields:
+        return fields['MemFree'] + fields.get('Cached', 0)
+    return None
+
+
+def _windows_available():
+    '''
+    :returns: Available physical memory in bytes (Windows).
+    :rtype: int or None
+    '''
+    import ctypes
+
+    class MEMORYSTATUSEX(ctypes.Structure):
+        _fields_ = [('dwLength', ctypes.c_ulong),
+                    ('dwMemoryLoad', ctypes.c_ulong),
+                    ('ullTotalPhys', ctypes.c_ulonglong),
+                    ('ullAvailPhys', ctypes.c_ulonglong),
+                    ('ullTotalPageFile', ctypes.c_ulonglong),
+                    ('ullAvailPageFile', ctypes.c_ulonglong),
+                    ('ullTotalVirtual', ctypes.c_ulonglong),
+                    ('ullAvailVirtual', ctypes.c_ulonglong),
+                    ('ullAvailExtendedVirtual', ctypes.c_ulonglong)]
+
+    status = MEMORYSTATUSEX()
+    status.dwLength = ctypes.sizeof(MEMORYSTATUSEX)
+    if not ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+        return None
+    return status.ullAvailPhys
+
+
+def _sysconf_available():
+    '''
+    :returns: Free physical memory in bytes according to sysconf.
+    :rtype: int or None
+    '''
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def available_memory():
+    '''
+    Memory which can be used without swapping.
+
+    :returns: Available memory in bytes, or None if unknown.
+    :rtype: int or None
+    '''
+    if sys.platform == 'win32':
+        return _windows_available()
+    available = _meminfo_available()
+    if available is None:
+        available = _sysconf_available()
+    return available
+
+
+def superframe_bytes(param_list, wps=None):
+    '''
+    Estimate the memory used to process a superframe.
+
+    :param param_list: Parameters returned by parse_lfl.
+    :type param_list: list
+    :param wps: Words per second of the data file, or None if unknown.
+    :type wps: int or None
+    :rtype: int
+    '''
+    from flightdataplotter.frames import (
+        FRAMES_PER_SUPERFRAME,
+        SUBFRAMES_PER_FRAME,
+        WORD_SIZE,
+    )
+    # Each subframe is one second of data.
+    seconds = FRAMES_PER_SUPERFRAME * SUBFRAMES_PER_FRAME
+    raw_bytes = (wps or DEFAULT_WPS) * seconds * WORD_SIZE
+    samples = sum(getattr(p, 'frequency', 1) or 1 for p in param_list) * \
+        seconds
+    return int(raw_bytes + samples * SAMPLE_BYTES)
+
+
+def auto_superframes_in_memory(param_list, wps=None, workers=1,
+                               superframe_count=None, available=None):
+    '''
+    Choose the number of superframes to process in memory.
+
+    :param param_list: Parameters processed by each worker.
+    :type param_list: list
+    :param wps: Words per second of the data file, or None if unknown.
+    :type wps: int or None
+    :param workers: Number of processes converting at the same time.
+    :type workers: int
+    :param superframe_count: Number of superframes within the data file. No
+        more than this are needed.
+    :type superframe_count: int or None
+    :param available: Available memory in bytes, otherwise it is measured.
+    :type available: int or None
+    :returns: Number of superframes, or DEFAULT_SUPERFRAMES_IN_MEMORY if the
+        available memory is unknown.
+    :rtype: int
+    '''
+    if available is None:
+        available = available_memory()
+    if available is None:
+        return DEFAULT_SUPERFRAMES_IN_MEMORY
+    budget = available * MEMORY_FRACTION / max(workers, 1)
+    superframes = max(int(budget // superframe_bytes(param_list, wps)), 1)
+    if superframe_count:
+        superframes = min(superframes, superframe_count)
+    return superframes
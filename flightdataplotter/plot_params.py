@@ -11,35 +11,63 @@ import configobj
 import itertools
 import logging
 import matplotlib
+import multiprocessing
 
 import os
+import Queue
+import shlex
+import shutil
 import sys
 import tempfile
 import threading
-import time
 import traceback
-import wx
 
 import numpy as np
 
 from datetime import datetime
 
-from analysis_engine.library import align
-
-from compass.compass_cli import configobj_error_message
-from compass.arinc717.data_frame_parser import parse_lfl
-from compass.arinc717.hdf import create_hdf
-
-from hdfaccess.file import hdf_file
-
-matplotlib.use('WXAgg')
+from flightdataplotter import frames, hdf_tools, lfl_diff
+from flightdataplotter.array_cache import ArrayCache, fingerprint
+from flightdataplotter.blit import BlitManager
+from flightdataplotter import daemon
+from flightdataplotter.convert import (
+    Cancelled,
+    create_hdf_chunked,
+    create_hdf_parallel,
+    create_hdf_time_sliced,
+    superframe_counter,
+)
+from flightdataplotter.decimate import minmax_decimate
+from flightdataplotter.lfl_cache import DEFAULT_CACHE_DIR, DiskLFLCache
+from flightdataplotter.memory import (
+    AUTO,
+    auto_superframes_in_memory,
+    superframes_in_memory_arg,
+)
+from flightdataplotter.profiling import NullProfiler, StageProfiler
+from flightdataplotter.raw_data import (
+    RAW_DATA_EXTENSIONS,
+    copy_file_part,
+    data_file_paths,
+    is_compressed,
+    requires_copy,
+)
+from flightdataplotter.report import (
+    REPORT_FORMATS,
+    hdf_statistics,
+    report_format,
+    write_report,
+)
+from flightdataplotter.viewport import LineSource, ViewportLoader
+from flightdataplotter.watcher import DEFAULT_DEBOUNCE, FileWatcher, Wakeup
+
+# Windows use the WXAgg backend which is selected by gui.get_app() once a
+# window is needed, so that wxPython is not imported when rendering headless.
+matplotlib.use('Agg')
 
 import matplotlib.pyplot as plt
 import matplotlib.font_manager as fm
-from pylab import setp
-
-
-app = wx.PySimpleApp()
+from matplotlib.artist import setp
 
 
 # Argument parsing.
@@ -56,16 +84,19 @@ def create_parser():
     parser.add_argument(
         '-o', '--output-path', dest='output_path',
         action='store',
-        help='Output file path (default will be a temporary location).')
+        help='Output file path (default will be a temporary location). '
+        'With --fleet, the directory to write HDF files into.')
     parser.add_argument(
         '-c', dest='cli', action='store_true',
         help='Use command line arguments rather than file dialogs.')
     help_message = "Number of superframes stored in memory before writing " \
         "to HDF5 file. A value of 0 will cause all superframes to be " \
-        "stored in memory. Default is 100 superframes."
+        "stored in memory. Default is 100 superframes. 'auto' chooses as " \
+        "many as fit within a quarter of the available memory."
     parser.add_argument(
         '--superframes-in-memory',
-        dest='superframes_in_memory', action='store', type=int, default=-1,
+        dest='superframes_in_memory', action='store',
+        type=superframes_in_memory_arg, default=-1,
         help=help_message)
     parser.add_argument(
         '-d', '--frame-doubled',
@@ -105,64 +136,213 @@ def create_parser():
     parser.add_argument(
         '-s', '--stretched', dest='stretched',
         help="Name of frame Stretched definition to apply.")
+    parser.add_argument(
+        '--incremental', dest='incremental', default=False,
+        action='store_true',
+        help="Keep the previous HDF file and only reprocess parameters "
+        "which have been added or changed within the LFL.")
+    parser.add_argument(
+        '--debounce', dest='debounce', type=float, default=DEFAULT_DEBOUNCE,
+        help='Seconds to wait for further changes after the LFL is saved '
+        'before reprocessing. Default is %s seconds.' % DEFAULT_DEBOUNCE)
+    parser.add_argument(
+        '--poll', dest='poll', default=False, action='store_true',
+        help='Poll the LFL modification time rather than using inotify.')
+    parser.add_argument(
+        '--no-decimate', dest='decimate', default=True, action='store_false',
+        help='Plot every sample rather than the minimum and maximum values '
+        'per pixel.')
+    parser.add_argument(
+        '--live', dest='live', default=False, action='store_true',
+        help='Update the plot window in place each time the LFL is '
+        'reprocessed rather than opening a new window once it is closed.')
+    parser.add_argument(
+        '--render-to', dest='render_to', metavar='DIR',
+        help='Render plots into this directory without displaying a window, '
+        'then exit.')
+    parser.add_argument(
+        '--render-format', dest='render_format', default='png',
+        choices=RENDER_FORMATS,
+        help='Image format of rendered plots. Default is png.')
+    parser.add_argument(
+        '--report', dest='report_path', metavar='FILE',
+        help='Write statistics of each processed parameter to FILE without '
+        'plotting, then exit.')
+    parser.add_argument(
+        '--report-format', dest='report_format', choices=REPORT_FORMATS,
+        help='Format of --report. Default is chosen from the file extension, '
+        'otherwise csv.')
+    parser.add_argument(
+        '--batch', dest='batch_path', metavar='FILE',
+        help='File listing an LFL path and data path per line to render '
+        'with --render-to or report with --report, rather than the lfl_path '
+        'and data_path arguments. Relative paths are relative to the batch '
+        'file.')
+    parser.add_argument(
+        '-j', '--jobs', dest='jobs', type=int,
+        default=multiprocessing.cpu_count(),
+        help='Number of processes used to render plots, report or process '
+        '--fleet data files. Default is the number of CPUs.')
+    parser.add_argument(
+        '--fleet', dest='fleet_paths', metavar='PATH', action='append',
+        help='Process the LFL against many data files each time it changes '
+        'and plot them side by side. PATH is a data file or a directory of '
+        'data files (%s) and may be repeated. data_path is included if '
+        'provided.' % ', '.join(RAW_DATA_EXTENSIONS))
+    parser.add_argument(
+        '--workers', dest='workers', type=int, default=1,
+        help='Number of processes to split processing across. Default is 1.')
+    parser.add_argument(
+        '--split', dest='split', default='params', choices=SPLIT_MODES,
+        help='How processing is split across --workers: by parameter or by '
+        'time (sections of the data file starting on superframe '
+        'boundaries). Default is params.')
+    parser.add_argument(
+        '--chunked', dest='chunked', default=False, action='store_true',
+        help='Process uncompressed data files an hour of data at a time so '
+        'that processing is abandoned sooner when the LFL changes again.')
+    parser.add_argument(
+        '--profile', dest='profile_path', metavar='FILE',
+        help='Append the wall time, CPU time and peak memory usage of each '
+        'processing and plotting stage to FILE as JSON lines (- for stdout).')
+    parser.add_argument(
+        '--cprofile', dest='cprofile_path', metavar='FILE',
+        help='Write cProfile statistics of the profiled stages to FILE on '
+        'exit. Requires --profile.')
+    parser.add_argument(
+        '--lfl-cache', dest='lfl_cache_dir', metavar='DIR',
+        default=DEFAULT_CACHE_DIR,
+        help='Directory to cache parsed LFLs within. Default is %s.'
+        % DEFAULT_CACHE_DIR)
+    parser.add_argument(
+        '--no-lfl-cache', dest='lfl_cache_dir', action='store_const',
+        const=None,
+        help='Parse the LFL each time rather than using a cached result.')
+    parser.add_argument(
+        '--daemon', dest='daemon', default=False, action='store_true',
+        help='Run as a daemon accepting convert and render jobs from '
+        'FlightDataPlotterClient over a local socket.')
+    parser.add_argument(
+        '--socket', dest='socket_path', default=daemon.DEFAULT_SOCKET_PATH,
+        help='Path of the daemon socket. Default is %s.'
+        % daemon.DEFAULT_SOCKET_PATH)
 
     return parser
 
 
-def copy_file_part(src_path, percent_start=0, percent_stop=100):
+def aircraft_info_from_args(args):
     '''
-    Copies percentage of the source path to a new destination file. If source
-    is compressed, output is read out into a decompressed file.
+    Create aircraft info for parse_lfl from arguments.
+    '''
+    aircraft_info = {
+        'Frame Doubled': args.frame_doubled,
+        'Stretched': args.stretched,
+    }
+    if args.tail_number:
+        aircraft_info['Tail Number'] = args.tail_number
+    if args.aircraft_family:
+        aircraft_info['Aircraft Family'] = args.aircraft_family
+    if args.aircraft_series:
+        aircraft_info['Aircraft Series'] = args.aircraft_series
+    if args.aircraft_model:
+        aircraft_info['Aircraft Model'] = args.aircraft_model
+    if args.engine_manufacturer:
+        aircraft_info['Engine Manufacturer'] = args.engine_manufacturer
+    if args.engine_series:
+        aircraft_info['Engine Series'] = args.engine_series
+    if args.engine_type:
+        aircraft_info['Engine Type'] = args.engine_type
+    return aircraft_info
 
-    src_path can be either a zip (.SAC), bz2 or uncompressed data file
 
-    NOTE: Reads data into memory
-    TODO: Move to flightdatautilities.filesystem_tools ?
-    '''
+def validate_superframes_in_memory(parser, args):
+    if args.superframes_in_memory == AUTO:
+        return
+    if args.superframes_in_memory == 0 or args.superframes_in_memory < -1:
+        parser.error('Superframes in memory argument must be -1 or positive. '
+                     'Found %s' % args.superframes_in_memory)
 
-    from flightdatautilities.filesystem_tools import open_raw_data
-    ext = '_%d-%d.dat' % (percent_start, percent_stop)
-    dest_path = os.path.splitext(src_path)[0] + ext
-    if os.path.isfile(dest_path) and os.path.getsize(dest_path):
-        print 'Partial file already exists; using: %s' % dest_path
-        return dest_path
-    try:
-        src = open_raw_data(src_path)
-        src.seek(0, 2)
-        size = src.tell()
-        src.seek(0)
-        offset = int(percent_start * size / 100.0)
-        if offset % 2:
-            offset += 1  # make sure the start is even
-        read_end = int(percent_stop * size / 100.0)
-        amount = read_end - offset
-        if amount % 2:
-            amount -= 1  # make multiple of np.short (2 bytes)
-        src.seek(offset)
-        data = src.read(amount)
-    finally:
-        src.close()
-    with open(dest_path, 'wb') as dest:
-        dest.write(data)
-    return dest_path
 
+def validate_render_args(parser, args):
+    '''
+    Validate arguments provided to argparse for rendering with --render-to or
+    reporting with --report.
+
+    :returns: LFL and data file path pairs to render or report.
+    :rtype: list of (str, str)
+    '''
+    if args.batch_path:
+        try:
+            pairs = read_batch_file(args.batch_path)
+        except (IOError, ValueError) as err:
+            parser.error('Could not read batch file: %s' % err)
+    elif args.lfl_path and args.data_path:
+        pairs = [(args.lfl_path, args.data_path)]
+    else:
+        parser.error('Either --batch or both lfl_path and data_path are '
+                     'required with --render-to or --report.')
+    for lfl_path, data_path in pairs:
+        if not os.path.isfile(lfl_path):
+            parser.error('LFL file path not valid: %s' % lfl_path)
+        if not os.path.isfile(data_path):
+            parser.error('Data file path not valid: %s' % data_path)
+    if args.jobs < 1:
+        parser.error('Jobs argument must be positive. Found %s' % args.jobs)
+    validate_superframes_in_memory(parser, args)
+    return pairs
+
+
+def validate_fleet_args(parser, args):
+    '''
+    Validate arguments provided to argparse for processing with --fleet.
 
-def validate_args(parser):
+    :returns: Data file paths of the fleet.
+    :rtype: list of str
+    '''
+    if not args.lfl_path:
+        if args.cli:
+            parser.error('lfl_path is required with -c.')
+        from flightdataplotter.gui import lfl_file_dialog
+        args.lfl_path = lfl_file_dialog()
+    if not os.path.isfile(args.lfl_path):
+        parser.error('LFL file path not valid: %s' % args.lfl_path)
+    paths = list(args.fleet_paths)
+    if args.data_path:
+        paths.append(args.data_path)
+    data_paths = data_file_paths(paths)
+    if not data_paths:
+        parser.error('No data files found within: %s' % ', '.join(paths))
+    for data_path in data_paths:
+        if not os.path.isfile(data_path):
+            parser.error('Data file path not valid: %s' % data_path)
+    if args.jobs < 1:
+        parser.error('Jobs argument must be positive. Found %s' % args.jobs)
+    validate_superframes_in_memory(parser, args)
+    if args.cprofile_path and not args.profile_path:
+        parser.error('--cprofile requires --profile.')
+    return data_paths
+
+
+def validate_args(parser, args):
     '''
     Validate arguments provided to argparse.
     '''
-    args = parser.parse_args()
+    if args.cli and not (args.lfl_path and args.data_path):
+        parser.error('Both lfl_path and data_path are required with -c.')
+
     if not args.lfl_path:
+        from flightdataplotter.gui import lfl_file_dialog
         args.lfl_path = lfl_file_dialog()
     if not os.path.isfile(args.lfl_path):
         parser.error('LFL file path not valid: %s' % args.lfl_path)
 
     if not args.data_path:
+        from flightdataplotter.gui import data_file_dialog
         args.data_path = data_file_dialog()
     if not os.path.isfile(args.data_path):
         parser.error('Data file path not valid: %s' % args.data_path)
 
-    if args.percent_start > 0 or args.percent_stop < 100:
+    if requires_copy(args.data_path, args.percent_start, args.percent_stop):
         args.data_path = copy_file_part(
             args.data_path, args.percent_start, args.percent_stop)
         print "Read data chunk into new file: %s" % args.data_path
@@ -172,28 +352,16 @@ def validate_args(parser):
             tempfile.gettempdir(),
             os.path.splitext(os.path.basename(args.data_path))[0] + '.hdf5')
 
-    if args.superframes_in_memory == 0 or args.superframes_in_memory < -1:
-        parser.error('Superframes in memory argument must be -1 or positive. '
-                     'Found %s' % args.superframes_in_memory)
+    validate_superframes_in_memory(parser, args)
 
-    aircraft_info = {
-        'Frame Doubled': args.frame_doubled,
-        'Stretched': args.stretched,
-    }
-    if args.tail_number:
-        aircraft_info['Tail Number'] = args.tail_number
-    if args.aircraft_family:
-        aircraft_info['Aircraft Family'] = args.aircraft_family
-    if args.aircraft_series:
-        aircraft_info['Aircraft Series'] = args.aircraft_series
-    if args.aircraft_model:
-        aircraft_info['Aircraft Model'] = args.aircraft_model
-    if args.engine_manufacturer:
-        aircraft_info['Engine Manufacturer'] = args.engine_manufacturer
-    if args.engine_series:
-        aircraft_info['Engine Series'] = args.engine_series
-    if args.engine_type:
-        aircraft_info['Engine Type'] = args.engine_type
+    if args.cprofile_path and not args.profile_path:
+        parser.error('--cprofile requires --profile.')
+
+    if args.workers < 1:
+        parser.error('Workers argument must be positive. Found %s'
+                     % args.workers)
+
+    aircraft_info = aircraft_info_from_args(args)
 
     return (
         args.lfl_path,
@@ -202,6 +370,7 @@ def validate_args(parser):
         args.superframes_in_memory,
         args.plot_changed,
         aircraft_info,
+        args.incremental,
     )
 
 
@@ -209,11 +378,53 @@ def validate_args(parser):
 ###############################################################################
 
 
-def plot_parameters(params, axes, title=''):
+def decimate_array(array, buckets, scale=1):
     '''
-    Plot resulting parameters.
+    Decimate an array for plotting.
+
+    :param scale: Multiplier for x-axis indices, e.g. ratio of the highest
+        plotted frequency to the array's frequency.
+    :returns: x-axis indices and values.
+    :rtype: (np.ndarray, np.ma.MaskedArray)
     '''
-    print 'Plotting parameters.'
+    indices, values = minmax_decimate(array, buckets)
+    return indices * scale, values
+
+
+def param_length(param):
+    '''
+    :returns: Number of samples, from the parameter's summary if it has one
+        so that the array is not read.
+    :rtype: int
+    '''
+    summary = getattr(param, 'summary', None)
+    if summary:
+        return summary['length']
+    return len(param.array)
+
+
+def plot_lines(params, axes, buckets, cache=None, profiler=None):
+    '''
+    Compute the lines to plot for each parameter. Parameter arrays are
+    truncated so that they can be aligned.
+
+    :param buckets: Number of buckets to decimate arrays into (typically the
+        width of the figure in pixels), or 0 to plot every sample.
+    :type buckets: int
+    :param cache: Cache of aligned and decimated arrays to reuse between
+        calls.
+    :type cache: ArrayCache or None
+    :param profiler: Profiler to record alignment with.
+    :type profiler: StageProfiler or None
+    :returns: Label and axis.plot arguments of each line keyed by axis number.
+    :rtype: dict of int -> list of (str, list)
+    '''
+    from analysis_engine.library import align
+
+    if cache is None:
+        cache = ArrayCache()
+    if profiler is None:
+        profiler = NullProfiler()
     max_freq = 0
     min_freq = float('inf')
 
@@ -225,72 +436,70 @@ def plot_parameters(params, axes, title=''):
         if max_freq == param.frequency:
             param_max_freq = param
         if param.frequency == min_freq:
-            param_min_freq_len = len(param.array)
+            param_min_freq_len = param_length(param)
 
     # Truncate parameter arrays to successfully align them since the file
     # has not been through split sections.
     for param_name, param in params.iteritems():
         array_len = param_min_freq_len * (param.frequency / min_freq)
-        if array_len != len(param.array):
+        length = param_length(param)
+        if array_len != length:
             print 'Truncated %s from %d to %d for display purposes' % (
-                param_name, len(param.array), array_len)
+                param_name, length, array_len)
             param.array = param.array[:array_len]
 
-    #==========================================================================
-    # Plot Preparation
-    #==========================================================================
-
-    # Invariant parameters are identified here. They could be inserted into
-    # the plot configuration file, but this is more straightforward.
-    plt.rc('axes', grid=True)
-    plt.rc('grid', color='0.75', linestyle='-', linewidth=0.5)
-
-    # These items are altered during the plot, so not suited to plt.rc setup
-    prop = fm.FontProperties(size=10)
-    legendprops = dict(shadow=True, fancybox=True, markerscale=0.5, prop=prop)
-
-    # Start by making a big clean canvas
-    fig = plt.figure(facecolor='white', figsize=(8, 6))
-    fig.canvas.set_window_title("%s %s" % (
-        title, datetime.now().strftime('%A, %d %B %Y at %X')))
-
-    # Add the "reference" altitude plot, and title this
-    # (If we title the empty plot, it acquires default 0-1 scales)
+    # The "reference" altitude plot.
     param_name = axes[1][0]
     param = params[param_name]
-    array = align(param, param_max_freq)
-    first_axis = fig.add_subplot(len(axes), 1, 1)
-    first_axis.plot(array, label=param_name)
-
-    ####plt.title("Processed on %s" %
-    ####          datetime.now().strftime('%A, %d %B %Y at %X'))
-    setp(first_axis.get_xticklabels(), visible=False)
+    align_key = (param.frequency, param.offset, param_max_freq.frequency,
+                 param_max_freq.offset, fingerprint(param.array))
+    with profiler.stage('alignment'):
+        array = cache.get(('align',) + align_key, align, param,
+                          param_max_freq)
+    lines = {1: [(param_name, list(cache.get(('decimate', buckets) + align_key,
+                                              decimate_array, array,
+                                              buckets)))]}
 
     # Now plot the additional data from the AXIS_N lists at the top of the lfl
     for index, param_names in axes.iteritems():
         if index == 1:
             continue
-        axis = fig.add_subplot(len(axes), 1, index, sharex=first_axis)
         # Avoid iterating over string
         if isinstance(param_names, basestring):
             param_names = [param_names]
+        lines[index] = []
         for param_name in param_names:
             param = params[param_name]
             # Data is aligned in time but the samples are not interpolated so
             # that scaling issues can be easily addressed
             label_text = param.name
             args = []
-            if np.ma.all(param.array.mask):
+            # Avoid reading arrays which are not drawn.
+            summary = getattr(param, 'summary', None)
+            if summary:
+                all_masked = summary['all_masked']
+            else:
+                all_masked = np.ma.all(param.array.mask)
+            dtype = getattr(param, 'dtype', None)
+            if dtype is None:
+                dtype = param.array.dtype
+            if all_masked:
                 args.append([])
                 label_text += ' <ALL MASKED>'
-            elif param.data_type == 'ASCII' or param.array.dtype.char == 'S':
+            elif param.data_type == 'ASCII' or dtype.char == 'S':
                 print "Warning: ASCII not supported. Param '%s'" % param
                 args.append([])
                 label_text += ' <ASCII NOT DRAWN>'
+            elif buckets:
+                scale = max_freq / param.hz
+                args.extend(cache.get(
+                    ('decimate', buckets, scale, fingerprint(param.array)),
+                    decimate_array, param.array, buckets, scale=scale))
             elif param.hz != max_freq:
                 # Data is aligned in time but the samples are not
                 # interpolated so that scaling issues can be easily addressed
-                args.append(np.arange(len(param.array)) * (max_freq / param.hz))
+                args.append(cache.indices(len(param.array),
+                                          max_freq / param.hz))
                 args.append(param.array)
             else:
                 args.append(param.array)
@@ -299,66 +508,614 @@ def plot_parameters(params, axes, title=''):
                 label_text += " [No units]"
             else:
                 label_text += " : " + param.units
-            values_mapping = getattr(param.array, 'values_mapping', None)
+            if hasattr(param, 'values_mapping'):
+                values_mapping = param.values_mapping
+            else:
+                values_mapping = getattr(param.array, 'values_mapping', None)
             if values_mapping:
                 label_text += '\n%s' % values_mapping
-            axis.plot(*args, label=label_text)
+            lines[index].append((label_text, args))
+    return lines
+
+
+def axis_ylims(params, axes):
+    '''
+    y-axis limits of each axis from the summaries stored at conversion time
+    (see hdf_tools.write_summaries), so that matplotlib does not need to
+    autoscale over the plotted arrays. Margins match matplotlib's.
+
+    :returns: Lower and upper limits keyed by axis number. Axes containing a
+        parameter without a summary (or whose arrays have been replaced, e.g.
+        truncated) are omitted, as are axes without drawn values.
+    :rtype: dict of int -> (float, float)
+    '''
+    from matplotlib.transforms import nonsingular
+
+    margin = plt.rcParams['axes.ymargin']
+    ylims = {}
+    for index, param_names in axes.iteritems():
+        if isinstance(param_names, basestring):
+            param_names = [param_names]
+        if index == 1:
+            param_names = param_names[:1]
+        summaries = [getattr(params[name], 'summary', None)
+                     for name in param_names]
+        if not all(summaries):
+            continue
+        ranges = [(summary['min'], summary['max']) for summary in summaries
+                  if 'min' in summary]
+        if not ranges:
+            continue
+        lower, upper = nonsingular(min(r[0] for r in ranges),
+                                   max(r[1] for r in ranges))
+        pad = (upper - lower) * margin
+        ylims[index] = (lower - pad, upper + pad)
+    return ylims
+
+
+def create_viewport_loader(params, axes, plot_axes):
+    '''
+    Reload decimated lines from the HDF file at full resolution for the
+    visible x-axis range when zoomed in. Lines which were not drawn, e.g.
+    entirely masked or ASCII parameters, are ignored.
+
+    :param params: Parameters which were plotted.
+    :type params: dict of hdf_tools.LazyParameter
+    :param axes: Parameter names of each axis.
+    :type axes: dict
+    :param plot_axes: Plotted axes keyed by axis number.
+    :type plot_axes: dict of int -> matplotlib.axes.Axes
+    :rtype: ViewportLoader
+    '''
+    max_freq = max(param.frequency for param in params.itervalues())
+    for param in params.itervalues():
+        if param.frequency == max_freq:
+            param_max_freq = param
+
+    sources = []
+    for index, param_names in axes.iteritems():
+        if isinstance(param_names, basestring):
+            param_names = [param_names]
+        if index == 1:
+            # The reference line is aligned to the highest frequency
+            # parameter so raw samples are shifted by the difference in
+            # offsets.
+            param_names = param_names[:1]
+        for param_name, line in zip(param_names, plot_axes[index].lines):
+            param = params[param_name]
+            if not len(line.get_xdata()):
+                continue
+            shift = 0
+            if index == 1:
+                shift = (param.offset - param_max_freq.offset) * max_freq
+            sources.append(LineSource(line, param, max_freq / param.hz,
+                                      shift=shift))
+    return ViewportLoader([plot_axes[index] for index in sorted(plot_axes)],
+                          sources)
+
+
+def create_figure(title=''):
+    '''
+    Create an empty figure for plot_parameters.
+
+    :rtype: matplotlib.figure.Figure
+    '''
+    # Invariant parameters are identified here. They could be inserted into
+    # the plot configuration file, but this is more straightforward.
+    plt.rc('axes', grid=True)
+    plt.rc('grid', color='0.75', linestyle='-', linewidth=0.5)
+
+    # Start by making a big clean canvas
+    fig = plt.figure(facecolor='white', figsize=(8, 6))
+    fig.canvas.set_window_title("%s %s" % (
+        title, datetime.now().strftime('%A, %d %B %Y at %X')))
+    return fig
+
+
+def figure_buckets(fig, decimate=True):
+    '''
+    :returns: Number of buckets to decimate arrays into, i.e. the width of
+        the figure in pixels, or 0 if not decimating.
+    :rtype: int
+    '''
+    return int(fig.get_figwidth() * fig.dpi) if decimate else 0
+
+
+def draw_axis_lines(axis, index, axis_count, axis_lines, ylim=None):
+    '''
+    Plot lines on an axis along with its legend.
+
+    :param index: Axis number.
+    :type index: int
+    :param axis_count: Number of axes within the figure.
+    :type axis_count: int
+    :param axis_lines: Labels and axis.plot arguments from plot_lines.
+    :type axis_lines: list of (str, list)
+    :param ylim: y-axis limits from axis_ylims, otherwise the y-axis is
+        autoscaled.
+    :type ylim: (float, float) or None
+    '''
+    # These items are altered during the plot, so not suited to plt.rc setup
+    prop = fm.FontProperties(size=10)
+    legendprops = dict(shadow=True, fancybox=True, markerscale=0.5, prop=prop)
+
+    if ylim:
+        axis.set_autoscaley_on(False)
+        axis.set_ylim(ylim)
+
+    for label_text, args in axis_lines:
+        axis.plot(*args, label=label_text)
+        if index > 1:
             axis.legend(loc='upper right', **legendprops)
-            if index < len(axes):
-                setp(axis.get_xticklabels(), visible=False)
-        plt.legend(prop={'size': 10})
-    plt.show()
+    if index == 1:
+        ####plt.title("Processed on %s" %
+        ####          datetime.now().strftime('%A, %d %B %Y at %X'))
+        setp(axis.get_xticklabels(), visible=False)
+    else:
+        if index < axis_count:
+            setp(axis.get_xticklabels(), visible=False)
+        axis.legend(prop={'size': 10})
+
+
+def draw_axes(fig, lines, ylims=None):
+    '''
+    Add an axis for each AXIS group to a figure and plot their lines.
+
+    :param lines: Lines keyed by axis number from plot_lines.
+    :type lines: dict
+    :param ylims: y-axis limits keyed by axis number from axis_ylims.
+    :type ylims: dict or None
+    :returns: Axes keyed by axis number.
+    :rtype: dict of int -> matplotlib.axes.Axes
+    '''
+    ylims = ylims or {}
+    # Add the "reference" altitude plot, and title this
+    # (If we title the empty plot, it acquires default 0-1 scales)
+    first_axis = fig.add_subplot(len(lines), 1, 1)
+    draw_axis_lines(first_axis, 1, len(lines), lines[1], ylims.get(1))
+    plot_axes = {1: first_axis}
+    for index in sorted(lines):
+        if index == 1:
+            continue
+        axis = fig.add_subplot(len(lines), 1, index, sharex=first_axis)
+        draw_axis_lines(axis, index, len(lines), lines[index],
+                        ylims.get(index))
+        plot_axes[index] = axis
+    return plot_axes
+
+
+def plot_parameters(params, axes, title='', decimate=True, cache=None,
+                    show=True, profiler=None):
+    '''
+    Plot resulting parameters.
+
+    :param decimate: Only plot the minimum and maximum values within each
+        pixel's width of samples.
+    :type decimate: bool
+    :param cache: Cache of aligned and decimated arrays to reuse between
+        calls.
+    :type cache: ArrayCache or None
+    :param show: Show the figure and block until the window is closed.
+    :type show: bool
+    :param profiler: Profiler to record alignment with.
+    :type profiler: StageProfiler or None
+    :returns: The plotted figure.
+    :rtype: matplotlib.figure.Figure
+    '''
+    print 'Plotting parameters.'
+    fig = create_figure(title)
+    # Before arrays are truncated by plot_lines.
+    ylims = axis_ylims(params, axes)
+    lines = plot_lines(params, axes, figure_buckets(fig, decimate),
+                       cache=cache, profiler=profiler)
+    draw_axes(fig, lines, ylims)
+    if show:
+        plt.show()
+    return fig
+
+
+class LivePlot(object):
+    '''
+    A figure which is updated in place each time parameters are reprocessed
+    rather than being replaced by a new window.
+
+    Lines of axes whose parameters are unchanged have their data replaced,
+    and are redrawn over a cached background (blitting) if their axis limits
+    are unchanged. Axes whose parameters have changed are cleared and
+    replotted, and the figure is rebuilt if the number of axes changes.
+    '''
+    def __init__(self, title='', decimate=True, cache=None, profiler=None):
+        self.title = title
+        self.decimate = decimate
+        self.cache = cache
+        self.profiler = profiler
+        self.fig = None
+        self._plot_axes = {}
+        # Line labels of each axis keyed by axis number.
+        self._layout = {}
+        # y-axis limits set from summaries keyed by axis number.
+        self._ylims = {}
+        self._blit = None
+        self._viewport = None
+
+    @property
+    def is_open(self):
+        '''
+        :returns: Whether the window is open.
+        :rtype: bool
+        '''
+        return self.fig is not None and plt.fignum_exists(self.fig.number)
+
+    def freeze(self):
+        '''
+        Stop reloading lines from the HDF file until the next update, e.g.
+        while it is rewritten.
+        '''
+        viewport = self._viewport
+        if viewport:
+            viewport.freeze()
+
+    def _lines(self):
+        return [line for index in sorted(self._plot_axes)
+                for line in self._plot_axes[index].lines]
+
+    def _open(self):
+        self.fig = create_figure(self.title)
+        self._plot_axes = {}
+        self._layout = {}
+        self._ylims = {}
+        if getattr(self.fig.canvas, 'supports_blit', False):
+            self._blit = BlitManager(self.fig.canvas)
+        else:
+            self._blit = None
+
+    def update(self, params, axes):
+        '''
+        Plot parameters, updating the existing figure if it is open.
+
+        :returns: The plotted figure.
+        :rtype: matplotlib.figure.Figure
+        '''
+        print 'Updating plot.'
+        opened = not self.is_open
+        if opened:
+            self._open()
+        # Before arrays are truncated by plot_lines.
+        ylims = axis_ylims(params, axes)
+        lines = plot_lines(params, axes,
+                           figure_buckets(self.fig, self.decimate),
+                           cache=self.cache, profiler=self.profiler)
+        layout = dict((index, [label for label, _args in axis_lines])
+                      for index, axis_lines in lines.iteritems())
+
+        full_draw = True
+        if sorted(layout) != sorted(self._layout):
+            self.fig.clf()
+            self._plot_axes = draw_axes(self.fig, lines, ylims)
+        else:
+            full_draw = False
+            for index, axis_lines in lines.iteritems():
+                axis = self._plot_axes[index]
+                if layout[index] != self._layout[index]:
+                    axis.cla()
+                    draw_axis_lines(axis, index, len(lines), axis_lines,
+                                    ylims.get(index))
+                    full_draw = True
+                    continue
+                limits = (axis.get_xlim(), axis.get_ylim())
+                for line, (_label, args) in zip(axis.lines, axis_lines):
+                    if len(args) == 1:
+                        line.set_data(np.arange(len(args[0])), args[0])
+                    else:
+                        line.set_data(*args)
+                axis.relim()
+                axis.autoscale_view()
+                # Unless the y-axis has been zoomed since the last update.
+                if index in ylims and \
+                   limits[1] == self._ylims.get(index, limits[1]):
+                    axis.set_ylim(ylims[index])
+                if (axis.get_xlim(), axis.get_ylim()) != limits:
+                    full_draw = True
+        self._layout = layout
+        self._ylims = dict((index, self._plot_axes[index].get_ylim())
+                           for index in ylims)
+
+        if opened:
+            self.fig.show()
+        else:
+            self.fig.canvas.set_window_title("%s %s" % (
+                self.title, datetime.now().strftime('%A, %d %B %Y at %X')))
+        if self._blit:
+            if full_draw:
+                self._blit.set_artists(self._lines())
+                self._blit.draw()
+            else:
+                self._blit.update()
+        else:
+            self.fig.canvas.draw()
+        if self._viewport:
+            self._viewport.disconnect()
+            self._viewport = None
+        if self.decimate:
+            self._viewport = create_viewport_loader(params, axes,
+                                                    self._plot_axes)
+            # The lines were replaced by overviews of the new arrays while the
+            # x-axis limits were kept.
+            if self._viewport.zoomed:
+                self._viewport.refresh()
+        return self.fig
 
 
 # Processing and plotting loops
 ###############################################################################
 
 
+SPLIT_MODES = ('params', 'time')
+
+
+# Kinds of message sent to the plotting loop.
+PLOT = 'plot'
+ERROR = 'error'
+EXIT = 'exit'
+
+
 class ProcessError(Exception):
     pass
 
 
 class ProcessAndPlotLoops(threading.Thread):
-    def __init__(self, hdf_path, plot_changed, lfl_path, function):
+    def __init__(self, hdf_path, plot_changed, lfl_path, function,
+                 debounce=DEFAULT_DEBOUNCE, use_inotify=True, decimate=True,
+                 workers=1, split='params', profiler=None, lfl_cache=None,
+                 live=False, chunked=False):
         '''
         :param hdf_path: Output path for HDF file.
         :type hdf_path: str
+        :param debounce: Seconds to wait for further changes to the LFL
+            before processing.
+        :type debounce: float
+        :param use_inotify: Use inotify to detect LFL changes if available,
+            otherwise poll.
+        :type use_inotify: bool
+        :param decimate: Only plot the minimum and maximum values within each
+            pixel's width of samples.
+        :type decimate: bool
+        :param workers: Number of processes to split processing across.
+        :type workers: int
+        :param split: Split processing across workers by 'params' or 'time'.
+        :type split: str
+        :param profiler: Profiler to record each stage with.
+        :type profiler: StageProfiler or None
+        :param lfl_cache: Cache of parsed LFLs, e.g. shared by the jobs of a
+            daemon.
+        :type lfl_cache: MemoryLFLCache, DiskLFLCache or None
+        :param live: Update the plot window in place each time parameters are
+            reprocessed rather than waiting for it to be closed.
+        :type live: bool
+        :param chunked: Process uncompressed data files in sections within
+            the processing loop, so that processing can be abandoned between
+            sections rather than only between stages.
+        :type chunked: bool
         '''
         self._hdf_path = hdf_path
         self._lfl_path = lfl_path
         self._function = function
+        self._debounce = debounce
+        self._use_inotify = use_inotify
+        self._decimate = decimate
+        self._workers = workers
+        self._split = split
+        self._chunked = chunked
+        self._profiler = profiler or NullProfiler()
+        self._lfl_cache = lfl_cache
+        # Aligned and decimated arrays reused between reprocessing.
+        self._array_cache = ArrayCache()
+        if live:
+            self._live_plot = LivePlot(
+                title=os.path.basename(hdf_path), decimate=decimate,
+                cache=self._array_cache, profiler=self._profiler)
+        else:
+            self._live_plot = None
+        # Reloads lines of the plotted figure when zoomed.
+        self._viewport = None
 
         self._changed_params = set()
         self._plot_changed = plot_changed
-
-        self.__error_lock = threading.Lock()
-        self.__error_messages = []
+        # Parameters changed since the HDF file was last successfully written.
+        self._stale = lfl_diff.StaleParams()
+        # Changes to the LFL found by the last call to process_data.
+        self.lfl_changes = None
+
+        # Messages from the processing loop to the plotting loop.
+        self._messages = Queue.Queue()
+        # Set when a message is posted, so that the plotting loop can wait
+        # for messages without polling.
+        self._message_posted = Wakeup()
+        # Set by stop to wake the processing loop.
+        self._stopping = Wakeup()
+        # Incremented each time processing starts so that results which have
+        # been superseded are not plotted.
+        self._generation = 0
+        # Interrupts the plotting loop while it waits for window events.
+        self._interrupt = None
+        # Watches the LFL while the processing loop is running.
+        self._watcher = None
 
         self.exit_loop = threading.Event()
-        self._ready_to_plot = threading.Event()
 
         self._axes = None
 
-        self._last_config = None
-
         super(ProcessAndPlotLoops, self).__init__()
 
+    def _post(self, kind, value=None):
+        '''
+        Send a message to the plotting loop.
+
+        :param kind: PLOT, ERROR or EXIT.
+        :type kind: str
+        '''
+        self._messages.put((kind, value))
+        self._message_posted.set()
+        interrupt = self._interrupt
+        if interrupt:
+            interrupt()
+
+    def stop(self):
+        '''
+        Stop both loops, waking them if they are waiting. Processing is
+        abandoned at the next stage.
+        '''
+        self.exit_loop.set()
+        self._stopping.set()
+        self._post(EXIT)
+
     def _queue_error_message(self, title, message):
-        self.__error_lock.acquire()
-        self.__error_messages.append((title, message))
-        self.__error_lock.release()
-
-    def _get_error_message(self):
-        self.__error_lock.acquire()
-        if self.__error_messages:
-            message = self.__error_messages.pop()
-        else:
-            message = None
-        self.__error_lock.release()
-        return message
+        self._post(ERROR, (title, message))
+
+    def _take_error_messages(self):
+        '''
+        Remove the queued error messages, e.g. after processing without the
+        plotting loop.
+
+        :returns: Title and message of each error in the order queued.
+        :rtype: list of (str, str)
+        '''
+        errors = []
+        while True:
+            try:
+                kind, value = self._messages.get_nowait()
+            except Queue.Empty:
+                return errors
+            if kind == ERROR:
+                errors.append(value)
+
+    def _cancelled(self):
+        '''
+        Whether processing should be abandoned because the loops are exiting
+        or the LFL has changed again.
+
+        :rtype: bool
+        '''
+        if self.exit_loop.is_set():
+            return True
+        return self._watcher is not None and self._watcher.wait(timeout=0)
+
+    def _check_cancelled(self):
+        '''
+        Abandon processing between stages if it has been cancelled.
+
+        :raises Cancelled: If processing should be abandoned.
+        '''
+        if self._cancelled():
+            raise Cancelled()
+
+    def _superframes_in_memory(self, superframes_in_memory, data_path,
+                               param_list, workers=1):
+        '''
+        Resolve --superframes-in-memory auto from the data file's frame rate
+        and the memory currently available.
+
+        :param workers: Number of processes converting all of param_list at
+            the same time.
+        :type workers: int
+        :rtype: int
+        '''
+        if superframes_in_memory != AUTO:
+            return superframes_in_memory
+        wps = superframe_count = None
+        if not is_compressed(data_path):
+            frame_index = frames.open_index(data_path)
+            wps = frame_index.wps
+            superframe_count = len(frame_index.frames) // \
+                frames.FRAMES_PER_SUPERFRAME
+        superframes_in_memory = auto_superframes_in_memory(
+            param_list, wps, workers, superframe_count)
+        print 'Processing %d superframes in memory.' % superframes_in_memory
+        return superframes_in_memory
+
+    def _create_hdf(self, lfl_path, data_path, output_path, frame,
+                    param_list, aircraft_info, superframes_in_memory):
+        '''
+        Process parameters into an HDF file, across worker processes if
+        configured.
+
+        :raises Cancelled: If the LFL changes again while the processing
+            loop is running.
+        '''
+        from compass.arinc717.hdf import create_hdf
+
+        # Only the processing loop restarts when the LFL changes.
+        cancelled = self._cancelled if self._watcher else None
+        if self._workers > 1:
+            if self._split == 'time':
+                # Every worker processes all parameters.
+                if create_hdf_time_sliced(lfl_path, data_path, output_path,
+                                          param_list, aircraft_info,
+                                          self._superframes_in_memory(
+                                              superframes_in_memory,
+                                              data_path, param_list,
+                                              self._workers),
+                                          self._workers, cancelled):
+                    return
+                print 'Could not split data file on superframe boundaries; ' \
+                    'splitting by parameter.'
+            if len(param_list) > 1:
+                # Memory is shared by workers in proportion to their share
+                # of the parameters.
+                create_hdf_parallel(lfl_path, data_path, output_path,
+                                    param_list, aircraft_info,
+                                    self._superframes_in_memory(
+                                        superframes_in_memory, data_path,
+                                        param_list),
+                                    self._workers, cancelled)
+                return
+        # Chunked conversion resolves auto for each section.
+        if cancelled and self._chunked and create_hdf_chunked(
+                data_path, output_path, frame, param_list,
+                superframe_counter(lfl_path), superframes_in_memory,
+                cancelled):
+            return
+        create_hdf(data_path, output_path, frame, param_list,
+                   superframes_in_memory=self._superframes_in_memory(
+                       superframes_in_memory, data_path, param_list))
+
+    def _update_hdf(self, lfl_path, data_path, output_path, frame,
+                    param_list, aircraft_info, keep_params, remove_params,
+                    superframes_in_memory):
+        '''
+        Update an existing HDF file by only processing the parameters within
+        param_list. Unchanged parameters are copied forward from the existing
+        file.
+
+        :param keep_params: Names of parameters to copy from the existing file.
+        :type keep_params: set
+        :param remove_params: Names of parameters to remove from the existing
+            file.
+        :type remove_params: set
+        '''
+        if not param_list:
+            if remove_params:
+                print 'Removing params: %s' % ', '.join(sorted(remove_params))
+                hdf_tools.delete_params(output_path, remove_params)
+            else:
+                print 'No parameters changed; reusing: %s' % output_path
+            return
+
+        print 'Processing changed params: %s' % ', '.join(
+            [p.name for p in param_list])
+        partial_path = os.path.splitext(output_path)[0] + '_partial.hdf5'
+        try:
+            self._create_hdf(lfl_path, data_path, partial_path, frame,
+                             param_list, aircraft_info, superframes_in_memory)
+            hdf_tools.copy_params(output_path, partial_path, keep_params)
+            hdf_tools.replace_file(partial_path, output_path)
+        finally:
+            if os.path.isfile(partial_path):
+                os.remove(partial_path)
 
     def process_data(self, lfl_path, data_path, output_path,
-                     superframes_in_memory, plot_changed, aircraft_info):
+                     superframes_in_memory, plot_changed, aircraft_info,
+                     incremental=False):
         '''
         :param lfl_path: Path of LFL file.
         :type lfl_path: str
@@ -370,23 +1127,30 @@ class ProcessAndPlotLoops(threading.Thread):
         :param plot_changed: Whether or not to plot parameters which change
             within the LFL.
         :type plot_changed: bool
+        :param incremental: Whether to only process parameters which have
+            been added or changed since the previous call.
+        :type incremental: bool
         '''
+        from compass.compass_cli import configobj_error_message
+        from compass.arinc717.data_frame_parser import parse_lfl
+
         # Load config to read AXIS groups.
         try:
-            config = configobj.ConfigObj(lfl_path)
+            with self._profiler.stage('configobj'):
+                config = configobj.ConfigObj(lfl_path)
         except configobj.ConfigObjError as err:
             message = configobj_error_message(err)
             self._queue_error_message('Error while parsing LFL!', message)
             raise ValueError(message)
 
-        if self._last_config:
-            for param_name, param_conf in config['Parameters'].iteritems():
-                # TODO: Param added, not only changed.
-                if param_name in self._last_config['Parameters'] and \
-                   param_conf != self._last_config['Parameters'][param_name]:
-                    self._changed_params.add(param_name)
-
-        self._last_config = dict(config)
+        self._check_cancelled()
+        lfl_index = lfl_diff.index_config(config, aircraft_info)
+        first = self._stale.index is None
+        changes = self._stale.update(lfl_index)
+        if not first:
+            self._changed_params |= changes.added | changes.changed
+        self._changed_params -= changes.removed
+        self.lfl_changes = changes
 
         axes = {1: ['Altitude STD']}
         if plot_changed and self._changed_params:
@@ -423,8 +1187,14 @@ class ProcessAndPlotLoops(threading.Thread):
             param_names.remove('Superframe Counter')
 
         try:
-            lfl_parser, param_list = parse_lfl(
-                lfl_path, param_names=param_names, aircraft_info=aircraft_info)
+            with self._profiler.stage('parse_lfl'):
+                if self._lfl_cache:
+                    lfl_parser, param_list = self._lfl_cache.parse(
+                        lfl_path, param_names, aircraft_info)
+                else:
+                    lfl_parser, param_list = parse_lfl(
+                        lfl_path, param_names=param_names,
+                        aircraft_info=aircraft_info)
         except configobj.ConfigObjError as err:
             message = configobj_error_message(err)
             self._queue_error_message('Error while parsing LFL!', message)
@@ -433,11 +1203,33 @@ class ProcessAndPlotLoops(threading.Thread):
         param_errors = lfl_parser.format_errors()
         if param_errors:
             self._queue_error_message('Parameter Errors', param_errors)
+        self._check_cancelled()
 
-        print 'Processing params: %s' % ', '.join([p.name for p in param_list])
+        # Names of parameters written to the HDF file, whose summaries are
+        # replaced.
+        written_params = [p.name for p in param_list]
         try:
-            create_hdf(data_path, output_path, lfl_parser.frame, param_list,
-                       superframes_in_memory=superframes_in_memory)
+            with self._profiler.stage('create_hdf'):
+                existing_params = None
+                if incremental and os.path.isfile(output_path):
+                    existing_params = hdf_tools.param_names(output_path)
+                plan = self._stale.plan(written_params, existing_params)
+                if plan:
+                    changed_list = [p for p in param_list
+                                    if p.name in plan.process]
+                    written_params = [p.name for p in changed_list]
+                    self._update_hdf(lfl_path, data_path, output_path,
+                                     lfl_parser.frame, changed_list,
+                                     aircraft_info, plan.keep, plan.remove,
+                                     superframes_in_memory)
+                else:
+                    print 'Processing params: %s' % ', '.join(
+                        [p.name for p in param_list])
+                    self._create_hdf(lfl_path, data_path, output_path,
+                                     lfl_parser.frame, param_list,
+                                     aircraft_info, superframes_in_memory)
+        except Cancelled:
+            raise
         except Exception as err:
             message = 'Error occurred during processing. Please ensure the ' \
                 'frame doubling is declared if applicable as well as both ' \
@@ -445,7 +1237,13 @@ class ProcessAndPlotLoops(threading.Thread):
             self._queue_error_message('Processing failed!', message)
             traceback.print_exc()
             raise ProcessError(message)
+        # Parameters which have changed are still marked as stale.
+        self._check_cancelled()
 
+        with self._profiler.stage('summaries'):
+            hdf_tools.write_summaries(output_path, written_params)
+
+        self._stale.written()
         print 'Finished processing, output: %s' % output_path
         return axes
 
@@ -453,26 +1251,125 @@ class ProcessAndPlotLoops(threading.Thread):
         '''
         The processing loop.
         '''
-        prev_mtime = None
-        while True:
-            mtime = os.path.getmtime(self._lfl_path)
-            if not prev_mtime or mtime > prev_mtime:
-                if self._ready_to_plot.is_set():
-                    self._ready_to_plot.clear()
+        watcher = FileWatcher(self._lfl_path, debounce=self._debounce,
+                              use_inotify=self._use_inotify)
+        self._watcher = watcher
+        try:
+            changed = True
+            while not self.exit_loop.is_set():
+                if not changed:
+                    changed = watcher.wait(wakeups=[self._stopping])
+                    continue
+                changed = False
+                # Results still waiting to be plotted are superseded.
+                self._generation += 1
+                self._freeze_viewport()
+                self._profiler.start_iteration()
                 try:
-                    self._axes = self._function()
+                    axes = self._function()
+                except Cancelled:
+                    if not self.exit_loop.is_set():
+                        print 'LFL changed during processing; restarting.'
+                    # Restart with the latest LFL.
+                    changed = True
+                    continue
                 except ValueError:
                     continue
                 except ProcessError, x:
                     print x
-                    self.exit_loop.set()
+                    self.stop()
                     return
                 else:
-                    self._ready_to_plot.set()
-                finally:
-                    prev_mtime = mtime
-            else:
-                time.sleep(1)
+                    self._post(PLOT, (self._generation, axes))
+        finally:
+            self._watcher = None
+            watcher.close()
+            self._stopping.close()
+
+    def _freeze_viewport(self):
+        '''
+        Stop the plotted figure reading from the HDF file before it is
+        rewritten. The figure keeps its lines until the results are
+        replotted.
+        '''
+        viewport = self._viewport
+        if viewport:
+            viewport.freeze()
+        if self._live_plot:
+            self._live_plot.freeze()
+
+    def _draw(self):
+        '''
+        Load the processed parameters and plot them.
+
+        :rtype: matplotlib.figure.Figure
+        '''
+        # Only open parameters which are on an axis, the HDF file may contain
+        # others if the output path is reused.
+        param_names = itertools.chain.from_iterable(self._axes.values())
+        with self._profiler.stage('hdf_reload'):
+            params = hdf_tools.load_params(self._hdf_path, param_names)
+            for param in params.itervalues():
+                # Arrays which are entirely masked are not drawn.
+                if not (param.summary and param.summary['all_masked']):
+                    param.array
+        with self._profiler.stage('drawing'):
+            if self._live_plot:
+                # Drawn by the update.
+                return self._live_plot.update(params, self._axes)
+            fig = plot_parameters(
+                params, self._axes, title=os.path.basename(self._hdf_path),
+                decimate=self._decimate, cache=self._array_cache,
+                show=False, profiler=self._profiler)
+            if self._viewport:
+                self._viewport.disconnect()
+            if self._decimate:
+                # Axes are added in order of their numbers.
+                self._viewport = create_viewport_loader(
+                    params, self._axes, dict(zip(sorted(self._axes),
+                                                 fig.axes)))
+            if self._profiler.enabled:
+                fig.canvas.draw()
+        return fig
+
+    def _next_message(self, live):
+        '''
+        Wait for the next message from the processing loop.
+
+        :param live: Process the live plot window's events while waiting.
+        :type live: bool
+        :returns: Kind and value of the message, or None if waiting was
+            interrupted without one.
+        :rtype: (str, object) or None
+        '''
+        # Cleared before checking the queue so that a message posted
+        # afterwards sets it again.
+        self._message_posted.clear()
+        try:
+            return self._messages.get_nowait()
+        except Queue.Empty:
+            pass
+        if not live:
+            # Unlike Queue.get, waiting on the wakeup does not poll and is
+            # interrupted by KeyboardInterrupt.
+            self._message_posted.wait()
+            return None
+        from flightdataplotter.gui import call_after
+        canvas = self._live_plot.fig.canvas
+        # Messages posted from the processing thread stop the event loop
+        # within the main loop's thread.
+        self._interrupt = lambda: call_after(canvas.stop_event_loop)
+        try:
+            # A message may have been posted before the interrupt was set.
+            if self._messages.empty():
+                # Run until stopped by a message.
+                canvas.start_event_loop(0)
+        finally:
+            self._interrupt = None
+        try:
+            return self._messages.get_nowait()
+        except Queue.Empty:
+            return None
 
     def plot_loop(self):
         '''
@@ -483,89 +1380,622 @@ class ProcessAndPlotLoops(threading.Thread):
             # line affects the plotting window being shown on windows.
             if self.exit_loop.is_set():
                 return
-            error_message = self._get_error_message()
-            if error_message:
-                show_error_dialog(*error_message)
+            live = self._live_plot and self._live_plot.is_open
+            message = self._next_message(live)
+            if message is None:
                 continue
-            if self._ready_to_plot.is_set():
-                self._ready_to_plot.clear()
+            kind, value = message
+            if kind == ERROR:
+                from flightdataplotter.gui import show_error_dialog
+                # The plot window's events are processed while waiting for
+                # messages when it is open, so the dialog must not block.
+                show_error_dialog(*value, block=not live)
+            elif kind == PLOT:
+                generation, axes = value
+                if generation != self._generation:
+                    # The LFL is being reprocessed.
+                    continue
+                self._axes = axes
                 try:
-                    with hdf_file(self._hdf_path) as hdf:
-                        # iterate over whole file as only those params
-                        # required were converted earlier into the HDF file
-                        params = hdf.get_params()
-                    title = os.path.basename(self._hdf_path)
-                    plot_parameters(params, self._axes, title=title)
+                    self._draw()
+                    if generation != self._generation:
+                        # Reprocessing started while drawing.
+                        self._freeze_viewport()
+                    if not self._live_plot:
+                        plt.show()
                 except ValueError as err:
                     print 'Waiting for you to fix this error: %s' % err
                 except Exception as err:
                     # traceback required?
                     print 'Exception raised! %s: %s' % (err.__class__.__name__,
                                                         err)
+            elif kind == EXIT:
+                return
+
+
+# Headless rendering
+###############################################################################
+
+
+RENDER_FORMATS = ('png', 'svg')
+
+
+def read_batch_file(batch_path):
+    '''
+    Read LFL and data file path pairs from a batch file. Each line contains
+    an LFL path followed by a data file path, quoted if they contain spaces.
+    Relative paths are relative to the directory of the batch file. Blank
+    lines and lines starting with # are ignored.
+
+    :rtype: list of (str, str)
+    '''
+    batch_dir = os.path.dirname(batch_path)
+    pairs = []
+    with open(batch_path) as batch_file:
+        for line_number, line in enumerate(batch_file, start=1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            paths = shlex.split(line)
+            if len(paths) != 2:
+                raise ValueError('Expected an LFL path and data path on line '
+                                 '%d: %s' % (line_number, line))
+            pairs.append(tuple(os.path.join(batch_dir, path)
+                               for path in paths))
+    return pairs
+
+
+def slice_data_files(data_paths, percent_start, percent_stop):
+    '''
+    Copy the selected percentage of each data file, decompressing compressed
+    files, once before jobs are dispatched so that workers sharing a data
+    file do not write the same partial file.
+
+    :param data_paths: Data file paths, which may repeat.
+    :type data_paths: iterable of str
+    :returns: The path to process for each data path, or None if copying the
+        percentage failed.
+    :rtype: dict of str -> str or None
+    '''
+    process_paths = {}
+    for data_path in data_paths:
+        if data_path in process_paths:
+            continue
+        try:
+            if requires_copy(data_path, percent_start, percent_stop):
+                process_paths[data_path] = copy_file_part(
+                    data_path, percent_start, percent_stop)
             else:
-                time.sleep(1)
+                process_paths[data_path] = data_path
+        except (IOError, OSError, ValueError) as err:
+            print 'Failed to copy %d%%-%d%% of %s: %s' % (
+                percent_start, percent_stop, data_path, err)
+            process_paths[data_path] = None
+    return process_paths
 
 
-class Frame(wx.Frame):
+def render_plot(job):
     '''
-    There a built-in message dialogs which display a message, but they were
-    freezing due to the application's threading model.
+    Process a data file against an LFL and save the plot as an image without
+    displaying a window. Runs within a worker process.
+
+    :param job: LFL path, data path, path to process (from
+        slice_data_files), output directory, image format and a dict of
+        options: superframes_in_memory, aircraft_info, decimate and
+        lfl_cache_dir.
+    :type job: tuple
+    :returns: LFL path, data path, image path (None if rendering failed) and
+        a list of error messages.
+    :rtype: (str, str, str or None, list of (str, str))
     '''
-    def __init__(self, title, message):
-        wx.Frame.__init__(self, None, title=title)
-        #self.Bind(wx.EVT_CLOSE, self.OnClose)
-        panel = wx.Panel(self)
-        box = wx.BoxSizer(wx.VERTICAL)
+    lfl_path, data_path, process_path, output_dir, image_format, options = job
+    plt.switch_backend('Agg')
+    name = '%s__%s' % (os.path.splitext(os.path.basename(lfl_path))[0],
+                       os.path.splitext(os.path.basename(data_path))[0])
+    image_path = os.path.join(output_dir, '%s.%s' % (name, image_format))
+    temp_dir = tempfile.mkdtemp(prefix='FlightDataPlotter')
+    hdf_path = os.path.join(temp_dir, name + '.hdf5')
+    lfl_cache_dir = options.get('lfl_cache_dir')
+    loops = ProcessAndPlotLoops(
+        hdf_path, False, lfl_path, None,
+        lfl_cache=DiskLFLCache(lfl_cache_dir) if lfl_cache_dir else None)
+    try:
+        if process_path is None:
+            raise ValueError('Part of the data file could not be copied.')
+        axes = loops.process_data(
+            lfl_path, process_path, hdf_path, options['superframes_in_memory'],
+            False, options['aircraft_info'])
+        params = hdf_tools.load_params(
+            hdf_path, itertools.chain.from_iterable(axes.values()))
+        fig = plot_parameters(params, axes, title=name,
+                              decimate=options['decimate'], show=False)
+        fig.savefig(image_path, format=image_format)
+        plt.close(fig)
+    except Exception as err:
+        if not isinstance(err, (ValueError, ProcessError)):
+            traceback.print_exc()
+        image_path = None
+        failure = '%s: %s' % (err.__class__.__name__, err)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    errors = loops._take_error_messages()
+    if not image_path and not errors:
+        errors.append(('Rendering failed!', failure))
+    return lfl_path, data_path, image_path, errors
+
 
-        m_text = wx.StaticText(panel, -1, message, size=(340, 100),
-                               style=wx.TE_MULTILINE)
-        m_text.SetSize(m_text.GetBestSize())
-        button = wx.Button(panel, label='OK')
-        button.SetDefault()
-        button.Bind(wx.EVT_BUTTON, self.OnClose)
-        box.Add(m_text, flag=wx.ALL)
-        box.Add(button, flag=wx.EXPAND)
+def render_plots(pairs, output_dir, image_format, jobs, options):
+    '''
+    Render plots for LFL and data file pairs across a pool of processes.
+
+    :param pairs: LFL and data file path pairs.
+    :type pairs: list of (str, str)
+    :param jobs: Number of worker processes.
+    :type jobs: int
+    :param options: Options passed to render_plot, and percent_start and
+        percent_stop of each data file to render.
+    :type options: dict
+    :returns: Number of pairs which failed to render.
+    :rtype: int
+    '''
+    if not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+    process_paths = slice_data_files(
+        [data_path for lfl_path, data_path in pairs],
+        options['percent_start'], options['percent_stop'])
+    render_jobs = [(lfl_path, data_path, process_paths[data_path], output_dir,
+                    image_format, options)
+                   for lfl_path, data_path in pairs]
+    jobs = min(jobs, len(render_jobs))
+    if jobs > 1:
+        pool = multiprocessing.Pool(jobs)
+        results = pool.imap_unordered(render_plot, render_jobs)
+    else:
+        pool = None
+        results = itertools.imap(render_plot, render_jobs)
+    failures = 0
+    try:
+        for lfl_path, data_path, image_path, errors in results:
+            for title, message in errors:
+                print '%s (%s, %s): %s' % (title, lfl_path, data_path,
+                                           message)
+            if image_path:
+                print 'Rendered: %s' % image_path
+            else:
+                failures += 1
+                print 'Failed to render: %s, %s' % (lfl_path, data_path)
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+    print 'Rendered %d of %d plots into %s' % (
+        len(render_jobs) - failures, len(render_jobs), output_dir)
+    return failures
 
-        panel.SetSizerAndFit(box)
-        self.Layout()
-        self.Fit()
 
-    def OnClose(self, event):
-        self.Destroy()
+# Statistics reports
+###############################################################################
 
 
-def show_error_dialog(title, message):
+def report_pair(job):
     '''
-    Show error.
+    Process a data file against an LFL and calculate statistics of every
+    processed parameter without plotting. Runs within a worker process.
+
+    :param job: LFL path, data path, path to process (from
+        slice_data_files) and a dict of options: superframes_in_memory,
+        aircraft_info and lfl_cache_dir.
+    :type job: tuple
+    :returns: LFL path, data path, statistics of each parameter (None if
+        processing failed) and a list of error messages.
+    :rtype: (str, str, list of dict or None, list of (str, str))
     '''
-    frame = Frame(title, message)
-    frame.Show()
-    app.MainLoop()
+    lfl_path, data_path, process_path, options = job
+    name = '%s__%s' % (os.path.splitext(os.path.basename(lfl_path))[0],
+                       os.path.splitext(os.path.basename(data_path))[0])
+    temp_dir = tempfile.mkdtemp(prefix='FlightDataPlotter')
+    hdf_path = os.path.join(temp_dir, name + '.hdf5')
+    lfl_cache_dir = options.get('lfl_cache_dir')
+    loops = ProcessAndPlotLoops(
+        hdf_path, False, lfl_path, None,
+        lfl_cache=DiskLFLCache(lfl_cache_dir) if lfl_cache_dir else None)
+    rows = None
+    try:
+        if process_path is None:
+            raise ValueError('Part of the data file could not be copied.')
+        loops.process_data(
+            lfl_path, process_path, hdf_path,
+            options['superframes_in_memory'], False,
+            options['aircraft_info'])
+        rows = hdf_statistics(hdf_path)
+    except Exception as err:
+        if not isinstance(err, (ValueError, ProcessError)):
+            traceback.print_exc()
+        failure = '%s: %s' % (err.__class__.__name__, err)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    errors = loops._take_error_messages()
+    if rows is None and not errors:
+        errors.append(('Reporting failed!', failure))
+    return lfl_path, data_path, rows, errors
 
 
-def lfl_file_dialog():
-    #TOOD: Remember last directory accessed!
-    lfl_dialog = wx.FileDialog(None, message="Please choose an LFL file",
-                               defaultDir='',
-                               wildcard="*.lfl")
-    if lfl_dialog.ShowModal() == wx.ID_OK:
-        lfl_path = lfl_dialog.GetPath()
+def write_reports(pairs, report_path, output_format, jobs, options):
+    '''
+    Report statistics of the parameters processed for LFL and data file
+    pairs across a pool of processes, as a single report with a row per
+    pair and parameter.
+
+    :param pairs: LFL and data file path pairs.
+    :type pairs: list of (str, str)
+    :param output_format: One of REPORT_FORMATS.
+    :type output_format: str
+    :param jobs: Number of worker processes.
+    :type jobs: int
+    :param options: Options passed to report_pair, and percent_start and
+        percent_stop of each data file to report.
+    :type options: dict
+    :returns: Number of pairs which failed to process.
+    :rtype: int
+    '''
+    process_paths = slice_data_files(
+        [data_path for lfl_path, data_path in pairs],
+        options['percent_start'], options['percent_stop'])
+    report_jobs = [(lfl_path, data_path, process_paths[data_path], options)
+                   for lfl_path, data_path in pairs]
+    jobs = min(jobs, len(report_jobs))
+    if jobs > 1:
+        pool = multiprocessing.Pool(jobs)
+        results = pool.imap(report_pair, report_jobs)
     else:
-        show_error_dialog('Error!', 'An LFL file must be selected.')
-        sys.exit(1)
-    return lfl_path
+        pool = None
+        results = itertools.imap(report_pair, report_jobs)
+    failures = 0
+    report_rows = []
+    try:
+        for lfl_path, data_path, rows, errors in results:
+            for title, message in errors:
+                print '%s (%s, %s): %s' % (title, lfl_path, data_path,
+                                           message)
+            if rows is None:
+                failures += 1
+                print 'Failed to report: %s, %s' % (lfl_path, data_path)
+                continue
+            for row in rows:
+                row.update(lfl=lfl_path, data=data_path)
+            report_rows.extend(rows)
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+    write_report(report_rows, report_path, output_format)
+    print 'Reported %d parameters of %d of %d pairs into %s' % (
+        len(report_rows), len(report_jobs) - failures, len(report_jobs),
+        report_path)
+    return failures
+
+
+# Fleet processing and plotting
+###############################################################################
 
 
-def data_file_dialog():
-    data_dialog = wx.FileDialog(None, message="Please choose a raw data file",
-                                defaultDir='',
-                                wildcard="*.*")
-    if data_dialog.ShowModal() == wx.ID_OK:
-        data_path = data_dialog.GetPath()
+def process_fleet_file(job):
+    '''
+    Process a data file against an LFL. Runs within a worker process.
+
+    :param job: LFL path, data path, HDF path and a dict of options:
+        superframes_in_memory, aircraft_info, percent_start, percent_stop and
+        lfl_cache_dir.
+    :type job: tuple
+    :returns: Data path, axes (None if processing failed) and a list of error
+        messages.
+    :rtype: (str, dict or None, list of (str, str))
+    '''
+    lfl_path, data_path, hdf_path, options = job
+    lfl_cache_dir = options.get('lfl_cache_dir')
+    loops = ProcessAndPlotLoops(
+        hdf_path, False, lfl_path, None,
+        lfl_cache=DiskLFLCache(lfl_cache_dir) if lfl_cache_dir else None)
+    axes = None
+    failure = None
+    try:
+        process_path = data_path
+        if requires_copy(data_path, options['percent_start'],
+                         options['percent_stop']):
+            process_path = copy_file_part(data_path, options['percent_start'],
+                                          options['percent_stop'])
+        axes = loops.process_data(
+            lfl_path, process_path, hdf_path,
+            options['superframes_in_memory'], False,
+            options['aircraft_info'])
+    except Exception as err:
+        if not isinstance(err, (ValueError, ProcessError)):
+            traceback.print_exc()
+        failure = '%s: %s' % (err.__class__.__name__, err)
+    errors = loops._take_error_messages()
+    if failure and not errors:
+        errors.append(('Processing failed!', failure))
+    return data_path, axes, errors
+
+
+def fleet_xy(param, buckets, cache):
+    '''
+    :returns: Seconds from the start of the data and values to plot.
+    :rtype: (np.ndarray, np.ndarray)
+    '''
+    scale = 1.0 / param.hz
+    if buckets:
+        x, y = cache.get(('decimate', buckets, scale, fingerprint(param.array)),
+                         decimate_array, param.array, buckets, scale=scale)
     else:
-        show_error_dialog('Error!', 'A raw data file must be selected.')
-        sys.exit(1)
-    return data_path
+        x = cache.indices(len(param.array), scale)
+        y = param.array
+    return x + (param.offset or 0), y
+
+
+def plot_fleet(fleet_params, axes, title='', decimate=True, cache=None):
+    '''
+    Plot the parameters of many data files as small multiples: a column per
+    data file and a row per axis. The y-axes of each row are shared so that
+    values can be compared across data files.
+
+    :param fleet_params: Data file names and their parameters keyed by name,
+        or None if processing failed.
+    :type fleet_params: list of (str, dict or None)
+    :param axes: Parameter names plotted on each row keyed by axis number.
+    :type axes: dict
+    :param cache: Cache of decimated arrays to reuse between calls.
+    :type cache: ArrayCache or None
+    :returns: The plotted figure.
+    :rtype: matplotlib.figure.Figure
+    '''
+    if cache is None:
+        cache = ArrayCache()
+    print 'Plotting parameters of %d data files.' % len(fleet_params)
+    plt.rc('axes', grid=True)
+    plt.rc('grid', color='0.75', linestyle='-', linewidth=0.5)
+    prop = fm.FontProperties(size=8)
+
+    columns = len(fleet_params)
+    rows = len(axes)
+    fig = plt.figure(facecolor='white',
+                     figsize=(min(2 + 3 * columns, 24), 1 + 2 * rows))
+    fig.canvas.set_window_title("%s %s" % (
+        title, datetime.now().strftime('%A, %d %B %Y at %X')))
+    buckets = int(fig.get_figwidth() * fig.dpi / columns) if decimate else 0
+
+    row_axes = {}
+    for column, (name, params) in enumerate(fleet_params):
+        column_axis = None
+        for row, index in enumerate(sorted(axes)):
+            axis = fig.add_subplot(rows, columns, row * columns + column + 1,
+                                   sharex=column_axis,
+                                   sharey=row_axes.get(index))
+            column_axis = column_axis or axis
+            row_axes.setdefault(index, axis)
+            if row == 0:
+                axis.set_title(name, fontsize=9)
+            if row < rows - 1:
+                setp(axis.get_xticklabels(), visible=False)
+            else:
+                axis.set_xlabel('Seconds', fontsize=8)
+            if params is None:
+                axis.text(0.5, 0.5, 'Processing failed', ha='center',
+                          va='center', transform=axis.transAxes)
+                continue
+            for param_name in axes[index]:
+                param = params.get(param_name)
+                if param is None or np.ma.all(param.array.mask) or \
+                   param.data_type == 'ASCII' or \
+                   param.array.dtype.char == 'S':
+                    axis.plot([], label=param_name)
+                else:
+                    axis.plot(*fleet_xy(param, buckets, cache),
+                              label=param_name)
+            if column == 0:
+                axis.legend(loc='upper right', prop=prop)
+    return fig
+
+
+class FleetLoops(ProcessAndPlotLoops):
+    '''
+    Processes many data files against an LFL across a pool of processes
+    each time the LFL changes and plots them as small multiples.
+    '''
+    def __init__(self, lfl_path, data_paths, output_dir, options, jobs,
+                 **kwargs):
+        '''
+        :param data_paths: Paths of the data files.
+        :type data_paths: list of str
+        :param output_dir: Directory to write an HDF file per data file into.
+        :type output_dir: str
+        :param options: Options passed to process_fleet_file.
+        :type options: dict
+        :param jobs: Number of worker processes.
+        :type jobs: int
+        '''
+        super(FleetLoops, self).__init__(output_dir, False, lfl_path,
+                                         self.process_fleet, **kwargs)
+        self._data_paths = data_paths
+        self._options = options
+        self._jobs = min(jobs, len(data_paths))
+        self._pool = None
+        # Guards replacing the pool, which close terminates from another
+        # thread.
+        self._pool_lock = threading.Lock()
+        # HDF file paths keyed by data path, unique even if names clash.
+        self._hdf_paths = dict(
+            (data_path, os.path.join(output_dir, '%d_%s.hdf5' % (
+                index, os.path.splitext(os.path.basename(data_path))[0])))
+            for index, data_path in enumerate(data_paths))
+        # Data paths which were processed successfully by the last iteration.
+        self._processed = []
+
+    def process_fleet(self):
+        '''
+        Process every data file.
+
+        :returns: Axes of the processed data files.
+        :rtype: dict
+        :raises ValueError: If no data file could be processed.
+        :raises Cancelled: If the LFL changes again during processing.
+        '''
+        jobs = [(self._lfl_path, data_path, self._hdf_paths[data_path],
+                 self._options) for data_path in self._data_paths]
+        print 'Processing %d data files across %d processes.' % (
+            len(jobs), self._jobs)
+        with self._profiler.stage('create_hdf'):
+            if self._jobs > 1:
+                with self._pool_lock:
+                    if self.exit_loop.is_set():
+                        raise Cancelled()
+                    if self._pool is None:
+                        self._pool = multiprocessing.Pool(self._jobs)
+                    pool = self._pool
+                # Set by the pool when every job has finished (errors are
+                # caught by process_fleet_file), so that exiting or a
+                # further change to the LFL is not blocked while waiting
+                # for the results.
+                finished = Wakeup()
+                async_result = pool.map_async(
+                    process_fleet_file, jobs,
+                    callback=lambda results: finished.set())
+                try:
+                    while not finished.is_set():
+                        watcher = self._watcher
+                        if watcher is None:
+                            finished.wait()
+                        elif self._cancelled() or watcher.wait(
+                                wakeups=[finished, self._stopping]) or \
+                                self.exit_loop.is_set():
+                            # The workers are busy with the stale jobs.
+                            self._close_pool(pool)
+                            raise Cancelled()
+                finally:
+                    finished.close()
+                results = async_result.get()
+            else:
+                results = map(process_fleet_file, jobs)
+        axes = None
+        self._processed = []
+        # Show the errors of every data file within a single dialog.
+        error_messages = []
+        for data_path, data_axes, errors in results:
+            name = os.path.basename(data_path)
+            for title, message in errors:
+                error_messages.append('%s %s\n%s' % (name, title, message))
+            if data_axes is not None:
+                axes = axes or data_axes
+                self._processed.append(data_path)
+        if error_messages:
+            self._queue_error_message(
+                'Errors in %d of %d data files' % (
+                    len(jobs) - len(self._processed), len(jobs)),
+                '\n\n'.join(error_messages))
+        if axes is None:
+            raise ValueError('None of the data files could be processed.')
+        print 'Processed %d of %d data files.' % (len(self._processed),
+                                                  len(jobs))
+        return axes
+
+    def _draw(self):
+        param_names = list(itertools.chain.from_iterable(self._axes.values()))
+        fleet_params = []
+        with self._profiler.stage('hdf_reload'):
+            for data_path in self._data_paths:
+                name = os.path.basename(data_path)
+                if data_path not in self._processed:
+                    fleet_params.append((name, None))
+                    continue
+                params = hdf_tools.load_params(self._hdf_paths[data_path],
+                                               param_names)
+                for param in params.itervalues():
+                    param.array
+                fleet_params.append((name, params))
+        with self._profiler.stage('drawing'):
+            fig = plot_fleet(fleet_params, self._axes,
+                             title=os.path.basename(self._lfl_path),
+                             decimate=self._decimate,
+                             cache=self._array_cache)
+            if self._profiler.enabled:
+                fig.canvas.draw()
+        return fig
+
+    def _close_pool(self, pool):
+        '''
+        Terminate a pool of worker processes, replacing it with None if it is
+        still the current pool.
+        '''
+        with self._pool_lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.terminate()
+        pool.join()
+
+    def close(self):
+        '''
+        Stop processing and the worker processes.
+        '''
+        self.stop()
+        pool = self._pool
+        if pool:
+            self._close_pool(pool)
+
+
+def create_profiler(args):
+    '''
+    :rtype: StageProfiler or NullProfiler
+    '''
+    if args.profile_path == '-':
+        return StageProfiler(sys.stdout, cprofile_path=args.cprofile_path)
+    elif args.profile_path:
+        return StageProfiler(open(args.profile_path, 'a'),
+                             cprofile_path=args.cprofile_path)
+    return NullProfiler()
+
+
+def run_fleet(parser, args):
+    '''
+    Process and plot the LFL against a fleet of data files each time it
+    changes.
+    '''
+    data_paths = validate_fleet_args(parser, args)
+    profiler = create_profiler(args)
+    options = {
+        'superframes_in_memory': args.superframes_in_memory,
+        'aircraft_info': aircraft_info_from_args(args),
+        'percent_start': args.percent_start,
+        'percent_stop': args.percent_stop,
+        'lfl_cache_dir': args.lfl_cache_dir,
+    }
+    if args.output_path:
+        output_dir = args.output_path
+        temp_dir = None
+        if not os.path.isdir(output_dir):
+            os.makedirs(output_dir)
+    else:
+        output_dir = temp_dir = tempfile.mkdtemp(
+            prefix='FlightDataPlotterFleet')
+    process_thread = FleetLoops(args.lfl_path, data_paths, output_dir,
+                                options, args.jobs,
+                                debounce=args.debounce,
+                                use_inotify=not args.poll,
+                                decimate=args.decimate,
+                                profiler=profiler)
+    # Plots are shown in wx windows.
+    from flightdataplotter.gui import get_app
+    get_app()
+    process_thread.start()
+    try:
+        process_thread.plot_loop()
+    except KeyboardInterrupt:
+        print 'Setting exit_loop event.'
+    finally:
+        process_thread.close()
+        if temp_dir:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            print 'Removed temporary HDF files: %s.' % temp_dir
+        profiler.close()
 
 
 def main():
@@ -575,20 +2005,74 @@ def main():
     print ''
 
     parser = create_parser()
-    plot_args = validate_args(parser)
+    args = parser.parse_args()
+
+    if args.daemon:
+        try:
+            daemon.serve(args.socket_path, lfl_cache_dir=args.lfl_cache_dir)
+        except daemon.DaemonError as err:
+            parser.error(str(err))
+        except KeyboardInterrupt:
+            pass
+        return
+
+    if args.render_to or args.report_path:
+        pairs = validate_render_args(parser, args)
+        options = {
+            'superframes_in_memory': args.superframes_in_memory,
+            'aircraft_info': aircraft_info_from_args(args),
+            'decimate': args.decimate,
+            'percent_start': args.percent_start,
+            'percent_stop': args.percent_stop,
+            'lfl_cache_dir': args.lfl_cache_dir,
+        }
+        failures = 0
+        if args.report_path:
+            failures += write_reports(
+                pairs, args.report_path,
+                args.report_format or report_format(args.report_path),
+                args.jobs, options)
+        if args.render_to:
+            failures += render_plots(pairs, args.render_to,
+                                     args.render_format, args.jobs, options)
+        sys.exit(1 if failures else 0)
+
+    if args.fleet_paths:
+        run_fleet(parser, args)
+        return
+
+    plot_args = validate_args(parser, args)
+    profiler = create_profiler(args)
+
+    if args.lfl_cache_dir:
+        lfl_cache = DiskLFLCache(args.lfl_cache_dir)
+    else:
+        lfl_cache = None
 
     lfl_path = plot_args[0]
     hdf_path = plot_args[2]
     plot_changed = plot_args[4]
     plot_func = lambda: process_thread.process_data(*plot_args)
     process_thread = ProcessAndPlotLoops(hdf_path, plot_changed,
-                                         lfl_path, plot_func)
+                                         lfl_path, plot_func,
+                                         debounce=args.debounce,
+                                         use_inotify=not args.poll,
+                                         decimate=args.decimate,
+                                         workers=args.workers,
+                                         split=args.split,
+                                         profiler=profiler,
+                                         lfl_cache=lfl_cache,
+                                         live=args.live,
+                                         chunked=args.chunked)
+    # Plots are shown in wx windows.
+    from flightdataplotter.gui import get_app
+    get_app()
     process_thread.start()
     try:
         process_thread.plot_loop()
     except KeyboardInterrupt:
         print 'Setting exit_loop event.'
-        process_thread.exit_loop.set()
+        process_thread.stop()
     finally:
         # If the file is in a temporary location, remove it.
         if hdf_path.startswith(tempfile.gettempdir()) \
@@ -598,6 +2082,7 @@ def main():
                 print 'Removed temporary HDF file: %s.' % hdf_path
             except (OSError, IOError):
                 print 'Could not remove temporary HDF file: %s.' % hdf_path
+        profiler.close()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+Per-stage timing and resource usage of processing and plotting.
+'''
+
+import cProfile
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows.
+    resource = None
+
+
+# resource.RUSAGE_THREAD is Linux only and not defined by Python 2.
+RUSAGE_THREAD = 1 if sys.platform.startswith('linux') else None
+
+
+def _current_rss():
+    '''
+    :returns: Current resident set size of the process in MB according to
+        /proc/self/statm (Linux), otherwise None.
+    :rtype: float or None
+    '''
+    try:
+        with open('/proc/self/statm') as statm:
+            pages = int(statm.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / 1024.0 ** 2
+    except (IOError, OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def _usage():
+    '''
+    :returns: CPU seconds used by the current thread (or process if per
+        thread usage is unavailable), CPU seconds used by child processes and
+        the largest resident set size of the process since it started in MB.
+    :rtype: (float, float, float or None)
+    '''
+    if resource is None:
+        return time.clock(), 0.0, None
+    try:
+        own = resource.getrusage(RUSAGE_THREAD)
+    except (TypeError, ValueError, resource.error):
+        own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on OS X and kilobytes elsewhere.
+    max_rss /= 1024.0 ** 2 if sys.platform == 'darwin' else 1024.0
+    return (own.ru_utime + own.ru_stime,
+            children.ru_utime + children.ru_stime,
+            max_rss)
+
+
+class NullProfiler(object):
+    '''
+    Profiler which records nothing.
+    '''
+    enabled = False
+    iteration = 0
+
+    def start_iteration(self):
+        pass
+
+    @contextmanager
+    def stage(self, name):
+        yield
+
+    def close(self):
+        pass
+
+
+class StageProfiler(NullProfiler):
+    '''
+    Records wall time, CPU time and memory usage of named stages as JSON
+    lines, optionally collecting cProfile statistics while stages run.
+
+    Memory is recorded as the resident set size at the end of the stage
+    (rss_mb) and its change during the stage (rss_change_mb), which are None
+    where unavailable, and the largest resident set size of the process so
+    far (max_rss_mb). max_rss_mb is cumulative, so it only shows that a stage
+    used more memory than any before it if it increased during the stage.
+    '''
+    enabled = True
+
+    def __init__(self, output, cprofile_path=None):
+        '''
+        :param output: File object JSON lines are written to.
+        :type output: file
+        :param cprofile_path: Path to write cProfile statistics to on close.
+        :type cprofile_path: str or None
+        '''
+        self._output = output
+        self._cprofile_path = cprofile_path
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # cProfile only profiles the thread which enabled it, so one profile
+        # is kept per thread.
+        self._profiles = []
+        self.iteration = 0
+
+    def start_iteration(self):
+        '''
+        Start a new processing iteration, i.e. the LFL has been saved.
+        '''
+        with self._lock:
+            self.iteration += 1
+
+    def _get_profile(self):
+        profile = getattr(self._local, 'profile', None)
+        if profile is None and self._cprofile_path:
+            profile = self._local.profile = cProfile.Profile()
+            with self._lock:
+                self._profiles.append(profile)
+        return profile
+
+    @contextmanager
+    def stage(self, name):
+        '''
+        Context manager which records the resources used within it.
+
+        :param name: Name of the stage.
+        :type name: str
+        '''
+        depth = getattr(self._local, 'depth', 0)
+        self._local.depth = depth + 1
+        profile = self._get_profile()
+        # Nested stages are recorded but only the outermost enables cProfile.
+        if profile and not depth:
+            profile.enable()
+        iteration = self.iteration
+        start_wall = time.time()
+        start_cpu, start_child_cpu, _max_rss = _usage()
+        start_rss = _current_rss()
+        try:
+            yield
+        finally:
+            end_cpu, end_child_cpu, max_rss = _usage()
+            end_rss = _current_rss()
+            end_wall = time.time()
+            if profile and not depth:
+                profile.disable()
+            self._local.depth = depth
+            self._write({
+                'iteration': iteration,
+                'stage': name,
+                'thread': threading.current_thread().name,
+                'start': start_wall,
+                'wall': end_wall - start_wall,
+                'cpu': end_cpu - start_cpu,
+                'child_cpu': end_child_cpu - start_child_cpu,
+                'max_rss_mb': max_rss,
+                'rss_mb': end_rss,
+                'rss_change_mb': (
+                    None if start_rss is None or end_rss is None
+                    else end_rss - start_rss),
+            })
+
+    def _write(self, record):
+        line = json.dumps(record, sort_keys=True)
+        with self._lock:
+            self._output.write(line + '\n')
+            self._output.flush()
+
+    def close(self):
+        '''
+        Write cProfile statistics if enabled.
+        '''
+        with self._lock:
+            profiles = list(self._profiles)
+        if not self._cprofile_path or not profiles:
+            return
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            stats.add(profile)
+        stats.dump_stats(self._cprofile_path)
+        print 'Wrote cProfile statistics: %s' % self._cprofile_path
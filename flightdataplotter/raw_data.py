@@ -0,0 +1,494 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+Reading and slicing raw data files.
+'''
+
+import binascii
+import bz2
+import itertools
+import mmap
+import multiprocessing
+import os
+import re
+import tempfile
+import zipfile
+
+import numpy as np
+
+from flightdataplotter.frames import FrameIndex, open_index
+
+
+# Bytes copied per read/write when streaming raw data.
+COPY_BUFFER_SIZE = 4 * 1024 * 1024
+
+# Leading bytes of compressed formats supported by open_raw_data.
+COMPRESSED_SIGNATURES = (
+    'BZh',  # bzip2
+    'PK\x03\x04',  # zip (.SAC)
+)
+
+
+# Extensions of raw data files found within directories (see
+# data_file_paths), compressed or not. Matched case insensitively.
+RAW_DATA_EXTENSIONS = ('.dat', '.raw', '.bin', '.dlu', '.sac', '.bz2', '.zip')
+
+# Suffix of the partial copies written by copy_file_part.
+PART_SUFFIX = '_%d-%d.dat'
+PART_SUFFIX_RE = re.compile(r'_\d+-\d+\.dat$')
+
+
+# 48-bit magic numbers which start each bzip2 block and end each stream.
+# Blocks are not byte aligned so these are searched for at every bit offset.
+BZIP2_BLOCK_MAGIC = 0x314159265359
+BZIP2_END_MAGIC = 0x177245385090
+# A stream header with the largest block size can decompress any block.
+BZIP2_HEADER = 'BZh9'
+
+
+def is_compressed(path):
+    '''
+    :returns: Whether the file at path is bzip2 or zip compressed.
+    :rtype: bool
+    '''
+    with open(path, 'rb') as raw:
+        start = raw.read(4)
+    return any(start.startswith(s) for s in COMPRESSED_SIGNATURES)
+
+
+def part_range(size, percent_start=0, percent_stop=100):
+    '''
+    Byte range of a percentage of a file. The range starts on an even offset
+    and is a multiple of np.short (2 bytes) long.
+
+    :returns: Offset and number of bytes.
+    :rtype: (int, int)
+    '''
+    offset = int(percent_start * size / 100.0)
+    if offset % 2:
+        offset += 1  # make sure the start is even
+    read_end = int(percent_stop * size / 100.0)
+    amount = max(read_end - offset, 0)
+    if amount % 2:
+        amount -= 1  # make multiple of np.short (2 bytes)
+    return offset, amount
+
+
+def frame_part_range(path, size, percent_start, percent_stop,
+                     save_index=True):
+    '''
+    Byte offset and amount of a percentage of an uncompressed raw data file,
+    starting and stopping on frame boundaries from the file's frame index.
+    Falls back to part_range if no frames are found.
+
+    :param save_index: Save the frame index alongside the file (see
+        open_index), otherwise it is built in memory, e.g. for a temporary
+        file.
+    :type save_index: bool
+    :rtype: (int, int)
+    '''
+    index = open_index(path) if save_index else FrameIndex.build(path)
+    frame_range = None
+    if index.size == size:
+        frame_range = index.part_range(percent_start, percent_stop)
+    if frame_range is None:
+        return part_range(size, percent_start, percent_stop)
+    return frame_range
+
+
+def copy_stream(src, dest, amount, buffer_size=COPY_BUFFER_SIZE):
+    '''
+    Copy amount bytes from the current position of src to dest using a fixed
+    size buffer.
+
+    :returns: Number of bytes copied.
+    :rtype: int
+    '''
+    copied = 0
+    while copied < amount:
+        data = src.read(min(buffer_size, amount - copied))
+        if not data:
+            break
+        dest.write(data)
+        copied += len(data)
+    return copied
+
+
+def copy_mmap(src, dest, offset, amount, buffer_size=COPY_BUFFER_SIZE):
+    '''
+    Copy a byte range of an uncompressed file object to dest. The source is
+    memory mapped and written from buffers without copying into Python
+    strings.
+
+    :returns: Number of bytes copied.
+    :rtype: int
+    '''
+    if amount <= 0:
+        return 0
+    mapped = mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        amount = min(amount, len(mapped) - offset)
+        for pos in xrange(offset, offset + amount, buffer_size):
+            dest.write(buffer(mapped, pos,
+                              min(buffer_size, offset + amount - pos)))
+    finally:
+        mapped.close()
+    return max(amount, 0)
+
+
+def _magic_patterns(magic):
+    '''
+    Byte strings found within a bzip2 magic number at each bit offset.
+
+    :returns: Bytes found and the bit offset of the magic number relative to
+        the start of the byte before them, for each offset.
+    :rtype: list of (str, int)
+    '''
+    patterns = []
+    for shift in xrange(8):
+        # 7 bytes with the magic number starting shift bits in. Bytes 1 to 5
+        # lie entirely within the magic number.
+        window = binascii.unhexlify('%014x' % (magic << (8 - shift)))
+        patterns.append((window[1:6], shift))
+    return patterns
+
+
+def _read_bits(data, bit_offset, bits):
+    '''
+    :returns: Value of bits starting at a bit offset within data.
+    :rtype: int
+    '''
+    start = bit_offset // 8
+    end = (bit_offset + bits + 7) // 8
+    value = int(binascii.hexlify(data[start:end]), 16)
+    return (value >> ((end - start) * 8 - (bit_offset % 8) - bits)) & \
+        ((1 << bits) - 1)
+
+
+def find_bzip2_magic(data, magic):
+    '''
+    Find a bzip2 magic number at any bit offset.
+
+    :param data: Compressed data.
+    :type data: str or mmap.mmap
+    :returns: Sorted bit offsets of the magic number.
+    :rtype: list of int
+    '''
+    offsets = []
+    for pattern, shift in _magic_patterns(magic):
+        pos = data.find(pattern)
+        while pos != -1:
+            bit_offset = (pos - 1) * 8 + shift
+            if bit_offset >= 0 and bit_offset + 48 <= len(data) * 8 and \
+               _read_bits(data, bit_offset, 48) == magic:
+                offsets.append(bit_offset)
+            pos = data.find(pattern, pos + 1)
+    return sorted(offsets)
+
+
+def bzip2_blocks(data):
+    '''
+    Locate the blocks within bzip2 data, which may contain several streams.
+
+    :param data: Compressed data.
+    :type data: str or mmap.mmap
+    :returns: Start and stop bit offsets of each block, starting with its
+        block magic number.
+    :rtype: list of (int, int)
+    :raises ValueError: If the last block is not followed by the end of a
+        stream, e.g. if the file is truncated.
+    '''
+    starts = find_bzip2_magic(data, BZIP2_BLOCK_MAGIC)
+    ends = find_bzip2_magic(data, BZIP2_END_MAGIC)
+    if starts and (not ends or ends[-1] < starts[-1]):
+        raise ValueError('bzip2 stream is not terminated.')
+    boundaries = sorted(starts + ends)
+    stops = dict(zip(boundaries[:-1], boundaries[1:]))
+    return [(start, stops[start]) for start in starts]
+
+
+def bzip2_block_stream(data, start, stop):
+    '''
+    Create a bzip2 stream containing a single block.
+
+    :param data: Compressed data containing the block.
+    :type data: str
+    :param start: Bit offset of the block magic number within data.
+    :type start: int
+    :param stop: Bit offset of the end of the block.
+    :type stop: int
+    :rtype: str
+    '''
+    bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8))[start:stop]
+    block_crc = _read_bits(data, start + 48, 32)
+    # The stream's combined CRC of a single block is the block's CRC.
+    end = np.unpackbits(np.frombuffer(binascii.unhexlify(
+        '%012x%08x' % (BZIP2_END_MAGIC, block_crc)), dtype=np.uint8))
+    return BZIP2_HEADER + np.packbits(np.concatenate([bits, end])).tostring()
+
+
+def _decompress_bzip2_block(job):
+    '''
+    Decompress a block of a bzip2 file. Runs within a worker process.
+    '''
+    src_path, start, stop = job
+    with open(src_path, 'rb') as src:
+        src.seek(start // 8)
+        data = src.read((stop + 7) // 8 - start // 8)
+    offset = start // 8 * 8
+    return bz2.decompress(bzip2_block_stream(data, start - offset,
+                                             stop - offset))
+
+
+def _extract_zip_member(job):
+    '''
+    Extract a zip archive member into part of the output file. Runs within a
+    worker process.
+    '''
+    src_path, dest_path, name, offset = job
+    with zipfile.ZipFile(src_path) as archive, \
+            archive.open(name) as member, open(dest_path, 'r+b') as dest:
+        dest.seek(offset)
+        copy_stream(member, dest, archive.getinfo(name).file_size)
+
+
+def _map(function, jobs, workers):
+    '''
+    :returns: Iterator of job results in order, computed across a pool of
+        worker processes if more than one worker and job.
+    :rtype: iterator
+    '''
+    workers = min(workers, len(jobs))
+    # Pool workers (e.g. rendering or fleet processes) cannot start their
+    # own processes.
+    if workers < 2 or multiprocessing.current_process().daemon:
+        for result in itertools.imap(function, jobs):
+            yield result
+        return
+    pool = multiprocessing.Pool(workers)
+    try:
+        for result in pool.imap(function, jobs):
+            yield result
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def decompress_bzip2(src_path, dest_path, workers):
+    '''
+    Decompress the blocks of a bzip2 file across worker processes, writing
+    them to dest_path in order.
+    '''
+    with open(src_path, 'rb') as src:
+        mapped = mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            blocks = bzip2_blocks(mapped)
+        finally:
+            mapped.close()
+    jobs = [(src_path, start, stop) for start, stop in blocks]
+    with open(dest_path, 'wb') as dest:
+        for data in _map(_decompress_bzip2_block, jobs, workers):
+            dest.write(data)
+
+
+def extract_zip(src_path, dest_path, workers):
+    '''
+    Extract the members of a zip archive (e.g. .SAC) across worker processes,
+    concatenated in archive order.
+    '''
+    with zipfile.ZipFile(src_path) as archive:
+        members = [i for i in archive.infolist()
+                   if not i.filename.endswith('/')]
+    jobs = []
+    offset = 0
+    for info in members:
+        jobs.append((src_path, dest_path, info.filename, offset))
+        offset += info.file_size
+    with open(dest_path, 'wb') as dest:
+        dest.truncate(offset)
+    list(_map(_extract_zip_member, jobs, workers))
+
+
+def decompress_file(src_path, dest_path, workers=None):
+    '''
+    Decompress a bzip2 or zip compressed raw data file across worker
+    processes. bzip2 files are split into their blocks, which are located by
+    searching for the block magic number, and each block is decompressed as
+    a separate stream. The members of zip archives are extracted
+    concurrently.
+
+    :param workers: Number of worker processes, by default the number of
+        CPUs.
+    :type workers: int or None
+    :returns: Whether the file was decompressed. If not, e.g. if a block
+        could not be decompressed, open_raw_data must be used instead.
+    :rtype: bool
+    '''
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    with open(src_path, 'rb') as raw:
+        start = raw.read(4)
+    try:
+        if start.startswith('BZh'):
+            decompress_bzip2(src_path, dest_path, workers)
+        elif start.startswith('PK\x03\x04'):
+            extract_zip(src_path, dest_path, workers)
+        else:
+            return False
+    except (IOError, EOFError, ValueError, zipfile.BadZipfile) as err:
+        print 'Could not decompress %s in parallel: %s' % (src_path, err)
+        if os.path.exists(dest_path):
+            os.remove(dest_path)
+        return False
+    return True
+
+
+def requires_copy(path, percent_start=0, percent_stop=100):
+    '''
+    Whether a data file must be copied with copy_file_part before processing,
+    either because only a percentage of it is selected or because it is
+    compressed, in which case the copy is decompressed across processes
+    rather than read through open_raw_data.
+
+    :rtype: bool
+    '''
+    return percent_start > 0 or percent_stop < 100 or is_compressed(path)
+
+
+def copy_file_part(src_path, percent_start=0, percent_stop=100,
+                   workers=None):
+    '''
+    Copies percentage of the source path to a new destination file. If source
+    is compressed, output is read out into a decompressed file.
+
+    src_path can be either a zip (.SAC), bz2 or uncompressed data file
+
+    Data is streamed through a fixed size buffer so memory usage does not
+    depend on the size of the file. Uncompressed files are memory mapped and
+    sliced on frame boundaries (see frame_part_range). Compressed files
+    are decompressed across worker processes (see decompress_file) and the
+    decompressed data is sliced on frame boundaries in the same way.
+    TODO: Move to flightdatautilities.filesystem_tools ?
+
+    :param workers: Number of processes to decompress with, by default the
+        number of CPUs.
+    :type workers: int or None
+    '''
+    ext = PART_SUFFIX % (percent_start, percent_stop)
+    dest_path = os.path.splitext(src_path)[0] + ext
+    if os.path.isfile(dest_path) and os.path.getsize(dest_path):
+        print 'Partial file already exists; using: %s' % dest_path
+        return dest_path
+    # Write to a temporary path so that an interrupted copy is not mistaken
+    # for an existing partial file. The path is unique so that processes
+    # copying the same part at once do not write over each other.
+    temp_path = _temp_path(dest_path, '.part')
+    try:
+        _copy_part(src_path, temp_path, percent_start, percent_stop, workers)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return _rename_part(temp_path, dest_path)
+
+
+def _copy_part(src_path, dest_path, percent_start, percent_stop, workers):
+    '''
+    Write a percentage of the source path to dest_path (see copy_file_part).
+    '''
+    compressed = is_compressed(src_path)
+    if compressed and percent_start == 0 and percent_stop == 100:
+        if decompress_file(src_path, dest_path, workers):
+            return
+    elif compressed:
+        decompressed_path = _temp_path(dest_path, '.decompressed')
+        try:
+            if decompress_file(src_path, decompressed_path, workers):
+                with open(decompressed_path, 'rb') as src, \
+                        open(dest_path, 'wb') as dest:
+                    size = os.fstat(src.fileno()).st_size
+                    offset, amount = frame_part_range(
+                        decompressed_path, size, percent_start,
+                        percent_stop, save_index=False)
+                    copy_mmap(src, dest, offset, amount)
+                return
+        finally:
+            if os.path.exists(decompressed_path):
+                os.remove(decompressed_path)
+    with open(dest_path, 'wb') as dest:
+        if compressed:
+            from flightdatautilities.filesystem_tools import open_raw_data
+            src = open_raw_data(src_path)
+            try:
+                src.seek(0, 2)
+                size = src.tell()
+                offset, amount = part_range(size, percent_start, percent_stop)
+                src.seek(offset)
+                copy_stream(src, dest, amount)
+            finally:
+                src.close()
+        else:
+            with open(src_path, 'rb') as src:
+                size = os.fstat(src.fileno()).st_size
+                offset, amount = frame_part_range(src_path, size,
+                                                  percent_start, percent_stop)
+                copy_mmap(src, dest, offset, amount)
+
+
+def _temp_path(dest_path, suffix):
+    '''
+    Create an empty file with a unique path alongside dest_path.
+
+    :rtype: str
+    '''
+    fd, temp_path = tempfile.mkstemp(
+        prefix=os.path.basename(dest_path) + '.', suffix=suffix,
+        dir=os.path.dirname(dest_path) or '.')
+    os.close(fd)
+    return temp_path
+
+
+def _rename_part(temp_path, dest_path):
+    '''
+    Replace dest_path with a completed copy, which may have been written by
+    another process at the same time.
+
+    :rtype: str
+    '''
+    try:
+        os.rename(temp_path, dest_path)
+    except OSError:
+        # Windows does not replace existing files.
+        if not os.path.exists(dest_path):
+            raise
+        os.remove(dest_path)
+        os.rename(temp_path, dest_path)
+    return dest_path
+
+
+def data_file_paths(paths):
+    '''
+    Expand data file and directory paths into data files, e.g. those of a
+    fleet. Directories are not searched recursively and only contain files
+    with RAW_DATA_EXTENSIONS which are not hidden or partial copies written
+    by copy_file_part. Paths of files are kept as given.
+
+    :param paths: Data file or directory paths.
+    :type paths: list of str
+    :rtype: list of str
+    '''
+    data_paths = []
+    for path in paths:
+        if not os.path.isdir(path):
+            data_paths.append(path)
+            continue
+        for name in sorted(os.listdir(path)):
+            file_path = os.path.join(path, name)
+            if name.startswith('.') or \
+               not name.lower().endswith(RAW_DATA_EXTENSIONS) or \
+               PART_SUFFIX_RE.search(name) or \
+               not os.path.isfile(file_path):
+                continue
+            data_paths.append(file_path)
+    return data_paths
@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+Statistics of processed parameters written as CSV or JSON without plotting
+(--report), so that LFLs can be checked against data files in continuous
+integration.
+
+Each parameter is read from the HDF file a chunk of samples at a time and
+its statistics are accumulated with array operations, so reporting takes
+about as long as reading the file.
+'''
+
+import csv
+import json
+
+import h5py
+import numpy as np
+
+from flightdataplotter.hdf_tools import SERIES, SUMMARY_CHUNK_SIZE
+
+
+REPORT_FORMATS = ('csv', 'json')
+# Changes between adjacent unmasked samples larger than this multiple of
+# the typical change are counted as rate of change outliers. The typical
+# change is the median of each chunk's median non-zero change, so that it is
+# not skewed by a short chunk.
+RATE_OUTLIER_FACTOR = 10
+# Columns of the report. lfl and data identify the pair which was processed.
+REPORT_FIELDS = ('lfl', 'data', 'name', 'frequency', 'length',
+                 'masked_fraction', 'min', 'max', 'mean', 'constant',
+                 'max_rate', 'rate_outliers')
+
+
+def report_format(report_path, default='csv'):
+    '''
+    Choose the format of a report from its file extension.
+
+    :param report_path: Path of report.
+    :type report_path: str
+    :returns: One of REPORT_FORMATS.
+    :rtype: str
+    '''
+    extension = report_path.rpartition('.')[2].lower()
+    return extension if extension in REPORT_FORMATS else default
+
+
+def parameter_statistics(group, chunk_size=SUMMARY_CHUNK_SIZE):
+    '''
+    Calculate the statistics of a parameter's array in a single pass.
+
+    The statistics are the frequency, length, the fraction of masked samples
+    (masked_fraction) and, for numeric arrays, the minimum, maximum and mean
+    of unmasked finite values, whether they are all equal (constant), the
+    largest change per second between adjacent valid samples (max_rate) and
+    the number of changes which are outliers compared with the typical change
+    (rate_outliers, see RATE_OUTLIER_FACTOR). Outliers are not counted for
+    multistate parameters. Changes are not measured across masked or
+    non-finite samples. Statistics which cannot be calculated are None.
+
+    :param group: Parameter group within an HDF file.
+    :type group: h5py.Group
+    :rtype: dict
+    '''
+    data = group['data']
+    mask = group['mask'] if 'mask' in group else None
+    length = len(data)
+    frequency = float(group.attrs.get('frequency', 1) or 1)
+    numeric = data.dtype.kind in 'biuf'
+    multistate = 'values_mapping' in group.attrs
+    valid_count = count = 0
+    total = max_change = 0.0
+    minimum = maximum = None
+    # The last sample of the previous chunk and whether it was valid.
+    previous = np.zeros(1)
+    previous_valid = np.zeros(1, dtype=np.bool_)
+    outliers = 0
+    typical_changes = []
+    for start in xrange(0, length, chunk_size):
+        stop = min(start + chunk_size, length)
+        if mask is None:
+            valid = np.ones(stop - start, dtype=np.bool_)
+        else:
+            valid = ~mask[start:stop].astype(np.bool_)
+        valid_count += int(np.count_nonzero(valid))
+        if not numeric:
+            continue
+        chunk = data[start:stop].astype(np.float64)
+        valid &= np.isfinite(chunk)
+        # Changes continue from the last sample of the previous chunk and
+        # are only measured between adjacent samples which are both valid.
+        samples = np.concatenate((previous, chunk))
+        samples_valid = np.concatenate((previous_valid, valid))
+        previous, previous_valid = samples[-1:], samples_valid[-1:]
+        values = chunk[valid]
+        if not len(values):
+            continue
+        chunk_min, chunk_max = values.min(), values.max()
+        minimum = chunk_min if minimum is None else min(minimum, chunk_min)
+        maximum = chunk_max if maximum is None else max(maximum, chunk_max)
+        total += values.sum()
+        count += len(values)
+        adjacent = samples_valid[1:] & samples_valid[:-1]
+        changes = np.abs(samples[1:][adjacent] - samples[:-1][adjacent])
+        if not len(changes):
+            continue
+        max_change = max(max_change, changes.max())
+        # Quantised signals mostly repeat values, so the typical change is
+        # measured from samples which change.
+        moving = changes[changes > 0]
+        if len(moving) and not multistate:
+            typical_changes.append(np.median(moving))
+            outliers += int(np.count_nonzero(
+                moving > RATE_OUTLIER_FACTOR * np.median(typical_changes)))
+    statistics = {
+        'frequency': frequency,
+        'length': length,
+        'masked_fraction': (
+            1 - valid_count / float(length) if length else None),
+        'min': None,
+        'max': None,
+        'mean': None,
+        'constant': None,
+        'max_rate': None,
+        'rate_outliers': None,
+    }
+    if count:
+        statistics.update({
+            'min': float(minimum),
+            'max': float(maximum),
+            'mean': total / count,
+            'constant': bool(minimum == maximum),
+            'max_rate': max_change * frequency,
+            'rate_outliers': None if multistate else outliers,
+        })
+    return statistics
+
+
+def hdf_statistics(hdf_path, chunk_size=SUMMARY_CHUNK_SIZE):
+    '''
+    Calculate the statistics (see parameter_statistics) of every parameter
+    within an HDF file.
+
+    :param hdf_path: Path of HDF file.
+    :type hdf_path: str
+    :returns: Statistics of each parameter including its name, sorted by
+        name.
+    :rtype: list of dict
+    '''
+    rows = []
+    with h5py.File(hdf_path, 'r') as hdf:
+        for name in sorted(hdf[SERIES]):
+            statistics = parameter_statistics(hdf[SERIES][name], chunk_size)
+            statistics['name'] = name
+            rows.append(statistics)
+    return rows
+
+
+def write_report(rows, report_path, output_format='csv'):
+    '''
+    Write parameter statistics as CSV, with a column per REPORT_FIELDS and
+    empty cells for None, or as a JSON list of objects.
+
+    :param rows: Statistics of each parameter.
+    :type rows: list of dict
+    :param report_path: Path of report.
+    :type report_path: str
+    :param output_format: One of REPORT_FORMATS.
+    :type output_format: str
+    '''
+    with open(report_path, 'wb') as report_file:
+        if output_format == 'json':
+            json.dump([dict((k, row.get(k)) for k in REPORT_FIELDS)
+                       for row in rows], report_file, indent=2,
+                      sort_keys=True)
+            report_file.write('\n')
+        else:
+            writer = csv.DictWriter(report_file, REPORT_FIELDS,
+                                    extrasaction='ignore')
+            writer.writeheader()
+            for row in rows:
+                writer.writerow(dict(
+                    (k, '' if row.get(k) is None else row[k])
+                    for k in REPORT_FIELDS))
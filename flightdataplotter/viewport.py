@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+Reloading plotted lines from the HDF file for the visible x-axis range, so
+that zooming into a long recording shows every sample while the overview
+only holds the decimated arrays.
+'''
+
+import math
+import threading
+
+from flightdataplotter.decimate import minmax_decimate
+
+
+# Milliseconds to wait for the x-axis limits to settle (e.g. while panning)
+# before reading from the HDF file.
+DEFAULT_DELAY = 200
+
+
+def window_range(x_min, x_max, scale, shift, size):
+    '''
+    Range of samples of a parameter which are visible between two x-axis
+    values, extended by a sample either side so that lines reach the edges.
+
+    :param scale: x-axis units per sample.
+    :type scale: float
+    :param shift: x-axis value of the first sample.
+    :type shift: float
+    :param size: Number of samples.
+    :type size: int
+    :returns: Start and stop sample indices.
+    :rtype: (int, int)
+    '''
+    start = int(math.floor((x_min - shift) / scale)) - 1
+    stop = int(math.ceil((x_max - shift) / scale)) + 2
+    start = min(max(start, 0), size)
+    return start, min(max(stop, start), size)
+
+
+class LineSource(object):
+    '''
+    The parameter a plotted line was drawn from.
+    '''
+    def __init__(self, line, param, scale, shift=0):
+        '''
+        :param line: The plotted line.
+        :type line: matplotlib.lines.Line2D
+        :param param: Parameter to read windows of samples from.
+        :type param: hdf_tools.LazyParameter
+        :param scale: x-axis units per sample.
+        :type scale: float
+        :param shift: x-axis value of the first sample.
+        :type shift: float
+        '''
+        self.line = line
+        self.param = param
+        self.scale = scale
+        self.shift = shift
+        # The plotted array may have been truncated for alignment.
+        self.size = len(param.array)
+        # The decimated overview of the whole array.
+        self.overview = line.get_data()
+
+    def load(self, x_min, x_max, buckets):
+        '''
+        Replace the line's data with the samples between two x-axis values,
+        decimated to the given number of buckets.
+
+        :rtype: None
+        '''
+        start, stop = window_range(x_min, x_max, self.scale, self.shift,
+                                   self.size)
+        if start == 0 and stop >= self.size:
+            self.line.set_data(*self.overview)
+            return
+        indices, values = minmax_decimate(self.param.read(start, stop),
+                                          buckets)
+        self.line.set_data((indices + start) * self.scale + self.shift,
+                           values)
+
+
+class ViewportLoader(object):
+    '''
+    Reloads lines for the visible x-axis range each time it changes.
+
+    Lines are read from the HDF file within the plotting thread, so the
+    loader must be frozen (see freeze) before the file is rewritten.
+    '''
+    def __init__(self, axes, sources, delay=DEFAULT_DELAY):
+        '''
+        :param axes: Axes sharing the x-axis which contain the lines.
+        :type axes: list of matplotlib.axes.Axes
+        :param sources: Parameters the lines were drawn from.
+        :type sources: list of LineSource
+        :param delay: Milliseconds to wait for the limits to settle.
+        :type delay: int
+        '''
+        self.axes = axes
+        self.sources = sources
+        for source in sources:
+            # Windows are read from the HDF file as needed.
+            source.param.array = None
+        self._timer = axes[0].figure.canvas.new_timer(interval=delay)
+        self._timer.single_shot = True
+        self._timer.add_callback(self.refresh)
+        # Held while reading so that freezing waits for a read to finish.
+        self._lock = threading.Lock()
+        self.frozen = False
+        # Limits changed by zooming one axis do not notify shared axes.
+        self._cids = [(axis, axis.callbacks.connect('xlim_changed',
+                                                    self._on_xlim_changed))
+                      for axis in axes]
+
+    def _on_xlim_changed(self, axis):
+        self._timer.stop()
+        self._timer.start()
+
+    @property
+    def zoomed(self):
+        '''
+        :returns: Whether the visible x-axis range excludes samples of any
+            line, i.e. lines are shown in more detail than their overview.
+        :rtype: bool
+        '''
+        x_min, x_max = sorted(self.axes[0].get_xlim())
+        for source in self.sources:
+            start, stop = window_range(x_min, x_max, source.scale,
+                                       source.shift, source.size)
+            if start > 0 or stop < source.size:
+                return True
+        return False
+
+    def refresh(self):
+        '''
+        Reload every line for the current x-axis limits and redraw, unless
+        frozen.
+        '''
+        x_min, x_max = sorted(self.axes[0].get_xlim())
+        buckets = max(int(self.axes[0].bbox.width), 1)
+        with self._lock:
+            if self.frozen:
+                return
+            for source in self.sources:
+                source.load(x_min, x_max, buckets)
+        self.axes[0].figure.canvas.draw_idle()
+
+    def freeze(self):
+        '''
+        Stop reading from the HDF file, e.g. before it is rewritten by
+        reprocessing. Lines keep the data they were last loaded with. Safe
+        to call from any thread and waits for a read in progress to finish.
+        '''
+        with self._lock:
+            self.frozen = True
+
+    def disconnect(self):
+        '''
+        Stop reloading lines, e.g. before the figure is replotted.
+        '''
+        self._timer.stop()
+        for axis, cid in self._cids:
+            axis.callbacks.disconnect(cid)
+        self._cids = []
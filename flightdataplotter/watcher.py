@@ -0,0 +1,292 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+Wait for a file to be modified. inotify is used where available (Linux),
+otherwise the file's modification time is polled.
+
+Editors often write a file several times when saving (truncate, write,
+rename, chmod) so changes are debounced: a change is only reported once no
+further events have been seen for the debounce window.
+
+Waiting can be cut short from another thread with a Wakeup, which is also
+used to wait for messages between threads without polling.
+'''
+
+import errno
+import os
+import select
+import struct
+import threading
+import time
+
+try:
+    import ctypes
+    import ctypes.util
+    _libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6',
+                        use_errno=True)
+    _inotify_init = _libc.inotify_init
+    _inotify_add_watch = _libc.inotify_add_watch
+    _inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p,
+                                   ctypes.c_uint32]
+except (ImportError, OSError, AttributeError):
+    _inotify_init = None
+
+
+# inotify event masks (sys/inotify.h).
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_TO | \
+    IN_CREATE
+
+# struct inotify_event: int wd; uint32_t mask, cookie, len; char name[len]
+_EVENT_STRUCT = struct.Struct('iIII')
+
+DEFAULT_DEBOUNCE = 0.25
+DEFAULT_POLL_INTERVAL = 0.1
+# Seconds between checks of a Wakeup where pipes cannot be selected (i.e.
+# not POSIX), so that KeyboardInterrupt is still received while waiting.
+WAKEUP_POLL_INTERVAL = 0.5
+
+
+def _select(fds, timeout):
+    '''
+    select.select for readable file descriptors, treating an interrupted
+    call as a timeout. KeyboardInterrupt is raised if the interruption was
+    SIGINT.
+
+    :returns: Readable file descriptors.
+    :rtype: list of int
+    '''
+    try:
+        return select.select(fds, [], [], timeout)[0]
+    except select.error as err:
+        if err.args[0] == errno.EINTR:
+            return []
+        raise
+
+
+class Wakeup(object):
+    '''
+    A flag which wakes a thread waiting for it to be set by another thread.
+
+    Python 2's threading.Condition polls when waiting with a timeout, and
+    cannot be interrupted by KeyboardInterrupt without one. On POSIX a pipe
+    is written when the flag is set so that waiting is a select call, which
+    sleeps until the flag is set and returns when a signal is received. The
+    pipe is only opened once it is needed.
+    '''
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._set = False
+        self._pipe = None
+        self._closed = False
+
+    def fileno(self):
+        '''
+        :returns: File descriptor which is readable while the flag is set, or
+            None if pipes cannot be selected.
+        :rtype: int or None
+        '''
+        if os.name != 'posix':
+            return None
+        with self._lock:
+            if self._pipe is None and not self._closed:
+                self._pipe = os.pipe()
+                if self._set:
+                    os.write(self._pipe[1], '\0')
+            return self._pipe[0] if self._pipe else None
+
+    def is_set(self):
+        return self._set
+
+    def set(self):
+        with self._lock:
+            if self._set:
+                return
+            self._set = True
+            if self._pipe:
+                os.write(self._pipe[1], '\0')
+
+    def clear(self):
+        with self._lock:
+            if not self._set:
+                return
+            self._set = False
+            if self._pipe:
+                os.read(self._pipe[0], 1)
+
+    def wait(self, timeout=None):
+        '''
+        Block until the flag is set or the timeout expires.
+
+        :param timeout: Maximum seconds to wait, or None to wait indefinitely.
+        :type timeout: float or None
+        :returns: Whether the flag is set.
+        :rtype: bool
+        '''
+        fd = self.fileno()
+        if fd is not None:
+            if not self._set:
+                _select([fd], timeout)
+            return self._set
+        deadline = None if timeout is None else time.time() + timeout
+        while not self._set:
+            remaining = WAKEUP_POLL_INTERVAL if deadline is None else \
+                min(deadline - time.time(), WAKEUP_POLL_INTERVAL)
+            if remaining <= 0:
+                break
+            time.sleep(remaining)
+        return self._set
+
+    def close(self):
+        '''
+        Close the pipe. The flag can still be set and checked but waiting
+        polls.
+        '''
+        with self._lock:
+            self._closed = True
+            if self._pipe:
+                for fd in self._pipe:
+                    os.close(fd)
+                self._pipe = None
+
+
+class FileWatcher(object):
+    '''
+    Watches a single file for modifications.
+
+    The containing directory is watched rather than the file itself so that
+    editors which save by writing a new file and renaming it over the
+    original are detected.
+    '''
+    def __init__(self, path, debounce=DEFAULT_DEBOUNCE,
+                 poll_interval=DEFAULT_POLL_INTERVAL, use_inotify=True):
+        '''
+        :param path: Path of file to watch.
+        :type path: str
+        :param debounce: Seconds without further events before a change is
+            reported.
+        :type debounce: float
+        :param poll_interval: Seconds between modification time checks when
+            polling.
+        :type poll_interval: float
+        :param use_inotify: Use inotify if available.
+        :type use_inotify: bool
+        '''
+        self.path = os.path.abspath(path)
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self._filename = os.path.basename(self.path)
+        self._fd = None
+        if use_inotify and _inotify_init is not None:
+            self._fd = self._open_inotify()
+        self._stat = self._get_stat()
+
+    @property
+    def using_inotify(self):
+        return self._fd is not None
+
+    def _open_inotify(self):
+        fd = _inotify_init()
+        if fd < 0:
+            return None
+        directory = os.path.dirname(self.path)
+        if _inotify_add_watch(fd, directory, IN_WATCH_MASK) < 0:
+            os.close(fd)
+            return None
+        return fd
+
+    def _get_stat(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime, stat.st_size
+
+    def _read_events(self, timeout, wakeups=()):
+        '''
+        :returns: Whether an event for the watched file was read before the
+            timeout or a wakeup was set.
+        :rtype: bool
+        '''
+        fds = [self._fd] + [wakeup.fileno() for wakeup in wakeups]
+        readable = _select([fd for fd in fds if fd is not None], timeout)
+        if self._fd not in readable:
+            return False
+        buf = os.read(self._fd, 64 * 1024)
+        matched = False
+        pos = 0
+        while pos + _EVENT_STRUCT.size <= len(buf):
+            _wd, _mask, _cookie, length = _EVENT_STRUCT.unpack_from(buf, pos)
+            pos += _EVENT_STRUCT.size
+            name = buf[pos:pos + length].rstrip('\0')
+            pos += length
+            if name == self._filename:
+                matched = True
+        return matched
+
+    def _wait_inotify(self, timeout, wakeups):
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            remaining = None if deadline is None else \
+                max(deadline - time.time(), 0)
+            if self._read_events(remaining, wakeups):
+                break
+            if any(wakeup.is_set() for wakeup in wakeups):
+                return False
+            if deadline is not None and time.time() >= deadline:
+                return False
+        # Debounce: wait for the burst of events to end.
+        while self._read_events(self.debounce):
+            pass
+        return True
+
+    def _wait_poll(self, timeout, wakeups):
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            stat = self._get_stat()
+            if stat is not None and stat != self._stat:
+                break
+            if any(wakeup.is_set() for wakeup in wakeups):
+                return False
+            if deadline is not None and time.time() >= deadline:
+                return False
+            time.sleep(self.poll_interval)
+        # Debounce: wait for the modification time to settle.
+        changed_at = time.time()
+        while time.time() - changed_at < self.debounce:
+            time.sleep(min(self.poll_interval, self.debounce))
+            new_stat = self._get_stat()
+            if new_stat != stat:
+                stat = new_stat
+                changed_at = time.time()
+        return True
+
+    def wait(self, timeout=None, wakeups=()):
+        '''
+        Block until the file changes, the timeout expires or one of the
+        wakeups is set.
+
+        :param timeout: Maximum seconds to wait, or None to wait indefinitely.
+        :type timeout: float or None
+        :param wakeups: Wakeups set by other threads to stop waiting.
+        :type wakeups: list of Wakeup
+        :returns: Whether the file changed.
+        :rtype: bool
+        '''
+        if self.using_inotify:
+            changed = self._wait_inotify(timeout, wakeups)
+        else:
+            changed = self._wait_poll(timeout, wakeups)
+        if changed:
+            self._stat = self._get_stat()
+        return changed
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
@@ -25,7 +25,7 @@ setup(
     platforms=pkg.__platforms__,
     license=pkg.__license__,
     keywords=pkg.__keywords__,
-    packages=find_packages(exclude=('tests',)),
+    packages=find_packages(exclude=('tests', 'benchmarks')),
     include_package_data=True,
     zip_safe=False,
     install_requires=requirements.install_requires,
@@ -37,6 +37,7 @@ setup(
     entry_points={
         'console_scripts': [
             'FlightDataPlotter=flightdataplotter.plot_params:main',
+            'FlightDataPlotterClient=flightdataplotter.daemon:main',
         ],
         'gui_scripts' : [],
     },
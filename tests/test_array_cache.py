@@ -0,0 +1,77 @@
+################################################################################
+# vim:et:ft=python:nowrap:sts=4:sw=4:ts=4
+################################################################################
+
+
+'''
+Tests for flightdataplotter.array_cache.
+'''
+
+
+################################################################################
+# Imports
+
+
+import numpy as np
+import unittest
+
+from flightdataplotter.array_cache import ArrayCache, fingerprint
+
+
+################################################################################
+# Test Cases
+
+
+class TestFingerprint(unittest.TestCase):
+    '''
+    '''
+    def test_fingerprint(self):
+        array = np.ma.arange(10)
+        self.assertEqual(fingerprint(array), fingerprint(np.ma.arange(10)))
+        self.assertNotEqual(fingerprint(array),
+                            fingerprint(np.ma.arange(10, dtype=float)))
+        masked = np.ma.arange(10)
+        masked[3] = np.ma.masked
+        self.assertNotEqual(fingerprint(array), fingerprint(masked))
+        self.assertNotEqual(fingerprint(array), fingerprint(array[::2]))
+
+
+class TestArrayCache(unittest.TestCase):
+    '''
+    '''
+    def test_get(self):
+        calls = []
+
+        def double(array):
+            calls.append(array)
+            return array * 2
+
+        cache = ArrayCache()
+        array = np.arange(5)
+        first = cache.get(('double', fingerprint(array)), double, array)
+        second = cache.get(('double', fingerprint(np.arange(5))), double,
+                           np.arange(5))
+        self.assertTrue(first is second)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_eviction(self):
+        cache = ArrayCache(max_entries=2)
+        cache.get('a', lambda: 1)
+        cache.get('b', lambda: 2)
+        cache.get('a', lambda: 1)
+        cache.get('c', lambda: 3)
+        self.assertEqual(len(cache), 2)
+        # 'b' was least recently used.
+        self.assertEqual(cache.get('b', lambda: 4), 4)
+        self.assertEqual(cache.get('a', lambda: 5), 5)
+
+    def test_indices(self):
+        cache = ArrayCache()
+        indices = cache.indices(4, 2.0)
+        self.assertEqual(indices.tolist(), [0, 2, 4, 6])
+        self.assertTrue(cache.indices(4, 2.0) is indices)
+
+
+################################################################################
+# vim:et:ft=python:nowrap:sts=4:sw=4:ts=4
@@ -0,0 +1,137 @@
+################################################################################
+# vim:et:ft=python:nowrap:sts=4:sw=4:ts=4
+################################################################################
+
+
+'''
+Tests for the benchmark suite's synthetic data generator and regression
+detection.
+'''
+
+
+################################################################################
+# Imports
+
+
+import configobj
+import os
+import shutil
+import tempfile
+import unittest
+
+from benchmarks.run_benchmarks import (
+    edit_to_plot_latency,
+    find_regressions,
+    run_stages,
+)
+from benchmarks.synthetic import SyntheticFrame
+from flightdataplotter import frames
+
+
+################################################################################
+# Test Cases
+
+
+class TestSyntheticFrame(unittest.TestCase):
+    '''
+    '''
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_layout(self):
+        frame = SyntheticFrame(wps=64, parameter_count=12)
+        words = set()
+        for name, frequency, slots in frame.parameters:
+            self.assertEqual(len(slots), frequency)
+            self.assertTrue(words.isdisjoint(slots))
+            words.update(slots)
+        self.assertFalse(set([0, 1]) & words)
+        self.assertEqual(frame.parameters[0][0], 'Altitude STD')
+
+    def test_too_many_parameters(self):
+        self.assertRaises(ValueError, SyntheticFrame, wps=64,
+                          parameter_count=100)
+
+    def test_write_raw(self):
+        frame = SyntheticFrame(wps=64, parameter_count=4)
+        path = os.path.join(self.temp_dir, 'synthetic.dat')
+        self.assertEqual(frame.write_raw(path, 130), 33)
+        self.assertEqual(os.path.getsize(path), 33 * 4 * 64 * 2)
+        words = frames.open_words(path)
+        wps, frame_starts = frames.find_frames(words)
+        self.assertEqual(wps, 64)
+        self.assertEqual(len(frame_starts), 33)
+        self.assertEqual(
+            words[frame_starts + 1].tolist(), [i % 16 for i in range(33)])
+
+    def test_lfl(self):
+        frame = SyntheticFrame(wps=64, parameter_count=6)
+        config = configobj.ConfigObj(frame.lfl().splitlines())
+        self.assertEqual(len(config['Parameters']), 6)
+        self.assertEqual(config['Parameter Group']['AXIS_1'],
+                         ['Synthetic 001', 'Synthetic 002', 'Synthetic 003',
+                          'Synthetic 004'])
+        self.assertEqual(config['Parameter Group']['AXIS_2'],
+                         ['Synthetic 005'])
+
+
+class TestFindRegressions(unittest.TestCase):
+    '''
+    '''
+    def test_find_regressions(self):
+        previous = {'process_data': {'min': 1.0},
+                    'plot_parameters': {'min': 1.0},
+                    'hdf_reload': {'skipped': 'ImportError'}}
+        current = {'process_data': {'min': 1.1},
+                   'plot_parameters': {'min': 1.5},
+                   'hdf_reload': {'min': 1.0}}
+        self.assertEqual(find_regressions(current, previous, 0.2),
+                         [('plot_parameters', 1.0, 1.5)])
+
+
+class TestEditToPlotLatency(unittest.TestCase):
+    '''
+    '''
+    def test_edit_to_plot_latency(self):
+        stages = {'copy_file_part': {'min': 5.0},
+                  'process_data': {'min': 1.0},
+                  'hdf_reload': {'min': 0.5},
+                  'plot_parameters': {'min': 0.25}}
+        self.assertEqual(edit_to_plot_latency(stages), 1.75)
+        stages['hdf_reload'] = {'skipped': 'process_data failed'}
+        self.assertIsNone(edit_to_plot_latency(stages))
+        del stages['hdf_reload']
+        self.assertIsNone(edit_to_plot_latency(stages))
+
+
+class TestRunStages(unittest.TestCase):
+    '''
+    '''
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_process_data_failed(self):
+        # The stages after processing are recorded as skipped.
+        frame = SyntheticFrame(wps=64, parameter_count=2)
+        lfl_path = os.path.join(self.temp_dir, 'invalid.lfl')
+        with open(lfl_path, 'w') as lfl_file:
+            lfl_file.write('[Parameters\n')
+        data_path = os.path.join(self.temp_dir, 'synthetic.dat')
+        frame.write_raw(data_path, frames.FRAMES_PER_SUPERFRAME *
+                        frames.SUBFRAMES_PER_FRAME)
+        stages = run_stages(lfl_path, data_path, self.temp_dir, 1)
+        self.assertIn('min', stages['copy_file_part'])
+        self.assertIn('min', stages['find_frames'])
+        for name in ('process_data', 'hdf_reload', 'plot_parameters'):
+            self.assertIn('skipped', stages[name])
+        self.assertIsNone(edit_to_plot_latency(stages))
+
+
+################################################################################
+# vim:et:ft=python:nowrap:sts=4:sw=4:ts=4
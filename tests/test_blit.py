@@ -0,0 +1,84 @@
+################################################################################
+# vim:et:ft=python:nowrap:sts=4:sw=4:ts=4
+################################################################################
+
+
+'''
+Tests for flightdataplotter.blit.
+'''
+
+
+################################################################################
+# Imports
+
+
+import unittest
+
+import numpy as np
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from flightdataplotter.blit import BlitManager
+
+
+################################################################################
+# Test Cases
+
+
+class TestBlitManager(unittest.TestCase):
+    '''
+    '''
+    def setUp(self):
+        self.fig = Figure(figsize=(2, 2), dpi=50)
+        self.canvas = FigureCanvasAgg(self.fig)
+        self.axis = self.fig.add_subplot(1, 1, 1)
+        self.axis.set_xlim(0, 10)
+        self.axis.set_ylim(0, 10)
+        self.line, = self.axis.plot([0, 10], [5, 5], linewidth=5)
+        self.draws = []
+        self.canvas.mpl_connect('draw_event', self.on_draw)
+
+    def on_draw(self, event):
+        self.draws.append(event)
+
+    def pixels(self):
+        return np.frombuffer(self.canvas.buffer_rgba(),
+                             dtype=np.uint8).copy()
+
+    def test_update(self):
+        manager = BlitManager(self.canvas, [self.line])
+        self.assertTrue(self.line.get_animated())
+        # Without a background the figure is fully drawn.
+        manager.update()
+        self.assertEqual(len(self.draws), 1)
+        first = self.pixels()
+
+        # Only the line is redrawn over the background.
+        self.line.set_data([0, 10], [2, 2])
+        manager.update()
+        self.assertEqual(len(self.draws), 1)
+        second = self.pixels()
+        self.assertFalse(np.array_equal(first, second))
+
+        # Moving the line back restores the original pixels.
+        self.line.set_data([0, 10], [5, 5])
+        manager.update()
+        self.assertTrue(np.array_equal(first, self.pixels()))
+
+    def test_set_artists(self):
+        manager = BlitManager(self.canvas)
+        manager.draw()
+        line, = self.axis.plot([0, 10], [0, 10])
+        manager.set_artists([self.line, line])
+        self.assertTrue(line.get_animated())
+        # The background must be recaptured.
+        manager.update()
+        self.assertEqual(len(self.draws), 2)
+        manager.disconnect()
+        manager.draw()
+        self.assertEqual(len(self.draws), 3)
+
+
+################################################################################
+# vim:et:ft=python:nowrap:sts=4:sw=4:ts=4
@@ -0,0 +1,215 @@
+################################################################################
+# vim:et:ft=python:nowrap:sts=4:sw=4:ts=4
+################################################################################
+
+
+'''
+Tests for flightdataplotter.convert.
+'''
+
+
+################################################################################
+# Imports
+
+
+import h5py
+import numpy as np
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from collections import namedtuple
+
+from benchmarks.synthetic import SyntheticFrame
+from flightdataplotter import frames, hdf_tools
+from flightdataplotter.convert import (
+    Cancelled,
+    create_hdf_chunked,
+    create_hdf_time_sliced,
+    expected_durations,
+    map_jobs,
+    merge_hdf_files,
+    partition_params,
+    superframe_counter,
+)
+
+from tests.test_hdf_tools import write_hdf
+
+try:
+    from compass.arinc717.data_frame_parser import parse_lfl
+    from compass.arinc717.hdf import create_hdf
+except ImportError:
+    create_hdf = None
+
+
+################################################################################
+# Test Cases
+
+
+Param = namedtuple('Param', 'name frequency')
+
+
+def sleep_job(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+class TestPartitionParams(unittest.TestCase):
+    '''
+    '''
+    def test_partition_params(self):
+        param_list = [Param('Acceleration Normal', 8), Param('Airspeed', 1),
+                      Param('Altitude STD', 1), Param('Heading', 1),
+                      Param('Pitch', 4), Param('Roll', 2)]
+        groups = partition_params(param_list, 2)
+        self.assertEqual(len(groups), 2)
+        self.assertEqual(sorted(sum(groups, [])),
+                         sorted(p.name for p in param_list))
+        frequencies = dict(param_list)
+        costs = [sum(frequencies[n] for n in g) for g in groups]
+        self.assertEqual(sorted(costs), [8, 9])
+
+    def test_more_partitions_than_params(self):
+        groups = partition_params([Param('Airspeed', 1)], 4)
+        self.assertEqual(groups, [['Airspeed']])
+
+
+class TestMapJobs(unittest.TestCase):
+    '''
+    '''
+    def test_map_jobs(self):
+        self.assertEqual(map_jobs(sleep_job, [0, 0.01]), [0, 0.01])
+        self.assertEqual(map_jobs(sleep_job, [0, 0.01], lambda: False),
+                         [0, 0.01])
+
+    def test_cancelled(self):
+        checks = []
+
+        def cancelled():
+            checks.append(time.time())
+            return len(checks) > 2
+
+        started = time.time()
+        self.assertRaises(Cancelled, map_jobs, sleep_job, [0, 10],
+                          cancelled)
+        # The workers are terminated rather than waited for.
+        self.assertTrue(time.time() - started < 5)
+        self.assertEqual(len(checks), 3)
+
+
+class TestSections(unittest.TestCase):
+    '''
+    '''
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_superframe_counter(self):
+        lfl_path = os.path.join(self.temp_dir, 'synthetic.lfl')
+        with open(lfl_path, 'w') as lfl_file:
+            lfl_file.write(SyntheticFrame(wps=64, parameter_count=2).lfl())
+        self.assertEqual(superframe_counter(lfl_path), (1, 2, 4, 1))
+        with open(lfl_path, 'w') as lfl_file:
+            lfl_file.write('[Frame]\nName = Synthetic\n')
+        self.assertEqual(superframe_counter(lfl_path), None)
+
+    def test_expected_durations(self):
+        # 40 frames of 512 bytes after 20 bytes which are not a frame.
+        index = frames.FrameIndex(64, np.arange(20, 20 + 40 * 512, 512),
+                                  20 + 40 * 512, 0)
+        ranges = [(0, 20 + 8 * 512), (20 + 8 * 512, 20 + 24 * 512),
+                  (20 + 24 * 512, 20 + 40 * 512)]
+        self.assertEqual(expected_durations(index, ranges),
+                         [None, 16 * 4, None])
+
+
+class TestMergeHDFFiles(unittest.TestCase):
+    '''
+    '''
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_merge_hdf_files(self):
+        paths = [os.path.join(self.temp_dir, '%d.hdf5' % i) for i in range(3)]
+        write_hdf(paths[0], {'Altitude STD': np.arange(4)})
+        write_hdf(paths[1], {'Airspeed': np.arange(4)})
+        write_hdf(paths[2], {'Heading': np.arange(4),
+                             'Altitude STD': np.arange(4)})
+        output_path = os.path.join(self.temp_dir, 'output.hdf5')
+        merge_hdf_files(paths, output_path)
+        self.assertEqual(hdf_tools.param_names(output_path),
+                         set(['Altitude STD', 'Airspeed', 'Heading']))
+        self.assertEqual(os.listdir(self.temp_dir), ['output.hdf5'])
+
+
+@unittest.skipIf(create_hdf is None, 'compass is not installed')
+class TestConversionMatchesSinglePass(unittest.TestCase):
+    '''
+    Conversion in sections must produce the same HDF file as a single
+    create_hdf pass over the whole data file.
+    '''
+    AIRCRAFT_INFO = {'Frame Doubled': False, 'Stretched': None}
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        frame = SyntheticFrame(wps=64, parameter_count=8)
+        self.lfl_path = os.path.join(self.temp_dir, 'synthetic.lfl')
+        with open(self.lfl_path, 'w') as lfl_file:
+            lfl_file.write(frame.lfl())
+        self.data_path = os.path.join(self.temp_dir, 'synthetic.dat')
+        # Seven and a half superframes, so the last section is partial.
+        frame.write_raw(self.data_path, 7.5 * frames.FRAMES_PER_SUPERFRAME *
+                        frames.SUBFRAMES_PER_FRAME)
+        self.param_names = [name for name, _frequency, _slots
+                            in frame.parameters]
+        self.lfl_parser, self.param_list = parse_lfl(
+            self.lfl_path, param_names=self.param_names,
+            aircraft_info=self.AIRCRAFT_INFO)
+        self.expected_path = os.path.join(self.temp_dir, 'expected.hdf5')
+        create_hdf(self.data_path, self.expected_path, self.lfl_parser.frame,
+                   self.param_list)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def assertSameParams(self, hdf_path):
+        with h5py.File(self.expected_path, 'r') as expected, \
+                h5py.File(hdf_path, 'r') as actual:
+            self.assertEqual(sorted(actual[hdf_tools.SERIES]),
+                             sorted(expected[hdf_tools.SERIES]))
+            for name, group in expected[hdf_tools.SERIES].iteritems():
+                other = actual[hdf_tools.SERIES][name]
+                self.assertEqual(other.attrs['frequency'],
+                                 group.attrs['frequency'])
+                self.assertEqual(other.attrs.get('supf_offset'),
+                                 group.attrs.get('supf_offset'))
+                for dataset in ('data', 'mask'):
+                    self.assertEqual(other[dataset][:].tolist(),
+                                     group[dataset][:].tolist(),
+                                     '%s %s differs' % (name, dataset))
+
+    def test_chunked(self):
+        output_path = os.path.join(self.temp_dir, 'chunked.hdf5')
+        self.assertTrue(create_hdf_chunked(
+            self.data_path, output_path, self.lfl_parser.frame,
+            self.param_list, superframe_counter(self.lfl_path), -1,
+            lambda: False, chunk_superframes=2))
+        self.assertSameParams(output_path)
+
+    def test_time_sliced(self):
+        output_path = os.path.join(self.temp_dir, 'time_sliced.hdf5')
+        self.assertTrue(create_hdf_time_sliced(
+            self.lfl_path, self.data_path, output_path, self.param_list,
+            self.AIRCRAFT_INFO, -1, 3))
+        self.assertSameParams(output_path)
+
+
+################################################################################
+# vim:et:ft=python:nowrap:sts=4:sw=4:ts=4
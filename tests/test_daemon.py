@@ -0,0 +1,208 @@
+################################################################################
+# vim:et:ft=python:nowrap:sts=4:sw=4:ts=4
+################################################################################
+
+
+'''
+Tests for flightdataplotter.daemon.
+'''
+
+
+################################################################################
+# Imports
+
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from flightdataplotter.daemon import (
+    Daemon,
+    DaemonError,
+    Sessions,
+    create_parser,
+    default_output_path,
+    is_running,
+    message_from_args,
+    request,
+)
+
+
+################################################################################
+# Test Cases
+
+
+class TestDaemon(unittest.TestCase):
+    '''
+    '''
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.temp_dir, 'daemon.sock')
+        self.requests = []
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def handler(self, message):
+        self.requests.append(message)
+        if message.get('lfl_path') == 'broken.lfl':
+            raise IOError('broken')
+        return {'status': 'ok', 'output_path': 'output.hdf5'}
+
+    def start(self):
+        daemon = Daemon(self.socket_path, self.handler)
+        daemon.bind()
+        thread = threading.Thread(target=daemon.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def stop(self, thread):
+        self.assertEqual(request(self.socket_path, {'command': 'shutdown'}),
+                         {'status': 'ok'})
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertFalse(os.path.exists(self.socket_path))
+
+    def test_requests(self):
+        thread = self.start()
+        try:
+            self.assertTrue(is_running(self.socket_path))
+            self.assertEqual(os.stat(self.socket_path).st_mode & 0o077, 0)
+            response = request(self.socket_path,
+                               {'command': 'render', 'lfl_path': 'a.lfl'})
+            self.assertEqual(response['status'], 'ok')
+            self.assertEqual(response['output_path'], 'output.hdf5')
+            self.assertTrue('elapsed' in response)
+            self.assertEqual(self.requests,
+                             [{'command': 'render', 'lfl_path': 'a.lfl'}])
+            # Handler exceptions are returned as errors.
+            response = request(self.socket_path,
+                               {'command': 'convert',
+                                'lfl_path': 'broken.lfl'})
+            self.assertEqual(response['status'], 'error')
+            self.assertEqual(response['message'], 'IOError: broken')
+            response = request(self.socket_path, {'command': 'explode'})
+            self.assertEqual(response['status'], 'error')
+            self.assertEqual(len(self.requests), 2)
+        finally:
+            self.stop(thread)
+
+    def test_already_running(self):
+        thread = self.start()
+        try:
+            self.assertRaises(DaemonError,
+                              Daemon(self.socket_path, self.handler).bind)
+        finally:
+            self.stop(thread)
+
+    def test_stale_socket(self):
+        open(self.socket_path, 'w').close()
+        self.assertFalse(is_running(self.socket_path))
+        self.stop(self.start())
+
+    def test_not_running(self):
+        self.assertRaises(DaemonError, request, self.socket_path,
+                          {'command': 'ping'})
+
+
+class FakeSession(object):
+    '''
+    Processes an LFL's Airspeed frequency into a shared dict standing in for
+    an HDF file, keeping existing parameters when updating incrementally as
+    ProcessAndPlotLoops.process_data does when no parameters have changed.
+    '''
+    LFL_FREQUENCIES = {'one.lfl': 2.0, 'two.lfl': 4.0}
+
+    def __init__(self, hdf_files, lfl_path, output_path):
+        self.hdf_files = hdf_files
+        self.lfl_path = lfl_path
+        self.output_path = output_path
+
+    def process_data(self, incremental):
+        hdf = self.hdf_files.setdefault(self.output_path, {})
+        if not (incremental and 'Airspeed' in hdf):
+            hdf['Airspeed'] = self.LFL_FREQUENCIES[self.lfl_path]
+        return hdf['Airspeed']
+
+
+class TestSessions(unittest.TestCase):
+    '''
+    '''
+    def setUp(self):
+        self.hdf_files = {}
+        self.sessions = Sessions(
+            lambda lfl_path, output_path: FakeSession(
+                self.hdf_files, lfl_path, output_path), max_sessions=2)
+
+    def process(self, lfl_path, data_path='data.dat',
+                output_path='data.hdf5'):
+        session, incremental = self.sessions.open(lfl_path, data_path,
+                                                  output_path)
+        return session.process_data(incremental), incremental
+
+    def test_alternating_lfls(self):
+        self.assertEqual(self.process('one.lfl'), (2.0, False))
+        self.assertEqual(self.process('one.lfl'), (2.0, True))
+        # two.lfl rewrites the file, so one.lfl must not trust it.
+        self.assertEqual(self.process('two.lfl'), (4.0, False))
+        self.assertEqual(self.process('one.lfl'), (2.0, False))
+        self.assertEqual(self.process('one.lfl'), (2.0, True))
+
+    def test_separate_outputs(self):
+        self.assertEqual(self.process('one.lfl', output_path='one.hdf5'),
+                         (2.0, False))
+        self.assertEqual(self.process('two.lfl', output_path='two.hdf5'),
+                         (4.0, False))
+        self.assertEqual(self.process('one.lfl', output_path='one.hdf5'),
+                         (2.0, True))
+
+    def test_eviction(self):
+        self.process('one.lfl', output_path='one.hdf5')
+        self.process('two.lfl', output_path='two.hdf5')
+        self.process('one.lfl', data_path='other.dat',
+                     output_path='other.hdf5')
+        # two.lfl's session is kept, one.lfl's was discarded.
+        self.assertEqual(self.process('two.lfl', output_path='two.hdf5'),
+                         (4.0, True))
+        self.assertEqual(self.process('one.lfl', output_path='one.hdf5'),
+                         (2.0, False))
+
+    def test_default_output_path(self):
+        self.assertNotEqual(default_output_path('/a/one.lfl', '/b/data.dat'),
+                            default_output_path('/a/two.lfl', '/b/data.dat'))
+        self.assertEqual(
+            os.path.basename(default_output_path('/a/one.lfl',
+                                                 '/b/data.dat')),
+            'one__data.hdf5')
+
+
+class TestMessageFromArgs(unittest.TestCase):
+    '''
+    '''
+    def test_render(self):
+        args = create_parser().parse_args(
+            ['render', 'example.lfl', 'data.dat', '-d', '--tail', 'G-ABCD',
+             '--stop', '50', '-i', 'plot.svg', '--render-format', 'svg'])
+        message = message_from_args(args)
+        self.assertEqual(message['command'], 'render')
+        self.assertEqual(message['lfl_path'], os.path.abspath('example.lfl'))
+        self.assertEqual(message['data_path'], os.path.abspath('data.dat'))
+        self.assertEqual(message['image_path'], os.path.abspath('plot.svg'))
+        self.assertEqual(message['image_format'], 'svg')
+        self.assertFalse('output_path' in message)
+        self.assertEqual(message['aircraft_info'],
+                         {'Frame Doubled': True, 'Stretched': None,
+                          'Tail Number': 'G-ABCD'})
+        self.assertEqual((message['percent_start'], message['percent_stop']),
+                         (0, 50))
+
+    def test_ping(self):
+        args = create_parser().parse_args(['ping'])
+        self.assertEqual(message_from_args(args), {'command': 'ping'})
+
+
+################################################################################
+# vim:et:ft=python:nowrap:sts=4:sw=4:ts=4
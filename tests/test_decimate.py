@@ -0,0 +1,72 @@
+################################################################################
+# vim:et:ft=python:nowrap:sts=4:sw=4:ts=4
+################################################################################
+
+
+'''
+Tests for flightdataplotter.decimate.
+'''
+
+
+################################################################################
+# Imports
+
+
+import numpy as np
+import unittest
+
+from flightdataplotter.decimate import minmax_decimate
+
+
+################################################################################
+# Test Cases
+
+
+class TestMinMaxDecimate(unittest.TestCase):
+    '''
+    '''
+    def test_short_array_unchanged(self):
+        array = np.ma.arange(10)
+        indices, values = minmax_decimate(array, 5)
+        self.assertEqual(indices.tolist(), range(10))
+        self.assertEqual(values.tolist(), range(10))
+
+    def test_disabled(self):
+        array = np.ma.arange(1000)
+        indices, values = minmax_decimate(array, 0)
+        self.assertEqual(len(values), 1000)
+
+    def test_spikes_preserved(self):
+        array = np.ma.zeros(1000)
+        array[123] = 50
+        array[877] = -20
+        indices, values = minmax_decimate(array, 10)
+        self.assertTrue(len(values) <= 30)
+        self.assertEqual(values.max(), 50)
+        self.assertEqual(values.min(), -20)
+        self.assertEqual(indices[values.argmax()], 123)
+        self.assertEqual(indices[values.argmin()], 877)
+        # Points are returned in order.
+        self.assertTrue(np.all(np.diff(indices) >= 0))
+
+    def test_masked_gaps_preserved(self):
+        array = np.ma.arange(1000, dtype=float)
+        array[300:500] = np.ma.masked
+        indices, values = minmax_decimate(array, 10)
+        masked_indices = indices[np.ma.getmaskarray(values)]
+        self.assertTrue(len(masked_indices))
+        self.assertTrue(np.all((masked_indices >= 300) &
+                               (masked_indices < 500)))
+        self.assertEqual(values.max(), 999)
+        self.assertEqual(values.min(), 0)
+
+    def test_uneven_length(self):
+        array = np.ma.arange(1003)
+        array[-1] = np.ma.masked
+        indices, values = minmax_decimate(array, 10)
+        self.assertTrue(indices.max() < 1003)
+        self.assertEqual(values.max(), 1001)
+
+
+################################################################################
+# vim:et:ft=python:nowrap:sts=4:sw=4:ts=4
@@ -0,0 +1,208 @@
+################################################################################
+# vim:et:ft=python:nowrap:sts=4:sw=4:ts=4
+################################################################################
+
+
+'''
+Tests for flightdataplotter.frames.
+'''
+
+
+################################################################################
+# Imports
+
+
+import numpy as np
+import os
+import shutil
+import tempfile
+import unittest
+
+from flightdataplotter import frames
+
+
+################################################################################
+# Test Cases
+
+
+# Bits 4 to 1 of word 2 of subframe 1.
+COUNTER = (1, 2, 4, 1)
+
+
+def make_words(wps, frame_count, junk=0, first_counter=0):
+    '''
+    Synthetic raw data words with frame_count frames preceded by junk words.
+    The superframe counter (COUNTER) of the first frame is first_counter.
+    '''
+    words = np.zeros(junk + frame_count * 4 * wps, dtype=np.uint16)
+    for subframe, sync in enumerate(frames.SYNC_WORDS):
+        words[junk + subframe * wps::4 * wps] = sync
+    words[junk + 1::4 * wps] = (np.arange(frame_count) + first_counter) % 16
+    return words
+
+
+class TestFindFrames(unittest.TestCase):
+    '''
+    '''
+    def test_detect_wps(self):
+        words = make_words(64, 40, junk=10)
+        wps, frame_starts = frames.find_frames(words, block_words=1000)
+        self.assertEqual(wps, 64)
+        self.assertEqual(frame_starts.tolist(),
+                         range(10, 10 + 40 * 256, 256))
+
+    def test_upper_bits_ignored(self):
+        words = make_words(128, 4) | 0xF000
+        self.assertEqual(frames.find_frames(words, wps=128)[1].tolist(),
+                         [0, 512, 1024, 1536])
+
+    def test_no_frames(self):
+        wps, frame_starts = frames.find_frames(np.zeros(1000, np.uint16))
+        self.assertEqual(wps, None)
+        self.assertEqual(len(frame_starts), 0)
+
+
+class TestSuperframes(unittest.TestCase):
+    '''
+    '''
+    def test_counter_location(self):
+        self.assertEqual(frames.counter_location(
+            {'Frame': {'Superframe Counter Location': '1:2:4-1'}}), COUNTER)
+        self.assertEqual(frames.counter_location(
+            {'Frame': {}, 'Parameters': {'Superframe Counter': {
+                'Location': ['3:5', '4:5'], 'Bits': '12-9'}}}),
+            (3, 5, 12, 9))
+        self.assertEqual(frames.counter_location({'Frame': {}}), None)
+        self.assertEqual(frames.counter_location(
+            {'Frame': {'Superframe Counter Location': '1:2'}}), None)
+        self.assertEqual(frames.counter_location(
+            {'Frame': {'Superframe Counter Location': '5:2:4-1'}}), None)
+
+    def test_superframe_starts(self):
+        words = make_words(64, 40, junk=10)
+        wps, frame_starts = frames.find_frames(words)
+        self.assertEqual(
+            frames.superframe_starts(words, frame_starts, wps,
+                                     COUNTER).tolist(),
+            [10, 10 + 16 * 256, 10 + 32 * 256])
+        # Unknown without the counter.
+        self.assertEqual(
+            len(frames.superframe_starts(words, frame_starts, wps, None)), 0)
+
+    def test_superframe_starts_mid_superframe(self):
+        # The recording starts with the sixth frame of a superframe.
+        words = make_words(64, 40, junk=10, first_counter=5)
+        wps, frame_starts = frames.find_frames(words)
+        self.assertEqual(
+            frames.superframe_starts(words, frame_starts, wps,
+                                     COUNTER).tolist(),
+            [10 + 11 * 256, 10 + 27 * 256])
+        # A corrupt counter of 0 is not followed by 1.
+        words[10 + 3 * 256 + 1] = 0
+        self.assertEqual(
+            frames.superframe_starts(words, frame_starts, wps,
+                                     COUNTER).tolist(),
+            [10 + 11 * 256, 10 + 27 * 256])
+
+
+class TestSplitOffsets(unittest.TestCase):
+    '''
+    '''
+
+    def test_split_offsets(self):
+        superframes = np.array([10, 4106, 8202])
+        size = 40 * 256 * 2 + 20
+        self.assertEqual(frames.split_offsets(superframes, size, 3),
+                         [(0, 8212), (8212, 16404), (16404, size)])
+        self.assertEqual(frames.split_offsets(superframes, size, 1),
+                         [(0, size)])
+        # Ranges are never empty.
+        self.assertEqual(len(frames.split_offsets(superframes, size, 10)), 3)
+
+    def test_chunk_offsets(self):
+        superframes = np.array([10, 4106, 8202])
+        size = 40 * 256 * 2 + 20
+        self.assertEqual(frames.chunk_offsets(superframes, size, 1),
+                         [(0, 8212), (8212, 16404), (16404, size)])
+        self.assertEqual(frames.chunk_offsets(superframes, size, 2),
+                         [(0, 16404), (16404, size)])
+        self.assertEqual(frames.chunk_offsets(superframes, size, 3),
+                         [(0, size)])
+
+
+class TestFrameIndex(unittest.TestCase):
+    '''
+    '''
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'flight.dat')
+        self.words = make_words(64, 40, junk=10)
+        with open(self.path, 'wb') as raw:
+            raw.write(self.words.tostring())
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_build(self):
+        index = frames.FrameIndex.build(self.path)
+        self.assertEqual(index.wps, 64)
+        self.assertEqual(index.frames.tolist(),
+                         range(20, 20 + 40 * 512, 512))
+        self.assertEqual(index.superframes(self.path, COUNTER).tolist(),
+                         [20, 20 + 16 * 512, 20 + 32 * 512])
+        self.assertEqual(len(index.superframes(self.path, None)), 0)
+        self.assertEqual(index.frame_count(20, 20 + 16 * 512), 16)
+        self.assertEqual(index.size, os.path.getsize(self.path))
+
+    def test_part_range(self):
+        index = frames.FrameIndex.build(self.path)
+        size = index.size
+        self.assertEqual(index.part_range(0, 100), (0, size))
+        # The start rounds down and the stop rounds up to a frame.
+        self.assertEqual(index.part_range(10, 60),
+                         (20 + 3 * 512, 21 * 512))
+        self.assertEqual(index.part_range(90, 100),
+                         (20 + 35 * 512, size - 20 - 35 * 512))
+        superframes = index.superframes(self.path, COUNTER)
+        self.assertEqual(index.part_range(10, 60, superframes),
+                         (20, 32 * 512))
+        self.assertEqual(index.part_range(90, 100, superframes),
+                         (20 + 32 * 512, size - 20 - 32 * 512))
+        self.assertEqual(index.boundary_at(21), 20 + 512)
+        self.assertEqual(index.boundary_before(533), 20 + 512)
+        self.assertEqual(index.boundary_before(10), 0)
+
+    def test_part_range_never_empty(self):
+        index = frames.FrameIndex.build(self.path)
+        superframes = index.superframes(self.path, COUNTER)
+        for boundaries in (None, superframes):
+            for percent_start in range(100):
+                offset, amount = index.part_range(
+                    percent_start, percent_start + 1, boundaries)
+                self.assertTrue(amount > 0)
+                # The range contains the whole percentage.
+                self.assertTrue(offset <= index.size * percent_start // 100)
+                self.assertTrue(offset + amount >=
+                                index.size * (percent_start + 1) // 100)
+        # A single percent of a long file contains at least a superframe.
+        self.assertEqual(index.part_range(50, 51, superframes),
+                         (20 + 16 * 512, 16 * 512))
+        empty = frames.FrameIndex(None, np.array([]), 100, 0)
+        self.assertEqual(empty.part_range(10, 60), None)
+
+    def test_open_index(self):
+        index_path = frames.index_path(self.path)
+        index = frames.open_index(self.path)
+        self.assertTrue(os.path.isfile(index_path))
+        loaded = frames.open_index(self.path)
+        self.assertEqual(loaded.wps, 64)
+        self.assertEqual(loaded.frames.tolist(), index.frames.tolist())
+        # Rebuilt when the data file changes.
+        with open(self.path, 'ab') as raw:
+            raw.write(make_words(64, 1).tostring())
+        self.assertEqual(len(frames.open_index(self.path).frames), 41)
+        self.assertEqual(len(frames.FrameIndex.load(index_path).frames), 41)
+
+
+################################################################################
+# vim:et:ft=python:nowrap:sts=4:sw=4:ts=4
@@ -0,0 +1,229 @@
+################################################################################
+# vim:et:ft=python:nowrap:sts=4:sw=4:ts=4
+################################################################################
+
+
+'''
+Tests for flightdataplotter.hdf_tools.
+'''
+
+
+################################################################################
+# Imports
+
+
+import h5py
+import numpy as np
+import os
+import shutil
+import tempfile
+import unittest
+
+from flightdataplotter import hdf_tools
+
+
+################################################################################
+# Test Cases
+
+
+def write_hdf(path, params):
+    with h5py.File(path, 'w') as hdf:
+        series = hdf.create_group(hdf_tools.SERIES)
+        for name, data in params.iteritems():
+            group = series.create_group(name)
+            group.create_dataset('data', data=np.ma.getdata(data))
+            group.create_dataset('mask', data=np.ma.getmaskarray(data))
+            group.attrs['frequency'] = 1.0
+
+
+class TestHDFTools(unittest.TestCase):
+    '''
+    '''
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path_a = os.path.join(self.temp_dir, 'a.hdf5')
+        self.path_b = os.path.join(self.temp_dir, 'b.hdf5')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_param_names(self):
+        self.assertEqual(hdf_tools.param_names(self.path_a), set())
+        write_hdf(self.path_a, {'Altitude STD': np.arange(4),
+                                'Airspeed': np.arange(4)})
+        self.assertEqual(hdf_tools.param_names(self.path_a),
+                         set(['Altitude STD', 'Airspeed']))
+
+    def test_copy_params(self):
+        write_hdf(self.path_a, {'Altitude STD': np.arange(4),
+                                'Airspeed': np.arange(4)})
+        write_hdf(self.path_b, {'Airspeed': np.zeros(4)})
+        hdf_tools.copy_params(self.path_a, self.path_b,
+                              ['Altitude STD', 'Airspeed'])
+        with h5py.File(self.path_b, 'r') as hdf:
+            series = hdf[hdf_tools.SERIES]
+            self.assertEqual(list(series['Airspeed']['data'][:]),
+                             [0, 1, 2, 3])
+            self.assertEqual(series['Altitude STD'].attrs['frequency'], 1.0)
+
+    def test_delete_params(self):
+        write_hdf(self.path_a, {'Altitude STD': np.arange(4),
+                                'Airspeed': np.arange(4)})
+        hdf_tools.delete_params(self.path_a, ['Airspeed', 'Heading'])
+        self.assertEqual(hdf_tools.param_names(self.path_a),
+                         set(['Altitude STD']))
+
+    def test_replace_file(self):
+        write_hdf(self.path_a, {'Altitude STD': np.arange(4)})
+        write_hdf(self.path_b, {'Airspeed': np.arange(4)})
+        hdf_tools.replace_file(self.path_a, self.path_b)
+        self.assertFalse(os.path.exists(self.path_a))
+        self.assertEqual(hdf_tools.param_names(self.path_b),
+                         set(['Altitude STD']))
+
+    def test_load_params(self):
+        array = np.ma.array([1, 2, 3, 4], mask=[0, 1, 0, 0])
+        write_hdf(self.path_a, {'Altitude STD': array,
+                                'Airspeed': np.arange(4)})
+        params = hdf_tools.load_params(self.path_a,
+                                       ['Altitude STD', 'Heading'])
+        self.assertEqual(params.keys(), ['Altitude STD'])
+        param = params['Altitude STD']
+        self.assertEqual(param.hz, 1.0)
+        self.assertEqual(param.size, 4)
+        self.assertEqual(param.units, None)
+        self.assertTrue(param._array is None)
+        self.assertEqual(param.array.tolist(), [1, None, 3, 4])
+        # The HDF file is not held open.
+        os.remove(self.path_a)
+        self.assertEqual(param.array.tolist(), [1, None, 3, 4])
+
+    def test_lazy_parameter_read(self):
+        array = np.ma.array([1, 2, 3, 4], mask=[0, 1, 0, 0])
+        write_hdf(self.path_a, {'Altitude STD': array})
+        param = hdf_tools.load_params(self.path_a,
+                                      ['Altitude STD'])['Altitude STD']
+        self.assertEqual(param.read(1, 3).tolist(), [None, 3])
+        self.assertEqual(param.read(2).tolist(), [3, 4])
+        self.assertEqual(param.read(stop=1).tolist(), [1])
+        # Reading a window does not load the array.
+        self.assertTrue(param._array is None)
+
+    def test_write_summaries(self):
+        altitude = np.ma.array([np.nan, 2, 3, -4, 5, 6],
+                               mask=[0, 1, 0, 0, 0, 1])
+        masked = np.ma.array([1, 2], mask=True)
+        write_hdf(self.path_a, {'Altitude STD': altitude,
+                                'Masked': masked,
+                                'Label': np.array(['A', 'B'])})
+        self.assertEqual(
+            sorted(hdf_tools.write_summaries(self.path_a, chunk_size=4)),
+            ['Altitude STD', 'Label', 'Masked'])
+        # Only the named parameters are summarised.
+        self.assertEqual(
+            hdf_tools.write_summaries(self.path_a, ['Masked', 'Missing']),
+            ['Masked'])
+        params = hdf_tools.load_params(self.path_a,
+                                       ['Altitude STD', 'Masked', 'Label'])
+        self.assertEqual(params['Altitude STD'].summary, {
+            'length': 6, 'valid_count': 4, 'all_masked': False,
+            'first_valid': 0, 'last_valid': 4, 'min': -4, 'max': 5})
+        self.assertEqual(params['Masked'].summary, {
+            'length': 2, 'valid_count': 0, 'all_masked': True})
+        self.assertEqual(params['Label'].summary, {
+            'length': 2, 'valid_count': 2, 'all_masked': False,
+            'first_valid': 0, 'last_valid': 1})
+        self.assertEqual(params['Label'].dtype.char, 'S')
+        # Summaries are not read from the array.
+        self.assertTrue(params['Altitude STD']._array is None)
+        # Nor do they describe a replaced array.
+        params['Altitude STD'].array = params['Altitude STD'].array[:2]
+        self.assertEqual(params['Altitude STD'].summary, None)
+
+    def test_write_summaries_replaced(self):
+        write_hdf(self.path_a, {'Altitude STD': np.ma.arange(4),
+                                'Airspeed': np.ma.arange(3)})
+        hdf_tools.write_summaries(self.path_a)
+        # Rewritten in place with the attributes of the previous array, e.g.
+        # copied forward by an incremental update.
+        with h5py.File(self.path_a, 'r+') as hdf:
+            group = hdf[hdf_tools.SERIES]['Altitude STD']
+            del group['data'], group['mask']
+            group['data'] = np.arange(10)
+            group['mask'] = np.zeros(10, dtype=np.bool_)
+        self.assertEqual(
+            hdf_tools.write_summaries(self.path_a, ['Altitude STD']),
+            ['Altitude STD'])
+        params = hdf_tools.load_params(self.path_a,
+                                       ['Altitude STD', 'Airspeed'])
+        self.assertEqual(params['Altitude STD'].summary['length'], 10)
+        self.assertEqual(params['Altitude STD'].summary['max'], 9)
+        self.assertEqual(params['Airspeed'].summary['length'], 3)
+
+    def write_section(self, path, lengths):
+        '''
+        Write a section with parameters of the given lengths, keyed by
+        frequency.
+        '''
+        with h5py.File(path, 'w') as hdf:
+            hdf.attrs['duration'] = lengths[1]
+            series = hdf.create_group(hdf_tools.SERIES)
+            for name, frequency in (('Altitude STD', 1), ('Pitch', 4)):
+                group = series.create_group(name)
+                array = np.ma.arange(lengths[frequency])
+                array[1] = np.ma.masked
+                group.create_dataset('data', data=array.data)
+                group.create_dataset('mask', data=array.mask)
+                group.attrs['frequency'] = frequency
+
+    def test_concatenate_files(self):
+        self.write_section(self.path_a, {1: 4, 4: 16})
+        # The last section may end part way through a second.
+        self.write_section(self.path_b, {1: 5, 4: 22})
+        output_path = os.path.join(self.temp_dir, 'output.hdf5')
+        hdf_tools.concatenate_files([self.path_a, self.path_b], output_path,
+                                    [4, None])
+        with h5py.File(output_path, 'r') as hdf:
+            self.assertEqual(hdf.attrs['duration'], 9.5)
+            pitch = hdf[hdf_tools.SERIES]['Pitch']
+            self.assertEqual(pitch.attrs['frequency'], 4)
+            # No samples are dropped.
+            self.assertEqual(len(pitch['data']), 16 + 22)
+            self.assertEqual(pitch['data'][16], 0)
+            self.assertEqual(np.flatnonzero(pitch['mask'][:]).tolist(),
+                             [1, 17])
+            self.assertEqual(
+                len(hdf[hdf_tools.SERIES]['Altitude STD']['data']), 9)
+
+    def test_concatenate_misaligned(self):
+        output_path = os.path.join(self.temp_dir, 'output.hdf5')
+        # The first section stops part way through a second.
+        self.write_section(self.path_a, {1: 4, 4: 17})
+        self.write_section(self.path_b, {1: 5, 4: 20})
+        self.assertRaises(ValueError, hdf_tools.concatenate_files,
+                          [self.path_a, self.path_b], output_path)
+        # The first section is shorter than its frames.
+        self.write_section(self.path_a, {1: 4, 4: 16})
+        self.assertRaises(ValueError, hdf_tools.concatenate_files,
+                          [self.path_a, self.path_b], output_path, [8, None])
+        # Sections contain different parameters.
+        write_hdf(self.path_b, {'Altitude STD': np.arange(4)})
+        self.assertRaises(ValueError, hdf_tools.concatenate_files,
+                          [self.path_a, self.path_b], output_path)
+        self.assertFalse(os.path.exists(output_path))
+
+    def test_concatenate_files_summaries(self):
+        write_hdf(self.path_a, {'Altitude STD': np.ma.arange(4)})
+        write_hdf(self.path_b, {'Altitude STD': np.ma.arange(5)})
+        hdf_tools.write_summaries(self.path_a)
+        output_path = os.path.join(self.temp_dir, 'output.hdf5')
+        hdf_tools.concatenate_files([self.path_a, self.path_b], output_path)
+        self.assertEqual(hdf_tools.write_summaries(output_path),
+                         ['Altitude STD'])
+        param = hdf_tools.load_params(output_path,
+                                      ['Altitude STD'])['Altitude STD']
+        self.assertEqual(param.summary['length'], 9)
+
+
+################################################################################
+# vim:et:ft=python:nowrap:sts=4:sw=4:ts=4
@@ -0,0 +1,120 @@
+################################################################################
+# vim:et:ft=python:nowrap:sts=4:sw=4:ts=4
+################################################################################
+
+
+'''
+Tests for flightdataplotter.lfl_cache.
+'''
+
+
+################################################################################
+# Imports
+
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from flightdataplotter import lfl_cache
+from flightdataplotter.lfl_cache import (
+    DiskLFLCache,
+    MemoryLFLCache,
+    cache_key,
+)
+
+
+################################################################################
+# Test Cases
+
+
+class TestLFLCache(unittest.TestCase):
+    '''
+    '''
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.lfl_path = os.path.join(self.temp_dir, 'example.lfl')
+        self.write('[Parameters]\n')
+        self.parsed = []
+        self._parse_lfl = lfl_cache._parse_lfl
+        lfl_cache._parse_lfl = self.parse_lfl
+
+    def tearDown(self):
+        lfl_cache._parse_lfl = self._parse_lfl
+        shutil.rmtree(self.temp_dir)
+
+    def write(self, content):
+        with open(self.lfl_path, 'w') as lfl_file:
+            lfl_file.write(content)
+
+    def parse_lfl(self, lfl_path, param_names, aircraft_info):
+        content = open(lfl_path).read()
+        self.parsed.append(content)
+        return content, sorted(param_names)
+
+    def test_cache_key(self):
+        info = {'Frame Doubled': False}
+        key = cache_key(self.lfl_path, ['B', 'A'], info)
+        self.assertEqual(key, cache_key(self.lfl_path, set(['A', 'B']), info))
+        self.assertNotEqual(key, cache_key(self.lfl_path, ['A'], info))
+        self.assertNotEqual(key, cache_key(self.lfl_path, ['A', 'B'],
+                                           {'Frame Doubled': True}))
+        self.write('[Parameters]\n    [[A]]\n')
+        self.assertNotEqual(key, cache_key(self.lfl_path, ['A', 'B'], info))
+
+    def test_parse(self):
+        cache = MemoryLFLCache(max_entries=1)
+        result = cache.parse(self.lfl_path, ['A'], {})
+        self.assertTrue(cache.parse(self.lfl_path, ['A'], {}) is result)
+        self.assertEqual(len(self.parsed), 1)
+        self.write('[Parameters]\n    [[A]]\n')
+        self.assertFalse(cache.parse(self.lfl_path, ['A'], {}) is result)
+        self.assertEqual(len(self.parsed), 2)
+        # The first result has been evicted.
+        self.write('[Parameters]\n')
+        cache.parse(self.lfl_path, ['A'], {})
+        self.assertEqual(len(self.parsed), 3)
+
+    def test_disk_cache(self):
+        cache_dir = os.path.join(self.temp_dir, 'cache')
+        result = DiskLFLCache(cache_dir).parse(self.lfl_path, ['B', 'A'], {})
+        self.assertEqual(result, ('[Parameters]\n', ['A', 'B']))
+        self.assertEqual(len(os.listdir(cache_dir)), 1)
+        # A new cache (e.g. a later run) loads the result from disk.
+        self.assertEqual(
+            DiskLFLCache(cache_dir).parse(self.lfl_path, ['A', 'B'], {}),
+            result)
+        self.assertEqual(len(self.parsed), 1)
+        # Invalid files are replaced.
+        path = os.path.join(cache_dir, os.listdir(cache_dir)[0])
+        with open(path, 'wb') as cache_file:
+            cache_file.write('invalid')
+        self.assertEqual(
+            DiskLFLCache(cache_dir).parse(self.lfl_path, ['A', 'B'], {}),
+            result)
+        self.assertEqual(len(self.parsed), 2)
+        self.assertEqual(
+            DiskLFLCache(cache_dir).parse(self.lfl_path, ['A', 'B'], {}),
+            result)
+        self.assertEqual(len(self.parsed), 2)
+
+    def test_disk_cache_eviction(self):
+        cache_dir = os.path.join(self.temp_dir, 'cache')
+        cache = DiskLFLCache(cache_dir)
+        for name in 'ABC':
+            cache.parse(self.lfl_path, [name], {})
+        paths = [os.path.join(cache_dir, name)
+                 for name in os.listdir(cache_dir)]
+        self.assertEqual(len(paths), 3)
+        cache.max_bytes = sum(os.path.getsize(path) for path in paths) - 1
+        oldest = min(paths, key=os.path.getmtime)
+        os.utime(oldest, (0, 0))
+        cache.evict()
+        self.assertEqual(sorted(os.listdir(cache_dir)),
+                         sorted(os.path.basename(path) for path in paths
+                                if path != oldest))
+
+
+################################################################################
+# vim:et:ft=python:nowrap:sts=4:sw=4:ts=4
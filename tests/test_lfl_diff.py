@@ -0,0 +1,190 @@
+################################################################################
+# vim:et:ft=python:nowrap:sts=4:sw=4:ts=4
+################################################################################
+
+
+'''
+Tests for flightdataplotter.lfl_diff.
+'''
+
+
+################################################################################
+# Imports
+
+
+import unittest
+
+from configobj import ConfigObj
+
+from flightdataplotter.lfl_diff import (
+    StaleParams,
+    diff_index,
+    index_config,
+    plan_update,
+)
+
+
+################################################################################
+# Test Cases
+
+
+LFL = '''\
+[Frame]
+Name = Example
+Words Per Second = 256
+
+[Parameters]
+    [[Altitude STD]]
+    Location = 1:2
+    Bits = 12-1
+    [[Airspeed]]
+    Location = 1:3
+    Bits = 12-1
+    [[Heading]]
+    Location = 1:4
+    Bits = 12-1
+
+[Parameter Group]
+AXIS_1 = Airspeed, Heading
+AXIS_2 = Heading
+'''
+
+INFO = {'Frame Doubled': False, 'Stretched': None}
+
+
+def parse(lfl):
+    return ConfigObj(lfl.splitlines())
+
+
+class TestLFLDiff(unittest.TestCase):
+    '''
+    '''
+    def setUp(self):
+        self.index = index_config(parse(LFL), INFO)
+
+    def test_first(self):
+        changes = diff_index(None, self.index)
+        self.assertEqual(changes.added,
+                         set(['Altitude STD', 'Airspeed', 'Heading']))
+        self.assertTrue(changes.frame_changed)
+
+    def test_unchanged(self):
+        changes = diff_index(self.index, index_config(parse(LFL), dict(INFO)))
+        self.assertEqual(changes, (set(), set(), set(), set(), False))
+
+    def test_added_removed_changed(self):
+        lfl = LFL.replace('Location = 1:3', 'Location = 1:5') \
+            .replace('[[Heading]]', '[[Pitch]]')
+        changes = diff_index(self.index, index_config(parse(lfl), INFO))
+        self.assertEqual(changes.added, set(['Pitch']))
+        self.assertEqual(changes.removed, set(['Heading']))
+        self.assertEqual(changes.changed, set(['Airspeed']))
+        self.assertFalse(changes.frame_changed)
+
+    def test_regrouped(self):
+        lfl = LFL.replace('AXIS_2 = Heading', 'AXIS_2 = Airspeed')
+        changes = diff_index(self.index, index_config(parse(lfl), INFO))
+        self.assertEqual(changes.regrouped, set(['Airspeed', 'Heading']))
+        self.assertEqual(changes.changed, set())
+        lfl = LFL.replace('AXIS_2 = Heading', 'AXIS_2 = Heading, Pitch')
+        changes = diff_index(self.index, index_config(parse(lfl), INFO))
+        self.assertEqual(changes.regrouped, set(['Pitch']))
+
+    def test_frame_changed(self):
+        lfl = LFL.replace('Words Per Second = 256', 'Words Per Second = 512')
+        changes = diff_index(self.index, index_config(parse(lfl), INFO))
+        self.assertTrue(changes.frame_changed)
+        self.assertEqual(changes.changed, set())
+        info = dict(INFO, Stretched='Quad')
+        self.assertTrue(
+            diff_index(self.index,
+                       index_config(parse(LFL), info)).frame_changed)
+
+
+class TestStaleParams(unittest.TestCase):
+    '''
+    '''
+    params = ['Altitude STD', 'Airspeed', 'Heading']
+
+    def setUp(self):
+        self.stale = StaleParams()
+        self.stale.update(index_config(parse(LFL), INFO))
+
+    def save(self, lfl, info=INFO):
+        return self.stale.update(index_config(parse(lfl), info))
+
+    def test_plan_update(self):
+        plan = plan_update(['Airspeed', 'Heading', 'Pitch'],
+                           ['Altitude STD', 'Airspeed', 'Heading'],
+                           set(['Heading']))
+        self.assertEqual(plan.process, set(['Heading', 'Pitch']))
+        self.assertEqual(plan.keep, set(['Airspeed']))
+        self.assertEqual(plan.remove, set(['Altitude STD']))
+
+    def test_first(self):
+        # Nothing has been written, so the whole file is.
+        self.assertIsNone(self.stale.plan(self.params, self.params))
+        self.stale.written()
+        self.assertIsNone(self.stale.plan(self.params, None))
+        plan = self.stale.plan(self.params, self.params)
+        self.assertEqual(plan.process, set())
+        self.assertEqual(plan.keep, set(self.params))
+        self.assertEqual(plan.remove, set())
+
+    def test_added_removed_changed(self):
+        self.stale.written()
+        self.save(LFL.replace('Location = 1:3', 'Location = 1:5')
+                  .replace('[[Heading]]', '[[Pitch]]'))
+        plan = self.stale.plan(['Altitude STD', 'Airspeed', 'Pitch'],
+                               self.params)
+        self.assertEqual(plan.process, set(['Airspeed', 'Pitch']))
+        self.assertEqual(plan.keep, set(['Altitude STD']))
+        self.assertEqual(plan.remove, set(['Heading']))
+
+    def test_regrouped(self):
+        self.stale.written()
+        self.save(LFL.replace('AXIS_2 = Heading', 'AXIS_2 = Airspeed'))
+        # Only replotted.
+        plan = self.stale.plan(self.params, self.params)
+        self.assertEqual(plan.process, set())
+
+    def test_frame_changed(self):
+        self.stale.written()
+        self.save(LFL.replace('Words Per Second = 256',
+                              'Words Per Second = 512'))
+        self.assertIsNone(self.stale.plan(self.params, self.params))
+        # Until the file has been written, even if changed back.
+        self.save(LFL)
+        self.assertIsNone(self.stale.plan(self.params, self.params))
+        self.stale.written()
+        self.save(LFL, dict(INFO, Stretched='Quad'))
+        self.assertIsNone(self.stale.plan(self.params, self.params))
+
+    def test_superframe_counter_changed(self):
+        lfl = LFL.replace('[Parameters]', '''[Parameters]
+    [[Superframe Counter]]
+    Location = 1:1
+    Bits = 4-1''')
+        self.save(lfl)
+        self.stale.written()
+        changes = self.save(lfl.replace('Bits = 4-1', 'Bits = 8-5'))
+        self.assertTrue(changes.frame_changed)
+        # Every parameter is decoded with the counter, even though it is not
+        # processed itself.
+        self.assertIsNone(self.stale.plan(self.params, self.params))
+
+    def test_not_written(self):
+        self.stale.written()
+        self.save(LFL.replace('Location = 1:3', 'Location = 1:5'))
+        # Processing failed, so the change is still stale after another.
+        self.save(LFL.replace('Location = 1:3', 'Location = 1:5')
+                  .replace('Location = 1:4', 'Location = 1:6'))
+        plan = self.stale.plan(self.params, self.params)
+        self.assertEqual(plan.process, set(['Airspeed', 'Heading']))
+        self.stale.written()
+        plan = self.stale.plan(self.params, self.params)
+        self.assertEqual(plan.process, set())
+
+
+################################################################################
+# vim:et:ft=python:nowrap:sts=4:sw=4:ts=4
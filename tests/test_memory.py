@@ -0,0 +1,70 @@
+################################################################################
+# vim:et:ft=python:nowrap:sts=4:sw=4:ts=4
+################################################################################
+
+
+'''
+Tests for flightdataplotter.memory.
+'''
+
+
+################################################################################
+# Imports
+
+
+import unittest
+
+from collections import namedtuple
+
+from flightdataplotter import memory
+
+
+################################################################################
+# Test Cases
+
+
+Param = namedtuple('Param', 'name frequency')
+
+
+class TestMemory(unittest.TestCase):
+    '''
+    '''
+    def test_superframes_in_memory_arg(self):
+        self.assertEqual(memory.superframes_in_memory_arg('auto'),
+                         memory.AUTO)
+        self.assertEqual(memory.superframes_in_memory_arg('AUTO'),
+                         memory.AUTO)
+        self.assertEqual(memory.superframes_in_memory_arg('100'), 100)
+        self.assertRaises(ValueError, memory.superframes_in_memory_arg, 'x')
+
+    def test_available_memory(self):
+        available = memory.available_memory()
+        if available is not None:
+            self.assertTrue(available > 0)
+
+    def test_superframe_bytes(self):
+        # 64 seconds of 256 words plus 64 samples of a 1Hz parameter and 512
+        # of an 8Hz parameter.
+        param_list = [Param('Airspeed', 1), Param('Acceleration Normal', 8)]
+        self.assertEqual(memory.superframe_bytes(param_list, 256),
+                         256 * 64 * 2 + 576 * memory.SAMPLE_BYTES)
+        self.assertEqual(memory.superframe_bytes([], None),
+                         memory.DEFAULT_WPS * 64 * 2)
+
+    def test_auto_superframes_in_memory(self):
+        param_list = [Param('Airspeed', 1)]
+        size = memory.superframe_bytes(param_list, 256)
+        available = size * 40 / memory.MEMORY_FRACTION
+        self.assertEqual(memory.auto_superframes_in_memory(
+            param_list, 256, available=available), 40)
+        self.assertEqual(memory.auto_superframes_in_memory(
+            param_list, 256, workers=4, available=available), 10)
+        self.assertEqual(memory.auto_superframes_in_memory(
+            param_list, 256, superframe_count=5, available=available), 5)
+        # At least one superframe is processed at a time.
+        self.assertEqual(memory.auto_superframes_in_memory(
+            param_list, 256, available=1), 1)
+
+
+################################################################################
+# vim:et:ft=python:nowrap:sts=4:sw=4:ts=4
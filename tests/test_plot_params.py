@@ -0,0 +1,605 @@
+################################################################################
+# vim:et:ft=python:nowrap:sts=4:sw=4:ts=4
+################################################################################
+
+
+'''
+Tests for flightdataplotter.plot_params.
+'''
+
+
+################################################################################
+# Imports
+
+
+import bz2
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import types
+import unittest
+
+import mock
+import numpy as np
+
+from benchmarks.synthetic import SyntheticFrame
+from flightdataplotter import frames, plot_params
+from flightdataplotter.convert import Cancelled
+from flightdataplotter.watcher import FileWatcher
+
+try:
+    from compass.arinc717.hdf import create_hdf
+except ImportError:
+    create_hdf = None
+
+try:
+    from analysis_engine.library import align
+except ImportError:
+    align = None
+
+
+################################################################################
+# Test Cases
+
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs a script with wxPython unimportable, as on a headless server.
+WITHOUT_WX = '''\
+import sys
+sys.modules['wx'] = None
+%s
+'''
+
+
+def run_without_wx(script):
+    '''
+    Run a Python script in a new interpreter in which wx cannot be imported.
+
+    :returns: Exit status and output of the script.
+    :rtype: (int, str)
+    '''
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        filter(None, [ROOT_DIR, env.get('PYTHONPATH')]))
+    process = subprocess.Popen([sys.executable, '-c', WITHOUT_WX % script],
+                               cwd=ROOT_DIR, env=env, stdout=subprocess.PIPE,
+                               stderr=subprocess.STDOUT)
+    output = process.communicate()[0]
+    return process.returncode, output
+
+
+class TestHeadless(unittest.TestCase):
+    '''
+    '''
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_import_without_wx(self):
+        image_path = os.path.join(self.temp_dir, 'figure.png')
+        status, output = run_without_wx('''
+import matplotlib
+from flightdataplotter import plot_params
+assert matplotlib.get_backend().lower() == 'agg', matplotlib.get_backend()
+fig = plot_params.create_figure('Headless')
+fig.add_subplot(1, 1, 1).plot([0, 1, 2])
+fig.savefig(%r)
+assert sys.modules['wx'] is None
+''' % image_path)
+        self.assertEqual(status, 0, output)
+        self.assertTrue(os.path.getsize(image_path) > 0)
+
+    @unittest.skipIf(create_hdf is None or align is None,
+                     'compass or analysis_engine is not installed')
+    def test_render_without_wx(self):
+        frame = SyntheticFrame(wps=64, parameter_count=4)
+        lfl_path = os.path.join(self.temp_dir, 'synthetic.lfl')
+        with open(lfl_path, 'w') as lfl_file:
+            lfl_file.write(frame.lfl())
+        data_path = os.path.join(self.temp_dir, 'synthetic.dat')
+        frame.write_raw(data_path, 2 * frames.FRAMES_PER_SUPERFRAME *
+                        frames.SUBFRAMES_PER_FRAME)
+        output_dir = os.path.join(self.temp_dir, 'plots')
+        status, output = run_without_wx('''
+from flightdataplotter import plot_params
+sys.argv = ['plot_params', '--render-to', %r, '-j', '1', %r, %r]
+plot_params.main()
+''' % (output_dir, lfl_path, data_path))
+        self.assertEqual(status, 0, output)
+        self.assertEqual(os.listdir(output_dir), ['synthetic__synthetic.png'])
+
+
+class TestSliceDataFiles(unittest.TestCase):
+    '''
+    '''
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.paths = []
+        for name in ('a.dat', 'b.dat'):
+            path = os.path.join(self.temp_dir, name)
+            with open(path, 'wb') as raw:
+                raw.write('\x00' * 1000)
+            self.paths.append(path)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_whole_files(self):
+        self.assertEqual(plot_params.slice_data_files(self.paths, 0, 100),
+                         dict(zip(self.paths, self.paths)))
+
+    def test_shared_files_copied_once(self):
+        a_path, b_path = self.paths
+        copied = []
+        copy_file_part = plot_params.copy_file_part
+
+        def record_copy(*args):
+            copied.append(args)
+            return copy_file_part(*args)
+
+        plot_params.copy_file_part = record_copy
+        try:
+            process_paths = plot_params.slice_data_files(
+                [a_path, b_path, a_path, a_path], 20, 70)
+        finally:
+            plot_params.copy_file_part = copy_file_part
+        self.assertEqual(sorted(copied), [(a_path, 20, 70), (b_path, 20, 70)])
+        self.assertEqual(process_paths, {
+            a_path: os.path.join(self.temp_dir, 'a_20-70.dat'),
+            b_path: os.path.join(self.temp_dir, 'b_20-70.dat')})
+
+    def test_compressed_files(self):
+        # Whole compressed files are decompressed rather than read through
+        # open_raw_data by each worker.
+        a_path, b_path = self.paths
+        bz2_path = os.path.join(self.temp_dir, 'c.dat.bz2')
+        with open(bz2_path, 'wb') as raw:
+            raw.write(bz2.compress('\x00' * 1000))
+        process_paths = plot_params.slice_data_files(
+            [a_path, bz2_path, bz2_path], 0, 100)
+        self.assertEqual(process_paths, {
+            a_path: a_path,
+            bz2_path: os.path.join(self.temp_dir, 'c.dat_0-100.dat')})
+        with open(process_paths[bz2_path], 'rb') as raw:
+            self.assertEqual(raw.read(), '\x00' * 1000)
+
+    def test_missing_file(self):
+        missing_path = os.path.join(self.temp_dir, 'missing.dat')
+        for percent_start, percent_stop in ((20, 70), (0, 100)):
+            self.assertEqual(plot_params.slice_data_files(
+                [missing_path], percent_start, percent_stop),
+                {missing_path: None})
+
+    def test_write_reports_copy_failed(self):
+        # Pairs whose part could not be copied fail without processing.
+        missing_path = os.path.join(self.temp_dir, 'missing.dat')
+        report_path = os.path.join(self.temp_dir, 'report.csv')
+        options = {'superframes_in_memory': -1, 'aircraft_info': {},
+                   'percent_start': 20, 'percent_stop': 70,
+                   'lfl_cache_dir': None}
+        failures = plot_params.write_reports(
+            [('a.lfl', missing_path), ('b.lfl', missing_path)], report_path,
+            'csv', 2, options)
+        self.assertEqual(failures, 2)
+        self.assertTrue(os.path.isfile(report_path))
+
+
+class TestReadBatchFile(unittest.TestCase):
+    '''
+    '''
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.batch_path = os.path.join(self.temp_dir, 'pairs.txt')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def write_batch(self, text):
+        with open(self.batch_path, 'w') as batch_file:
+            batch_file.write(text)
+
+    def test_read_batch_file(self):
+        self.write_batch(
+            '# LFL and data file pairs.\n'
+            '\n'
+            '/lfls/a.lfl /data/a.dat\n'
+            '   \n'
+            '  # Indented comment.\n'
+            '"/lfls/with space.lfl" \'/data/with space.dat\'\n')
+        self.assertEqual(plot_params.read_batch_file(self.batch_path), [
+            ('/lfls/a.lfl', '/data/a.dat'),
+            ('/lfls/with space.lfl', '/data/with space.dat')])
+
+    def test_relative_paths(self):
+        self.write_batch('a.lfl data/a.dat\n../b.lfl /data/b.dat\n')
+        self.assertEqual(plot_params.read_batch_file(self.batch_path), [
+            (os.path.join(self.temp_dir, 'a.lfl'),
+             os.path.join(self.temp_dir, 'data', 'a.dat')),
+            (os.path.join(self.temp_dir, '..', 'b.lfl'), '/data/b.dat')])
+
+    def test_bad_lines(self):
+        for line in ('a.lfl', 'a.lfl a.dat b.dat'):
+            self.write_batch('# Comment.\na.lfl a.dat\n%s\n' % line)
+            with self.assertRaises(ValueError) as context:
+                plot_params.read_batch_file(self.batch_path)
+            self.assertIn('line 3: %s' % line, str(context.exception))
+        # Unbalanced quotes.
+        self.write_batch('"a.lfl a.dat\n')
+        self.assertRaises(ValueError, plot_params.read_batch_file,
+                          self.batch_path)
+
+    def test_missing_file(self):
+        self.assertRaises(IOError, plot_params.read_batch_file,
+                          self.batch_path)
+
+
+class TestValidateRenderArgs(unittest.TestCase):
+    '''
+    '''
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.lfl_path = os.path.join(self.temp_dir, 'a.lfl')
+        self.data_path = os.path.join(self.temp_dir, 'a.dat')
+        for path in (self.lfl_path, self.data_path):
+            open(path, 'w').close()
+        self.batch_path = os.path.join(self.temp_dir, 'pairs.txt')
+        with open(self.batch_path, 'w') as batch_file:
+            batch_file.write('a.lfl a.dat\n')
+        self.parser = plot_params.create_parser()
+
+        def error(message):
+            raise ValueError(message)
+
+        self.parser.error = error
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def validate(self, *argv):
+        args = self.parser.parse_args(
+            ['--render-to', self.temp_dir] + list(argv))
+        return plot_params.validate_render_args(self.parser, args)
+
+    def assertInvalid(self, message, *argv):
+        with self.assertRaises(ValueError) as context:
+            self.validate(*argv)
+        self.assertIn(message, str(context.exception))
+
+    def test_pair(self):
+        self.assertEqual(self.validate(self.lfl_path, self.data_path),
+                         [(self.lfl_path, self.data_path)])
+
+    def test_batch(self):
+        self.assertEqual(self.validate('--batch', self.batch_path),
+                         [(self.lfl_path, self.data_path)])
+
+    def test_missing_arguments(self):
+        self.assertInvalid('Either --batch or both', self.lfl_path)
+
+    def test_invalid_paths(self):
+        missing_path = os.path.join(self.temp_dir, 'missing')
+        self.assertInvalid('LFL file path not valid', missing_path,
+                           self.data_path)
+        self.assertInvalid('Data file path not valid', self.lfl_path,
+                           missing_path)
+        self.assertInvalid('Could not read batch file', '--batch',
+                           missing_path)
+        with open(self.batch_path, 'w') as batch_file:
+            batch_file.write('a.lfl missing.dat\n')
+        self.assertInvalid('Data file path not valid', '--batch',
+                           self.batch_path)
+        with open(self.batch_path, 'w') as batch_file:
+            batch_file.write('a.lfl\n')
+        self.assertInvalid('Could not read batch file', '--batch',
+                           self.batch_path)
+
+    def test_jobs(self):
+        self.assertInvalid('Jobs argument must be positive', '-j', '0',
+                           self.lfl_path, self.data_path)
+
+    def test_superframes_in_memory(self):
+        self.assertInvalid('Superframes in memory argument',
+                           '--superframes-in-memory', '0',
+                           self.lfl_path, self.data_path)
+
+
+def fake_process_fleet_file(job):
+    '''
+    Stands in for process_fleet_file. Data files named failed* fail.
+    '''
+    lfl_path, data_path, hdf_path, options = job
+    if os.path.basename(data_path).startswith('failed'):
+        return data_path, None, [('Processing failed!', hdf_path)]
+    return data_path, {1: ['Altitude STD']}, []
+
+
+def slow_process_fleet_file(job):
+    '''
+    Stands in for process_fleet_file on a data file which takes a minute.
+    '''
+    time.sleep(60)
+    return fake_process_fleet_file(job)
+
+
+class TestFleetLoops(unittest.TestCase):
+    '''
+    '''
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.lfl_path = os.path.join(self.temp_dir, 'fleet.lfl')
+        open(self.lfl_path, 'w').close()
+        self.data_paths = [os.path.join(self.temp_dir, 'a', 'flight.dat'),
+                           os.path.join(self.temp_dir, 'b', 'flight.dat'),
+                           os.path.join(self.temp_dir, 'failed.dat')]
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def create_loops(self, data_paths, jobs):
+        loops = plot_params.FleetLoops(self.lfl_path, data_paths,
+                                       self.temp_dir, {}, jobs)
+        self.addCleanup(loops.close)
+        return loops
+
+    def test_process_fleet(self):
+        for jobs in (1, 2):
+            loops = self.create_loops(self.data_paths, jobs)
+            with mock.patch.object(plot_params, 'process_fleet_file',
+                                   fake_process_fleet_file):
+                axes = loops.process_fleet()
+            self.assertEqual(axes, {1: ['Altitude STD']})
+            self.assertEqual(loops._processed, self.data_paths[:2])
+            # Data files with the same name are written to separate files.
+            self.assertEqual(
+                [os.path.basename(loops._hdf_paths[path])
+                 for path in self.data_paths],
+                ['0_flight.hdf5', '1_flight.hdf5', '2_failed.hdf5'])
+            # Errors of every data file are shown together.
+            self.assertEqual(loops._take_error_messages(), [(
+                'Errors in 1 of 3 data files',
+                'failed.dat Processing failed!\n%s' %
+                loops._hdf_paths[self.data_paths[2]])])
+
+    def test_none_processed(self):
+        loops = self.create_loops(self.data_paths[2:], 1)
+        with mock.patch.object(plot_params, 'process_fleet_file',
+                               fake_process_fleet_file):
+            self.assertRaises(ValueError, loops.process_fleet)
+
+    def assertCancelledBy(self, function):
+        # Processing is abandoned without waiting for the workers, which are
+        # terminated.
+        loops = self.create_loops(self.data_paths, 2)
+        loops._watcher = FileWatcher(self.lfl_path, debounce=0)
+        self.addCleanup(loops._watcher.close)
+        timer = threading.Timer(0.2, function, [loops])
+        start = time.time()
+        timer.start()
+        try:
+            with mock.patch.object(plot_params, 'process_fleet_file',
+                                   slow_process_fleet_file):
+                self.assertRaises(Cancelled, loops.process_fleet)
+        finally:
+            timer.join()
+        self.assertTrue(time.time() - start < 30)
+        self.assertIsNone(loops._pool)
+
+    def test_cancelled_by_lfl_change(self):
+        def change_lfl(loops):
+            with open(self.lfl_path, 'w') as lfl_file:
+                lfl_file.write('[Parameters]\n')
+
+        self.assertCancelledBy(change_lfl)
+
+    def test_cancelled_by_stop(self):
+        self.assertCancelledBy(lambda loops: loops.stop())
+
+
+class FakeParam(object):
+    '''
+    Stands in for a parameter loaded from an HDF file.
+    '''
+    def __init__(self, array, hz=1.0, offset=0.0, data_type='Unsigned'):
+        self.array = np.ma.array(array)
+        self.hz = hz
+        self.offset = offset
+        self.data_type = data_type
+
+
+class TestPlotFleet(unittest.TestCase):
+    '''
+    '''
+    def test_layout(self):
+        fleet_params = [
+            ('a.dat', {'Altitude STD': FakeParam(np.arange(100)),
+                       'Airspeed': FakeParam(np.arange(200), hz=2.0)}),
+            ('failed.dat', None),
+            ('b.dat', {'Altitude STD': FakeParam(np.arange(50) * 2)}),
+        ]
+        axes = {2: ['Airspeed', 'Missing'], 1: ['Altitude STD']}
+        fig = plot_params.plot_fleet(fleet_params, axes, title='fleet.lfl',
+                                     decimate=False)
+        try:
+            # A column per data file and a row per axis, added by column.
+            self.assertEqual([axis.get_geometry() for axis in fig.axes],
+                             [(2, 3, 1), (2, 3, 4), (2, 3, 2), (2, 3, 5),
+                              (2, 3, 3), (2, 3, 6)])
+            self.assertEqual([axis.get_title() for axis in fig.axes[::2]],
+                             ['a.dat', 'failed.dat', 'b.dat'])
+            # Each row shares its y-axis across the data files.
+            for row in (0, 1):
+                row_axes = fig.axes[row::2]
+                self.assertTrue(all(
+                    row_axes[0].get_shared_y_axes().joined(row_axes[0], axis)
+                    for axis in row_axes[1:]))
+            self.assertFalse(fig.axes[0].get_shared_y_axes().joined(
+                fig.axes[0], fig.axes[1]))
+            # Only the first column has legends, listing missing parameters.
+            a_airspeed = fig.axes[1]
+            self.assertEqual(
+                [text.get_text() for text in
+                 a_airspeed.get_legend().get_texts()],
+                ['Airspeed', 'Missing'])
+            self.assertIsNone(fig.axes[4].get_legend())
+            x, y = a_airspeed.lines[0].get_data()
+            self.assertEqual(x[-1], 99.5)
+            self.assertEqual(len(a_airspeed.lines[1].get_xdata()), 0)
+            # Failed data files are labelled rather than plotted.
+            self.assertEqual([text.get_text() for text in fig.axes[2].texts],
+                             ['Processing failed'])
+            self.assertEqual(fig.axes[2].lines, [])
+            self.assertEqual(fig.axes[4].lines[0].get_ydata()[-1], 98)
+        finally:
+            plot_params.plt.close(fig)
+
+
+class FakeCanvas(object):
+    '''
+    Stands in for a live plot window's canvas, running its event loop until
+    stopped.
+    '''
+    def __init__(self):
+        self._stopped = threading.Event()
+
+    def start_event_loop(self, timeout):
+        self._stopped.wait(10)
+        self._stopped.clear()
+
+    def stop_event_loop(self):
+        self._stopped.set()
+
+
+class TestPlotLoop(unittest.TestCase):
+    '''
+    '''
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.lfl_path = os.path.join(self.temp_dir, 'example.lfl')
+        open(self.lfl_path, 'w').close()
+        self.axes = {1: ['Altitude STD']}
+        self.loops = plot_params.ProcessAndPlotLoops(
+            os.path.join(self.temp_dir, 'example.hdf5'), False,
+            self.lfl_path, lambda: self.axes, debounce=0)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_newest_generation_plotted(self):
+        loops = self.loops
+        drawn = []
+        loops._draw = lambda: drawn.append(loops._axes)
+        loops._generation = 3
+        for generation in (1, 2, 3):
+            loops._post(plot_params.PLOT, (generation, {1: [generation]}))
+        loops._post(plot_params.EXIT)
+        with mock.patch.object(plot_params.plt, 'show') as show:
+            loops.plot_loop()
+        self.assertEqual(drawn, [{1: [3]}])
+        self.assertEqual(show.call_count, 1)
+
+    def test_superseded_while_drawing(self):
+        # The viewport stops reading the HDF file if reprocessing started
+        # while drawing.
+        loops = self.loops
+        loops._viewport = mock.Mock()
+
+        def draw():
+            loops._generation += 1
+
+        loops._draw = draw
+        loops._generation = 1
+        loops._post(plot_params.PLOT, (1, self.axes))
+        loops._post(plot_params.EXIT)
+        with mock.patch.object(plot_params.plt, 'show'):
+            loops.plot_loop()
+        loops._viewport.freeze.assert_called_once_with()
+
+    def test_stop_wakes_next_message(self):
+        loops = self.loops
+        timer = threading.Timer(0.2, loops.stop)
+        start = time.time()
+        timer.start()
+        # Interrupted by the wakeup rather than returning the message.
+        self.assertIsNone(loops._next_message(False))
+        timer.join()
+        self.assertTrue(time.time() - start < 5)
+        self.assertEqual(loops._next_message(False), (plot_params.EXIT, None))
+        # The plotting loop returns once stopped.
+        loops.plot_loop()
+
+    def test_next_message_live(self):
+        # Messages posted from the processing thread stop the live plot
+        # window's event loop.
+        loops = self.loops
+        canvas = FakeCanvas()
+        loops._live_plot = mock.Mock()
+        loops._live_plot.fig.canvas = canvas
+        gui = types.ModuleType('flightdataplotter.gui')
+        gui.call_after = lambda function, *args: function(*args)
+        timer = threading.Timer(0.2, loops._post,
+                                [plot_params.PLOT, (1, self.axes)])
+        start = time.time()
+        with mock.patch.dict(sys.modules, {'flightdataplotter.gui': gui}):
+            timer.start()
+            message = loops._next_message(True)
+        timer.join()
+        self.assertEqual(message, (plot_params.PLOT, (1, self.axes)))
+        self.assertTrue(time.time() - start < 5)
+        self.assertIsNone(loops._interrupt)
+
+    def test_run(self):
+        # The processing loop posts its results and exits when stopped
+        # while waiting for the LFL to change.
+        loops = self.loops
+        loops.start()
+        try:
+            self.assertEqual(loops._next_message(False) or
+                             loops._next_message(False),
+                             (plot_params.PLOT, (1, self.axes)))
+        finally:
+            loops.stop()
+            loops.join(5)
+        self.assertFalse(loops.is_alive())
+
+
+class TestLivePlot(unittest.TestCase):
+    '''
+    '''
+    def setUp(self):
+        self.params = {'Altitude STD': FakeParam(np.arange(100))}
+        self.axes = {1: ['Altitude STD']}
+        self.lines = {1: [('Altitude STD', (np.arange(100),
+                                            np.arange(100) * 2))]}
+        self.live_plot = plot_params.LivePlot(title='example.hdf5')
+        self.addCleanup(plot_params.plt.close, 'all')
+
+    def update(self, zoomed):
+        viewport = mock.Mock(zoomed=zoomed)
+        with mock.patch.object(plot_params, 'plot_lines',
+                               return_value=self.lines), \
+                mock.patch.object(plot_params, 'create_viewport_loader',
+                                  return_value=viewport), \
+                mock.patch('matplotlib.figure.Figure.show'):
+            self.live_plot.update(self.params, self.axes)
+        return viewport
+
+    def test_update_refreshes_zoomed_viewport(self):
+        viewport = self.update(zoomed=False)
+        self.assertFalse(viewport.refresh.called)
+        # Updated in place, replacing the loader of the previous update.
+        viewport = self.update(zoomed=True)
+        viewport.refresh.assert_called_once_with()
+        next_viewport = self.update(zoomed=False)
+        viewport.disconnect.assert_called_once_with()
+        self.assertFalse(next_viewport.refresh.called)
+
+
+################################################################################
+# vim:et:ft=python:nowrap:sts=4:sw=4:ts=4
@@ -0,0 +1,106 @@
+################################################################################
+# vim:et:ft=python:nowrap:sts=4:sw=4:ts=4
+################################################################################
+
+
+'''
+Tests for flightdataplotter.profiling.
+'''
+
+
+################################################################################
+# Imports
+
+
+import json
+import os
+import pstats
+import shutil
+import tempfile
+import time
+import unittest
+
+from StringIO import StringIO
+
+from flightdataplotter.profiling import (
+    NullProfiler,
+    StageProfiler,
+    _current_rss,
+)
+
+
+################################################################################
+# Test Cases
+
+
+class TestStageProfiler(unittest.TestCase):
+    '''
+    '''
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_stage(self):
+        output = StringIO()
+        profiler = StageProfiler(output)
+        profiler.start_iteration()
+        with profiler.stage('drawing'):
+            with profiler.stage('alignment'):
+                time.sleep(0.01)
+        records = [json.loads(l) for l in output.getvalue().splitlines()]
+        self.assertEqual([r['stage'] for r in records],
+                         ['alignment', 'drawing'])
+        for record in records:
+            self.assertEqual(record['iteration'], 1)
+            self.assertTrue(record['wall'] >= 0.01)
+            self.assertTrue(record['cpu'] >= 0)
+            self.assertTrue(record['max_rss_mb'] > 0)
+
+    @unittest.skipIf(_current_rss() is None, '/proc/self/statm is missing')
+    def test_stage_memory(self):
+        output = StringIO()
+        profiler = StageProfiler(output)
+        with profiler.stage('create_hdf'):
+            array = ' ' * (64 * 1024 ** 2)
+        with profiler.stage('summaries'):
+            del array
+        create_hdf, summaries = [
+            json.loads(l) for l in output.getvalue().splitlines()]
+        # Measured per stage, unlike the process's largest resident set.
+        self.assertTrue(create_hdf['rss_change_mb'] > 48)
+        self.assertTrue(summaries['rss_change_mb'] < -48)
+        self.assertTrue(summaries['max_rss_mb'] >= create_hdf['max_rss_mb'])
+
+    def test_stage_exception(self):
+        output = StringIO()
+        profiler = StageProfiler(output)
+
+        def fail():
+            with profiler.stage('parse_lfl'):
+                raise ValueError()
+
+        self.assertRaises(ValueError, fail)
+        self.assertEqual(json.loads(output.getvalue())['stage'], 'parse_lfl')
+
+    def test_cprofile(self):
+        cprofile_path = os.path.join(self.temp_dir, 'stats.prof')
+        profiler = StageProfiler(StringIO(), cprofile_path=cprofile_path)
+        with profiler.stage('create_hdf'):
+            sorted(range(1000))
+        profiler.close()
+        stats = pstats.Stats(cprofile_path)
+        self.assertTrue(any('sorted' in func[2] for func in stats.stats))
+
+    def test_null_profiler(self):
+        profiler = NullProfiler()
+        profiler.start_iteration()
+        with profiler.stage('drawing'):
+            pass
+        profiler.close()
+        self.assertFalse(profiler.enabled)
+
+
+################################################################################
+# vim:et:ft=python:nowrap:sts=4:sw=4:ts=4
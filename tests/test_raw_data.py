@@ -0,0 +1,230 @@
+################################################################################
+# vim:et:ft=python:nowrap:sts=4:sw=4:ts=4
+################################################################################
+
+
+'''
+Tests for flightdataplotter.raw_data.
+'''
+
+
+################################################################################
+# Imports
+
+
+import bz2
+import multiprocessing
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+
+from StringIO import StringIO
+
+from flightdataplotter import raw_data
+from tests.test_frames import make_words
+
+
+################################################################################
+# Test Cases
+
+
+def copy_part_20_70(path):
+    '''
+    Copy 20-70% of path within a worker process.
+    '''
+    return raw_data.copy_file_part(path, 20, 70)
+
+
+class TestRawData(unittest.TestCase):
+    '''
+    '''
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.data = ''.join(chr(i % 256) for i in xrange(1000))
+        self.path = os.path.join(self.temp_dir, 'flight.dat')
+        with open(self.path, 'wb') as raw:
+            raw.write(self.data)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_part_range(self):
+        self.assertEqual(raw_data.part_range(1000, 0, 100), (0, 1000))
+        self.assertEqual(raw_data.part_range(1001, 0, 100), (0, 1000))
+        self.assertEqual(raw_data.part_range(1000, 25, 50), (250, 250))
+        self.assertEqual(raw_data.part_range(1000, 25, 50.1), (250, 250))
+        self.assertEqual(raw_data.part_range(1002, 50, 100), (502, 500))
+        self.assertEqual(raw_data.part_range(1000, 60, 50), (600, 0))
+
+    def test_is_compressed(self):
+        self.assertFalse(raw_data.is_compressed(self.path))
+        bz2_path = os.path.join(self.temp_dir, 'flight.bz2')
+        with open(bz2_path, 'wb') as raw:
+            raw.write('BZh91AY&SY')
+        self.assertTrue(raw_data.is_compressed(bz2_path))
+
+    def test_copy_stream(self):
+        dest = StringIO()
+        copied = raw_data.copy_stream(StringIO(self.data), dest, 600,
+                                      buffer_size=64)
+        self.assertEqual(copied, 600)
+        self.assertEqual(dest.getvalue(), self.data[:600])
+
+    def test_copy_mmap(self):
+        dest = StringIO()
+        with open(self.path, 'rb') as src:
+            copied = raw_data.copy_mmap(src, dest, 100, 2000, buffer_size=64)
+        self.assertEqual(copied, 900)
+        self.assertEqual(dest.getvalue(), self.data[100:])
+
+    def test_copy_file_part(self):
+        dest_path = raw_data.copy_file_part(self.path, 20, 70)
+        self.assertEqual(dest_path,
+                         os.path.join(self.temp_dir, 'flight_20-70.dat'))
+        with open(dest_path, 'rb') as dest:
+            self.assertEqual(dest.read(), self.data[200:700])
+        self.assertEqual(
+            [name for name in os.listdir(self.temp_dir) if 'flight_' in name],
+            ['flight_20-70.dat'])
+
+    def test_copy_file_part_concurrent(self):
+        # Processes copying the same part each write their own temporary
+        # file and the last to finish replaces the part.
+        pool = multiprocessing.Pool(4)
+        try:
+            dest_paths = pool.map(copy_part_20_70, [self.path] * 8)
+        finally:
+            pool.close()
+            pool.join()
+        self.assertEqual(set(dest_paths),
+                         set([os.path.join(self.temp_dir, 'flight_20-70.dat')]))
+        with open(dest_paths[0], 'rb') as dest:
+            self.assertEqual(dest.read(), self.data[200:700])
+        self.assertEqual(
+            [name for name in os.listdir(self.temp_dir) if 'flight_' in name],
+            ['flight_20-70.dat'])
+
+    def test_copy_file_part_frames(self):
+        # 40 frames of 64 words per second after 10 words of junk.
+        words = make_words(64, 40, junk=10)
+        path = os.path.join(self.temp_dir, 'frames.dat')
+        with open(path, 'wb') as raw:
+            raw.write(words.tostring())
+        frame_bytes = 4 * 64 * 2
+        dest_path = raw_data.copy_file_part(path, 10, 60)
+        # Widened to start at the fourth frame and stop at the twenty fifth.
+        with open(dest_path, 'rb') as dest:
+            self.assertEqual(dest.read(), words.tostring()[
+                20 + 3 * frame_bytes:20 + 24 * frame_bytes])
+        # A small percentage contains whole frames and is never empty.
+        dest_path = raw_data.copy_file_part(path, 50, 51)
+        size = os.path.getsize(dest_path)
+        self.assertTrue(size >= frame_bytes)
+        self.assertEqual(size % frame_bytes, 0)
+        self.assertTrue(os.path.isfile(path + '.frames.npz'))
+
+    def test_find_bzip2_magic(self):
+        # The magic number starting 3 bits into the second byte.
+        value = (0xFF << 56) | (raw_data.BZIP2_BLOCK_MAGIC << 5) | 0x1F
+        data = ('%016x' % value).decode('hex')
+        self.assertEqual(
+            raw_data.find_bzip2_magic(data, raw_data.BZIP2_BLOCK_MAGIC), [11])
+        self.assertEqual(
+            raw_data.find_bzip2_magic(data, raw_data.BZIP2_END_MAGIC), [])
+
+    def test_decompress_bzip2(self):
+        # Level 1 compresses blocks of 100k, and the file contains two
+        # streams.
+        data = ''.join(chr((i * 7919) % 251 / 8) for i in xrange(250000))
+        bz2_path = os.path.join(self.temp_dir, 'flight.bz2')
+        with open(bz2_path, 'wb') as raw:
+            raw.write(bz2.compress(data, 1) + bz2.compress(self.data))
+        with open(bz2_path, 'rb') as raw:
+            self.assertEqual(len(raw_data.bzip2_blocks(raw.read())), 4)
+        dest_path = os.path.join(self.temp_dir, 'decompressed.dat')
+        for workers in (1, 2):
+            self.assertTrue(raw_data.decompress_file(bz2_path, dest_path,
+                                                     workers))
+            with open(dest_path, 'rb') as dest:
+                self.assertEqual(dest.read(), data + self.data)
+
+    def test_decompress_bzip2_invalid(self):
+        bz2_path = os.path.join(self.temp_dir, 'flight.bz2')
+        with open(bz2_path, 'wb') as raw:
+            raw.write(bz2.compress(self.data)[:-20])
+        dest_path = os.path.join(self.temp_dir, 'decompressed.dat')
+        self.assertFalse(raw_data.decompress_file(bz2_path, dest_path, 1))
+        self.assertFalse(os.path.exists(dest_path))
+
+    def test_extract_zip(self):
+        zip_path = os.path.join(self.temp_dir, 'flight.SAC')
+        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr('1.dat', self.data[:300])
+            archive.writestr('2.dat', self.data[300:])
+        dest_path = os.path.join(self.temp_dir, 'decompressed.dat')
+        self.assertTrue(raw_data.decompress_file(zip_path, dest_path, 2))
+        with open(dest_path, 'rb') as dest:
+            self.assertEqual(dest.read(), self.data)
+
+    def test_requires_copy(self):
+        bz2_path = os.path.join(self.temp_dir, 'compressed.bz2')
+        with open(bz2_path, 'wb') as raw:
+            raw.write(bz2.compress(self.data))
+        self.assertFalse(raw_data.requires_copy(self.path))
+        self.assertTrue(raw_data.requires_copy(self.path, 20, 100))
+        self.assertTrue(raw_data.requires_copy(self.path, 0, 70))
+        self.assertTrue(raw_data.requires_copy(bz2_path))
+
+    def test_copy_file_part_compressed(self):
+        bz2_path = os.path.join(self.temp_dir, 'compressed.bz2')
+        with open(bz2_path, 'wb') as raw:
+            raw.write(bz2.compress(self.data))
+        dest_path = raw_data.copy_file_part(bz2_path, 20, 70)
+        with open(dest_path, 'rb') as dest:
+            self.assertEqual(dest.read(), self.data[200:700])
+        dest_path = raw_data.copy_file_part(bz2_path)
+        with open(dest_path, 'rb') as dest:
+            self.assertEqual(dest.read(), self.data)
+        self.assertEqual(sorted(os.listdir(self.temp_dir)),
+                         ['compressed.bz2', 'compressed_0-100.dat',
+                          'compressed_20-70.dat', 'flight.dat'])
+
+    def test_data_file_paths(self):
+        fleet_dir = os.path.join(self.temp_dir, 'fleet')
+        os.mkdir(fleet_dir)
+        os.mkdir(os.path.join(fleet_dir, 'nested.dat'))
+        for name in ('b.dat', 'a.RAW', 'c.SAC', 'd.dat.bz2', '.hidden.dat',
+                     'example.lfl', 'report.csv', 'stages.json', 'b.hdf5',
+                     'b.dat.frames.npz', 'b_10-50.dat', 'b_10-50.dat.part'):
+            open(os.path.join(fleet_dir, name), 'w').close()
+        self.assertEqual(
+            raw_data.data_file_paths([fleet_dir, 'other.lfl']),
+            [os.path.join(fleet_dir, name)
+             for name in ('a.RAW', 'b.dat', 'c.SAC', 'd.dat.bz2')] +
+            ['other.lfl'])
+        # Copies are written alongside the data file.
+        path = raw_data.copy_file_part(
+            os.path.join(fleet_dir, 'b.dat'), 0, 50)
+        self.assertEqual(os.path.basename(path), 'b_0-50.dat')
+        self.assertNotIn(path, raw_data.data_file_paths([fleet_dir]))
+
+    def test_copy_file_part_compressed_frames(self):
+        words = make_words(64, 40, junk=10)
+        bz2_path = os.path.join(self.temp_dir, 'frames.bz2')
+        with open(bz2_path, 'wb') as raw:
+            raw.write(bz2.compress(words.tostring()))
+        frame_bytes = 4 * 64 * 2
+        dest_path = raw_data.copy_file_part(bz2_path, 10, 60)
+        # Sliced on frame boundaries as if the file were uncompressed.
+        with open(dest_path, 'rb') as dest:
+            self.assertEqual(dest.read(), words.tostring()[
+                20 + 3 * frame_bytes:20 + 24 * frame_bytes])
+        # The index of the temporary decompressed file is not saved.
+        self.assertEqual(sorted(os.listdir(self.temp_dir)),
+                         ['flight.dat', 'frames.bz2', 'frames_10-60.dat'])
+
+
+################################################################################
+# vim:et:ft=python:nowrap:sts=4:sw=4:ts=4
@@ -0,0 +1,146 @@
+################################################################################
+# vim:et:ft=python:nowrap:sts=4:sw=4:ts=4
+################################################################################
+
+
+'''
+Tests for flightdataplotter.report.
+'''
+
+
+################################################################################
+# Imports
+
+
+import csv
+import h5py
+import json
+import numpy as np
+import os
+import shutil
+import tempfile
+import unittest
+
+from flightdataplotter import hdf_tools, report
+
+from tests.test_hdf_tools import write_hdf
+
+
+################################################################################
+# Test Cases
+
+
+class TestReport(unittest.TestCase):
+    '''
+    '''
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.hdf_path = os.path.join(self.temp_dir, 'a.hdf5')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_report_format(self):
+        self.assertEqual(report.report_format('report.json'), 'json')
+        self.assertEqual(report.report_format('REPORT.CSV'), 'csv')
+        self.assertEqual(report.report_format('report.txt'), 'csv')
+        self.assertEqual(report.report_format('report'), 'csv')
+
+    def test_parameter_statistics(self):
+        # A ramp with a spike, read a few samples at a time so that changes
+        # span chunks.
+        ramp = np.ma.arange(20, dtype=np.float64)
+        ramp[10] = 500
+        ramp[15] = np.ma.masked
+        write_hdf(self.hdf_path, {'Ramp': ramp})
+        with h5py.File(self.hdf_path, 'r') as hdf:
+            for chunk_size in (3, 20):
+                statistics = report.parameter_statistics(
+                    hdf[hdf_tools.SERIES]['Ramp'], chunk_size)
+                self.assertEqual(statistics['length'], 20)
+                self.assertEqual(statistics['frequency'], 1.0)
+                self.assertAlmostEqual(statistics['masked_fraction'], 0.05)
+                self.assertEqual(statistics['min'], 0)
+                self.assertEqual(statistics['max'], 500)
+                self.assertAlmostEqual(statistics['mean'],
+                                       (190 - 10 - 15 + 500) / 19.0)
+                self.assertFalse(statistics['constant'])
+                self.assertEqual(statistics['max_rate'], 491)
+                # The changes into and out of the spike.
+                self.assertEqual(statistics['rate_outliers'], 2)
+
+    def test_parameter_statistics_gap(self):
+        # Values either side of a masked gap are not adjacent samples.
+        gap = np.ma.zeros(3602, dtype=np.float64)
+        gap[1:3601] = np.ma.masked
+        gap[3601] = 30000
+        write_hdf(self.hdf_path, {'Gap': gap})
+        with h5py.File(self.hdf_path, 'r') as hdf:
+            for chunk_size in (7, 1000, 4000):
+                statistics = report.parameter_statistics(
+                    hdf[hdf_tools.SERIES]['Gap'], chunk_size)
+                self.assertEqual(statistics['min'], 0)
+                self.assertEqual(statistics['max'], 30000)
+                self.assertEqual(statistics['max_rate'], 0)
+                self.assertEqual(statistics['rate_outliers'], 0)
+
+    def test_parameter_statistics_constant(self):
+        write_hdf(self.hdf_path, {
+            'Constant': np.ma.array([3, 3, 3, 3], mask=[0, 1, 0, 0]),
+            'Masked': np.ma.array([1, 2], mask=True),
+            'Empty': np.ma.array([], dtype=np.float64)})
+        with h5py.File(self.hdf_path, 'r') as hdf:
+            series = hdf[hdf_tools.SERIES]
+            constant = report.parameter_statistics(series['Constant'])
+            masked = report.parameter_statistics(series['Masked'])
+            empty = report.parameter_statistics(series['Empty'])
+        self.assertTrue(constant['constant'])
+        self.assertEqual(constant['max_rate'], 0)
+        self.assertEqual(constant['rate_outliers'], 0)
+        self.assertAlmostEqual(constant['masked_fraction'], 0.25)
+        self.assertEqual(masked['masked_fraction'], 1)
+        for key in ('min', 'max', 'mean', 'constant', 'max_rate',
+                    'rate_outliers'):
+            self.assertIsNone(masked[key])
+        self.assertIsNone(empty['masked_fraction'])
+
+    def test_parameter_statistics_multistate(self):
+        write_hdf(self.hdf_path, {
+            'Gear Down': np.ma.array([0, 0, 1, 1, 0, 0, 0, 1] * 4)})
+        with h5py.File(self.hdf_path, 'r+') as hdf:
+            group = hdf[hdf_tools.SERIES]['Gear Down']
+            group.attrs['values_mapping'] = json.dumps({0: 'Up', 1: 'Down'})
+            statistics = report.parameter_statistics(group)
+        self.assertEqual(statistics['max_rate'], 1)
+        self.assertIsNone(statistics['rate_outliers'])
+
+    def test_write_report(self):
+        write_hdf(self.hdf_path, {
+            'Airspeed': np.ma.arange(10, dtype=np.float64),
+            'Masked': np.ma.array([1, 2], mask=True)})
+        rows = report.hdf_statistics(self.hdf_path)
+        self.assertEqual([r['name'] for r in rows], ['Airspeed', 'Masked'])
+        for row in rows:
+            row.update(lfl='a.lfl', data='a.dat')
+
+        csv_path = os.path.join(self.temp_dir, 'report.csv')
+        report.write_report(rows, csv_path, 'csv')
+        with open(csv_path, 'rb') as csv_file:
+            csv_rows = list(csv.DictReader(csv_file))
+        self.assertEqual(len(csv_rows), 2)
+        self.assertEqual(csv_rows[0]['lfl'], 'a.lfl')
+        self.assertEqual(csv_rows[0]['name'], 'Airspeed')
+        self.assertEqual(float(csv_rows[0]['max']), 9)
+        self.assertEqual(csv_rows[1]['min'], '')
+
+        json_path = os.path.join(self.temp_dir, 'report.json')
+        report.write_report(rows, json_path, 'json')
+        with open(json_path) as json_file:
+            json_rows = json.load(json_file)
+        self.assertEqual(sorted(json_rows[0]), sorted(report.REPORT_FIELDS))
+        self.assertEqual(json_rows[0]['max'], 9)
+        self.assertIsNone(json_rows[1]['min'])
+
+
+################################################################################
+# vim:et:ft=python:nowrap:sts=4:sw=4:ts=4
@@ -0,0 +1,129 @@
+################################################################################
+# vim:et:ft=python:nowrap:sts=4:sw=4:ts=4
+################################################################################
+
+
+'''
+Tests for flightdataplotter.viewport.
+'''
+
+
+################################################################################
+# Imports
+
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from flightdataplotter import hdf_tools
+from flightdataplotter.decimate import minmax_decimate
+from flightdataplotter.viewport import (
+    LineSource,
+    ViewportLoader,
+    window_range,
+)
+
+from tests.test_hdf_tools import write_hdf
+
+
+################################################################################
+# Test Cases
+
+
+class TestWindowRange(unittest.TestCase):
+    '''
+    '''
+    def test_window_range(self):
+        self.assertEqual(window_range(10, 20, 1, 0, 100), (9, 22))
+        self.assertEqual(window_range(10.5, 19.5, 1, 0, 100), (9, 22))
+        # Samples of a quarter frequency parameter are 4 units apart.
+        self.assertEqual(window_range(10, 20, 4, 0, 100), (1, 7))
+        self.assertEqual(window_range(10, 20, 1, 5, 100), (4, 17))
+        # Clipped to the array.
+        self.assertEqual(window_range(-10, 200, 1, 0, 100), (0, 100))
+        self.assertEqual(window_range(200, 300, 1, 0, 100), (100, 100))
+        self.assertEqual(window_range(-300, -200, 1, 0, 100), (0, 0))
+
+
+class TestViewportLoader(unittest.TestCase):
+    '''
+    '''
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.hdf_path = os.path.join(self.temp_dir, 'data.hdf5')
+        self.array = np.ma.arange(10000, dtype=np.float64)
+        write_hdf(self.hdf_path, {'Altitude STD': self.array})
+        self.param = hdf_tools.load_params(
+            self.hdf_path, ['Altitude STD'])['Altitude STD']
+        self.fig = Figure(figsize=(1, 1), dpi=100)
+        FigureCanvasAgg(self.fig)
+        self.axis = self.fig.add_subplot(1, 1, 1)
+        self.sibling = self.fig.add_subplot(2, 1, 2, sharex=self.axis)
+        indices, values = minmax_decimate(self.param.array, 100)
+        self.line, = self.axis.plot(indices * 2, values)
+        self.source = LineSource(self.line, self.param, 2)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_refresh(self):
+        loader = ViewportLoader([self.axis, self.sibling], [self.source])
+        # The full array is read from the HDF file as needed.
+        self.assertTrue(self.param._array is None)
+        overview = self.line.get_xdata()
+        self.sibling.set_xlim(200, 240)
+        loader.refresh()
+        x, y = self.line.get_data()
+        # Every sample within the window is shown.
+        self.assertEqual(x.tolist(), range(198, 244, 2))
+        self.assertEqual(y.tolist(), range(99, 122))
+        self.sibling.set_xlim(0, 20000)
+        loader.refresh()
+        self.assertEqual(self.line.get_xdata().tolist(), overview.tolist())
+        loader.disconnect()
+
+    def test_refresh_decimated(self):
+        loader = ViewportLoader([self.axis], [self.source])
+        self.axis.set_xlim(0, 10000)
+        loader.refresh()
+        x, y = self.line.get_data()
+        self.assertTrue(len(x) < 5000)
+        self.assertEqual(x[0], 0)
+        # Extended by a sample beyond the edge.
+        self.assertEqual(x[-1], 10002)
+        self.assertEqual(y.max(), 5001)
+        loader.disconnect()
+
+    def test_zoomed(self):
+        loader = ViewportLoader([self.axis, self.sibling], [self.source])
+        self.axis.set_xlim(-100, 20100)
+        self.assertFalse(loader.zoomed)
+        self.axis.set_xlim(0, 19998)
+        self.assertFalse(loader.zoomed)
+        self.sibling.set_xlim(200, 240)
+        self.assertTrue(loader.zoomed)
+        self.axis.set_xlim(10, 20100)
+        self.assertTrue(loader.zoomed)
+        loader.disconnect()
+
+    def test_freeze(self):
+        loader = ViewportLoader([self.axis], [self.source])
+        overview = self.line.get_xdata().tolist()
+        loader.freeze()
+        # The HDF file may be rewritten while frozen.
+        os.remove(self.hdf_path)
+        self.axis.set_xlim(200, 240)
+        loader.refresh()
+        self.assertEqual(self.line.get_xdata().tolist(), overview)
+        loader.disconnect()
+
+
+################################################################################
+# vim:et:ft=python:nowrap:sts=4:sw=4:ts=4
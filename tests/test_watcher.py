@@ -0,0 +1,113 @@
+################################################################################
+# vim:et:ft=python:nowrap:sts=4:sw=4:ts=4
+################################################################################
+
+
+'''
+Tests for flightdataplotter.watcher.
+'''
+
+
+################################################################################
+# Imports
+
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from flightdataplotter.watcher import FileWatcher, Wakeup
+
+
+################################################################################
+# Test Cases
+
+
+class TestFileWatcher(unittest.TestCase):
+    '''
+    '''
+    use_inotify = True
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'example.lfl')
+        self.write('[Parameters]\n')
+        self.watcher = FileWatcher(self.path, debounce=0.1,
+                                   poll_interval=0.01,
+                                   use_inotify=self.use_inotify)
+
+    def tearDown(self):
+        self.watcher.close()
+        shutil.rmtree(self.temp_dir)
+
+    def write(self, content, path=None):
+        with open(path or self.path, 'a') as lfl:
+            lfl.write(content)
+        # Ensure the modification time changes on coarse filesystems.
+        stat = os.stat(path or self.path)
+        os.utime(path or self.path, (stat.st_atime, stat.st_mtime + 1))
+
+    def test_timeout(self):
+        self.assertFalse(self.watcher.wait(timeout=0.05))
+
+    def test_other_file_ignored(self):
+        self.write('', path=os.path.join(self.temp_dir, 'other.lfl'))
+        self.assertFalse(self.watcher.wait(timeout=0.05))
+
+    def test_debounce(self):
+        def save_burst():
+            for _ in range(3):
+                self.write('# comment\n')
+                time.sleep(0.02)
+        thread = threading.Thread(target=save_burst)
+        thread.start()
+        self.assertTrue(self.watcher.wait(timeout=2))
+        thread.join()
+        # The whole burst is reported as a single change.
+        self.assertFalse(self.watcher.wait(timeout=0.05))
+
+    def test_wakeup(self):
+        wakeup = Wakeup()
+        timer = threading.Timer(0.05, wakeup.set)
+        timer.start()
+        start = time.time()
+        self.assertFalse(self.watcher.wait(wakeups=[wakeup]))
+        self.assertTrue(time.time() - start < 2)
+        timer.join()
+        wakeup.close()
+
+
+class TestWakeup(unittest.TestCase):
+    '''
+    '''
+    def test_wait(self):
+        wakeup = Wakeup()
+        self.assertFalse(wakeup.wait(timeout=0.01))
+        timer = threading.Timer(0.05, wakeup.set)
+        timer.start()
+        self.assertTrue(wakeup.wait())
+        timer.join()
+        # Remains set until cleared, however many times it was set.
+        wakeup.set()
+        self.assertTrue(wakeup.wait(timeout=0))
+        wakeup.clear()
+        self.assertFalse(wakeup.wait(timeout=0))
+        wakeup.close()
+        wakeup.set()
+        self.assertTrue(wakeup.wait(timeout=0))
+
+
+class TestFileWatcherPolling(TestFileWatcher):
+    '''
+    '''
+    use_inotify = False
+
+    def test_polling(self):
+        self.assertFalse(self.watcher.using_inotify)
+
+
+################################################################################
+# vim:et:ft=python:nowrap:sts=4:sw=4:ts=4